@@ -10,11 +10,11 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 # Importer et lancer l'application depuis app_server.py
-from app_server import app, initialiser_base_de_donnees, DATA_FOLDER_PATH
+from app_server import app, demarrer_services, DATA_FOLDER_PATH
 
 if __name__ == '__main__':
-    # Initialiser la base de données au démarrage
-    initialiser_base_de_donnees()
+    # Base de données, jobs PDF et sessions d'envoi expirées (comme app_server.py)
+    demarrer_services()
     print(f"\n[INFO] Dossier de documents configuré : {DATA_FOLDER_PATH}\n")
     
     # Lancer le serveur Flask
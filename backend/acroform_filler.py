@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from io import BytesIO
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # dépendance optionnelle : le remplissage des PDFs envoyés est alors désactivé
+    PdfReader = PdfWriter = None
+
+# Valeurs de profil considérées comme "cochées" pour une case à cocher
+VALEURS_VRAIES = {"true", "1", "oui", "yes", "on", "x"}
+
+# A incrémenter si la façon de remplir les champs change (invalide les ETags)
+FILLER_VERSION = "1"
+
+
+def _normaliser(nom):
+    """Nom de champ comparable : sans accents, en minuscules, sans séparateurs"""
+    nom = unicodedata.normalize('NFKD', str(nom)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]', '', nom.lower())
+
+
+def _nom_qualifie(annotation):
+    """Nom complet d'un champ (noms /T des parents séparés par des points)"""
+    noms = []
+    objet = annotation
+    while objet is not None:
+        if "/T" in objet:
+            noms.append(str(objet["/T"]))
+        parent = objet.get("/Parent")
+        objet = parent.get_object() if parent is not None else None
+    return ".".join(reversed(noms))
+
+
+def _attribut_herite(annotation, cle):
+    """Attribut d'un champ, éventuellement hérité d'un parent (/FT, /Ff)"""
+    objet = annotation
+    while objet is not None:
+        if cle in objet:
+            return objet[cle]
+        parent = objet.get("/Parent")
+        objet = parent.get_object() if parent is not None else None
+    return None
+
+
+class AcroFormFiller:
+    """
+    Remplit les champs AcroForm d'un PDF existant (document envoyé par l'utilisateur).
+
+    La liste des champs de chaque fichier est analysée une seule fois et gardée
+    en cache, indexée par le hash du contenu. Les valeurs sont écrites par mise à
+    jour incrémentale : le PDF d'origine est conservé tel quel et seuls les objets
+    modifiés sont ajoutés à la fin du fichier.
+    """
+
+    def __init__(self, max_entries=256):
+        """
+        Args:
+            max_entries: Nombre de fichiers dont la liste des champs est gardée en mémoire (LRU)
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._field_maps = OrderedDict()  # hash du fichier -> liste des champs
+        self._digests = {}  # (chemin, taille, mtime) -> hash du fichier
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self):
+        """True si pypdf est installé"""
+        return PdfReader is not None
+
+    def file_digest(self, pdf_path):
+        """Hash SHA-256 du fichier, recalculé seulement si sa taille ou sa date changent"""
+        stat = os.stat(pdf_path)
+        memo_key = (pdf_path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self._lock:
+                # Une seule entrée par chemin
+                for key in [k for k in self._digests if k[0] == pdf_path]:
+                    del self._digests[key]
+                self._digests[memo_key] = digest
+        return digest
+
+    def get_field_map(self, pdf_path, pdf_bytes=None, digest=None):
+        """
+        Liste des champs du PDF : [{"name", "type", "pages", "states"}, ...]
+
+        type vaut "text", "checkbox", "radio" ou "choice"; states contient les
+        valeurs "cochées" possibles d'une case (ex: ["/Yes"]).
+        """
+        digest = digest or self.file_digest(pdf_path)
+        with self._lock:
+            field_map = self._field_maps.get(digest)
+            if field_map is not None:
+                self._field_maps.move_to_end(digest)
+                self.hits += 1
+                return field_map
+            self.misses += 1
+
+        if pdf_bytes is None:
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+        field_map = self._parse_fields(pdf_bytes)
+        print(f"[ACROFORM] {len(field_map)} champ(s) analysé(s) pour {os.path.basename(pdf_path)}")
+
+        with self._lock:
+            self._field_maps[digest] = field_map
+            while len(self._field_maps) > self.max_entries:
+                self._field_maps.popitem(last=False)
+        return field_map
+
+    @staticmethod
+    def _parse_fields(pdf_bytes):
+        """Parcourt les widgets de chaque page et regroupe les champs par nom complet"""
+        reader = PdfReader(BytesIO(pdf_bytes))
+        if "/AcroForm" not in reader.trailer["/Root"]:
+            return []
+
+        champs = OrderedDict()
+        for page_index, page in enumerate(reader.pages):
+            for annot in page.get("/Annots") or []:
+                annotation = annot.get_object()
+                if annotation.get("/Subtype") != "/Widget":
+                    continue
+                nom = _nom_qualifie(annotation)
+                if not nom:
+                    continue
+
+                type_pdf = _attribut_herite(annotation, "/FT")
+                drapeaux = int(_attribut_herite(annotation, "/Ff") or 0)
+                if type_pdf == "/Btn":
+                    if drapeaux & (1 << 16):  # bouton poussoir : rien à remplir
+                        continue
+                    type_champ = "radio" if drapeaux & (1 << 15) else "checkbox"
+                elif type_pdf == "/Ch":
+                    type_champ = "choice"
+                elif type_pdf == "/Tx":
+                    type_champ = "text"
+                else:
+                    continue
+
+                champ = champs.setdefault(nom, {"name": nom, "type": type_champ, "pages": [], "states": []})
+                if page_index not in champ["pages"]:
+                    champ["pages"].append(page_index)
+                apparence = annotation.get("/AP")
+                if type_champ in ("checkbox", "radio") and apparence and "/N" in apparence:
+                    for etat in apparence["/N"].get_object().keys():
+                        if etat != "/Off" and etat not in champ["states"]:
+                            champ["states"].append(str(etat))
+        return list(champs.values())
+
+    @staticmethod
+    def match_values(field_map, profile_data):
+        """
+        Associe les valeurs du profil aux champs du PDF.
+
+        Le nom du champ (complet ou dernier segment) est comparé à la clé du profil
+        sans tenir compte de la casse, des accents ni des séparateurs.
+
+        Returns:
+            Dictionnaire {nom du champ: valeur pypdf}
+        """
+        profil = {}
+        for cle, valeur in profile_data.items():
+            if str(cle).startswith('_'):  # métadonnées
+                continue
+            profil[_normaliser(cle)] = '' if valeur is None else str(valeur)
+
+        valeurs = {}
+        for champ in field_map:
+            nom = champ["name"]
+            valeur = profil.get(_normaliser(nom))
+            if valeur is None:
+                valeur = profil.get(_normaliser(nom.rsplit('.', 1)[-1]))
+            if valeur is None:
+                continue
+
+            if champ["type"] in ("checkbox", "radio"):
+                # Valeur égale à un état du bouton (ex: "homme" pour /homme), sinon vrai/faux
+                etat = next((s for s in champ["states"] if _normaliser(s) == _normaliser(valeur)), None)
+                if etat is None and valeur.strip().lower() in VALEURS_VRAIES and champ["states"]:
+                    etat = champ["states"][0]
+                valeurs[nom] = etat or "/Off"
+            else:
+                valeurs[nom] = valeur
+        return valeurs
+
+    def has_fields(self, pdf_path, filename=None):
+        """
+        True si le fichier est un PDF avec au moins un champ remplissable.
+
+        filename : nom d'origine du fichier, si pdf_path n'a pas d'extension (blob).
+        """
+        if not self.available or not (filename or pdf_path).lower().endswith('.pdf') or not os.path.exists(pdf_path):
+            return False
+        try:
+            return bool(self.get_field_map(pdf_path))
+        except Exception as e:
+            print(f"[ACROFORM WARNING] Analyse impossible de {pdf_path}: {e}")
+            return False
+
+    def etag(self, pdf_path, profile_data):
+        """ETag fort du PDF rempli : hash du fichier d'origine et des valeurs écrites"""
+        digest = self.file_digest(pdf_path)
+        valeurs = self.match_values(self.get_field_map(pdf_path, digest=digest), profile_data)
+        payload = json.dumps(
+            {"file": digest, "filler": FILLER_VERSION, "values": valeurs},
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fill(self, pdf_path, profile_data):
+        """
+        Remplit les champs du PDF avec les valeurs du profil.
+
+        Args:
+            pdf_path: Chemin du PDF envoyé (il n'est pas modifié sur disque)
+            profile_data: Dictionnaire des données du profil
+
+        Returns:
+            Tuple (success, pdf_bytes/message)
+        """
+        if not self.available:
+            return False, "Remplissage des PDFs indisponible (pypdf n'est pas installé)"
+
+        try:
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+
+            field_map = self.get_field_map(pdf_path, pdf_bytes=pdf_bytes)
+            if not field_map:
+                return False, "Ce PDF ne contient aucun champ remplissable"
+
+            valeurs = self.match_values(field_map, profile_data)
+            if not valeurs:
+                # Aucun champ ne correspond au profil : le document reste inchangé
+                return True, pdf_bytes
+
+            # Ne parcourir que les pages qui portent les champs à remplir
+            par_page = {}
+            for champ in field_map:
+                if champ["name"] in valeurs:
+                    for page_index in champ["pages"]:
+                        par_page.setdefault(page_index, {})[champ["name"]] = valeurs[champ["name"]]
+
+            writer = PdfWriter(BytesIO(pdf_bytes), incremental=True)
+            for page_index, champs_page in sorted(par_page.items()):
+                writer.update_page_form_field_values(writer.pages[page_index], champs_page)
+
+            output = BytesIO()
+            writer.write(output)
+            print(f"[ACROFORM] {len(valeurs)} champ(s) rempli(s) dans {os.path.basename(pdf_path)}")
+            return True, output.getvalue()
+
+        except Exception as e:
+            error = f"Erreur lors du remplissage du PDF: {str(e)}"
+            print(f"[ACROFORM ERROR] {error}")
+            return False, error
+
+    def stats(self):
+        """Compteurs du cache des champs (pour /api/metrics)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "available": self.available,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._field_maps),
+                "max_entries": self.max_entries,
+            }
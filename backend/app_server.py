@@ -1,18 +1,32 @@
 import flask
-from flask import Flask, request, jsonify, send_from_directory, abort, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response
 from flask_cors import CORS
 import os 
 from werkzeug.utils import secure_filename 
+from werkzeug.security import safe_join
 import urllib.parse
 import base64 
 import ssl
+from io import BytesIO
 
 # Importe toutes les fonctions nécessaires
-from gestion_db import ajouter_document, recuperer_documents_par_categorie, supprimer_document, initialiser_base_de_donnees, recuperer_4_derniers_documents, diagnostiquer_fichiers_locaux, recuperer_tous_documents, recuperer_document_par_id, marquer_document_signe, marquer_document_rempli, recuperer_toutes_categories, recuperer_stats
+from gestion_db import ajouter_document, recuperer_documents_par_categorie, initialiser_base_de_donnees, recuperer_4_derniers_documents, diagnostiquer_fichiers_locaux, recuperer_tous_documents, recuperer_document_par_id, marquer_document_signe, marquer_document_rempli, recuperer_toutes_categories, recuperer_stats, statistiques_connexions, statistiques_cache_lectures, recuperer_page_documents, supprimer_documents, blob_est_reference, recuperer_document_par_nom, recuperer_blob_par_nom_fichier, marquer_documents_signes, marquer_documents_remplis, deplacer_documents, rechercher_documents, TAILLE_PAGE_DEFAUT, TAILLE_PAGE_MAX
 
 # Importe les modules de gestion de profils et PDF
 from profile_manager import ProfileManager
 from pdf_generator import PDFGenerator
+from pdf_cache import PDFCache
+from pdf_worker_pool import PDFWorkerPool, PDFPoolSaturated
+from pdf_jobs import PDFJobManager
+from acroform_filler import AcroFormFiller
+from blob_store import BlobStore
+from upload_sessions import UploadSessionManager, UploadSessionError
+from file_inventory import FileInventory
+from file_response import DocumentFileServer
+from pdf_text import extract_pdf_text
+from pdf_generation.registry import REGISTRY, UnknownFormError, get_form
+from pdf_generation.main import OUTPUT_PROFILES
+from zip_stream import stream_zip
 from profile_schema import get_field_schema, suggest_fields 
 
 # 1. Configuration de l'application Flask
@@ -24,13 +38,32 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DIST_FOLDER_PATH = os.path.join(PROJECT_ROOT, 'dist')
 DATA_FOLDER_PATH = os.path.join(PROJECT_ROOT, 'data')
 SIGNATURES_FOLDER_PATH = os.path.join(DATA_FOLDER_PATH, 'signatures')
+BLOBS_FOLDER_PATH = os.path.join(DATA_FOLDER_PATH, 'blobs')
 TEMP_FOLDER_PATH = os.path.join(PROJECT_ROOT, 'public', 'temp')
 PDF_GEN_PATH = os.path.join(PROJECT_ROOT, 'backend', 'pdf_generation')
+PDF_CACHE_FOLDER_PATH = os.path.join(TEMP_FOLDER_PATH, 'pdf_cache')
+PDF_CACHE_MAX_MB = int(os.environ.get('PDF_CACHE_MAX_MB', '256'))
+PDF_JOBS_FOLDER_PATH = os.path.join(TEMP_FOLDER_PATH, 'pdf_jobs')
+PDF_BATCH_MAX = int(os.environ.get('PDF_BATCH_MAX', '1000'))
+
+# Modes de remplissage d'un document (PUT /api/documents/<id>/fill)
+FILL_MODE_CERFA = "cerfa"        # générer le formulaire du registre (défaut)
+FILL_MODE_ACROFORM = "acroform"  # remplir les champs du PDF envoyé
+FILL_MODE_AUTO = "auto"          # acroform si le PDF envoyé a des champs, sinon cerfa
 
 # Créer les dossiers s'ils n'existent pas
 os.makedirs(SIGNATURES_FOLDER_PATH, exist_ok=True)
 os.makedirs(TEMP_FOLDER_PATH, exist_ok=True)
 
+# Fichiers envoyés, stockés une seule fois par contenu (SHA-256)
+blob_store = BlobStore(BLOBS_FOLDER_PATH)
+# Envois par morceaux reprenables (fichiers partiels dans le dossier temporaire du store)
+upload_session_manager = UploadSessionManager(blob_store)
+# Inventaire persistant des fichiers de data/ (diagnostic et réconciliation avec la base)
+file_inventory = FileInventory(DATA_FOLDER_PATH, blob_store, SIGNATURES_FOLDER_PATH)
+# Envoi des fichiers de documents (ETag, 304, plages d'octets)
+document_file_server = DocumentFileServer()
+
 print(f"[DEBUG] PROJECT_ROOT: {PROJECT_ROOT}")
 print(f"[DEBUG] DIST_FOLDER_PATH: {DIST_FOLDER_PATH}")
 print(f"[DEBUG] DIST exists: {os.path.exists(DIST_FOLDER_PATH)}")
@@ -39,12 +72,20 @@ print(f"[DEBUG] index.html exists: {os.path.exists(os.path.join(DIST_FOLDER_PATH
 # --- INITIALISATION DES GESTIONNAIRES ---
 try:
     profile_manager = ProfileManager(TEMP_FOLDER_PATH)
-    pdf_generator = PDFGenerator(PDF_GEN_PATH, PROJECT_ROOT)
+    pdf_cache = PDFCache(PDF_CACHE_FOLDER_PATH, max_bytes=PDF_CACHE_MAX_MB * 1024 * 1024)
+    pdf_pool = PDFWorkerPool()
+    pdf_generator = PDFGenerator(PDF_GEN_PATH, PROJECT_ROOT, cache=pdf_cache, pool=pdf_pool)
+    pdf_job_manager = PDFJobManager(pdf_generator, PDF_JOBS_FOLDER_PATH)
+    acroform_filler = AcroFormFiller()
     print("[INFO] Gestionnaires de profil et PDF initialisés avec succès")
 except Exception as e:
     print(f"[WARNING] Erreur lors de l'initialisation des gestionnaires: {e}")
     profile_manager = None
+    pdf_cache = None
+    pdf_pool = None
     pdf_generator = None
+    pdf_job_manager = None
+    acroform_filler = None
 # ----------------------------------------------------
 
 # --- FONCTION UTILITAIRE POUR LE MIME TYPE ---
@@ -58,6 +99,103 @@ def get_mimetype(filename):
         return 'application/octet-stream'
 
 
+# --- EMPLACEMENT DU FICHIER D'UN DOCUMENT ---
+def emplacement_fichier_document(doc):
+    """
+    Fichier d'un document : (chemin, sha256) de son blob dans le stockage par hash,
+    ou (data/<nom_fichier>, None) pour les documents enregistrés avant ce stockage.
+
+    Un fichier historique importé par migrate_storage_layout.py a quitté data/
+    alors que la ligne du document peut être encore en cache sans son blob :
+    le blob est alors relu en base.
+    """
+    if doc.get('blob_sha256'):
+        return blob_store.path(doc['blob_sha256']), doc['blob_sha256']
+    path = safe_join(DATA_FOLDER_PATH, doc['nom_fichier'])
+    if path is None or os.path.isfile(path):
+        return path, None
+    sha256 = recuperer_blob_par_nom_fichier(doc['nom_fichier'])
+    if sha256:
+        return blob_store.path(sha256), sha256
+    return path, None
+
+
+def chemin_fichier_document(doc):
+    """Chemin du fichier d'un document (voir emplacement_fichier_document)"""
+    return emplacement_fichier_document(doc)[0]
+
+
+def document_file_response(doc, filename):
+    """
+    Réponse qui sert le fichier d'un document (ETag, 304, plages : voir file_response.py),
+    ou None si le fichier est introuvable.
+
+    Sans document (doc None), sert data/<filename> s'il existe. Le chemin d'un
+    fichier historique passe par safe_join : un nom ne peut pas sortir de data/.
+    """
+    if doc:
+        path, sha256 = emplacement_fichier_document(doc)
+    else:
+        path, sha256 = safe_join(DATA_FOLDER_PATH, filename), None
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        return document_file_server.send(path, get_mimetype(filename), sha256)
+    except FileNotFoundError:
+        # Fichier supprimé entre la vérification et l'ouverture
+        return None
+
+
+# --- RÉPONSE QUAND LA FILE DE GÉNÉRATION PDF EST PLEINE ---
+def pdf_pool_saturated_response(error):
+    """Réponse 503 rapide avec Retry-After quand le pool de rendu PDF est saturé."""
+    response = jsonify({"error": "Serveur de génération PDF occupé, veuillez réessayer."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+# --- FORMULAIRE DEMANDÉ ---
+def unknown_form_response(form_id):
+    """Réponse 400 pour un formulaire absent du registre."""
+    return jsonify({
+        "error": f"Formulaire inconnu: {form_id}",
+        "formulaires_disponibles": [form["form_id"] for form in REGISTRY.list_forms()]
+    }), 400
+
+
+def unknown_output_response(output):
+    """Réponse 400 pour un profil de sortie inconnu."""
+    return jsonify({
+        "error": f"Profil de sortie inconnu: {output}",
+        "profils_disponibles": list(OUTPUT_PROFILES)
+    }), 400
+
+
+# --- RÉPONSES PDF AVEC ETAG ---
+def pdf_not_modified_response(etag):
+    """Retourne une réponse 304 si le client possède déjà ce PDF (If-None-Match), sinon None."""
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+
+def pdf_download_response(pdf_bytes, etag, download_name="cerfa_14011-02.pdf"):
+    """Envoie un PDF généré en mémoire, avec son ETag fort s'il est connu."""
+    response = send_file(
+        BytesIO(pdf_bytes),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=download_name,
+        etag=etag or False
+    )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # --- FONCTION POUR SAUVEGARDER LA SIGNATURE ---
 def save_signature(doc_id, signature_base64):
     """Sauvegarde la signature (base64 PNG) sur le disque."""
@@ -92,38 +230,176 @@ def api_ajouter_document():
     if not categorie:
         return jsonify({"error": "Catégorie manquante."}), 400
     
-    # Sécurisation du nom de fichier
+    # Sécurisation du nom de fichier (conservé comme métadonnée du document)
     filename = secure_filename(f.filename)
 
-    # 1. Sauvegarde physique du fichier dans le dossier /data
-    file_path = os.path.join(DATA_FOLDER_PATH, filename)
-    
+    # 1. Réception du fichier dans le stockage par hash (hash calculé pendant la copie)
     try:
-        if not os.path.exists(DATA_FOLDER_PATH):
-            os.makedirs(DATA_FOLDER_PATH) 
-            
-        f.save(file_path) 
-        print(f"[OK] Fichier sauvegardé physiquement à: {file_path}")
+        upload = blob_store.receive(f.stream)
+        print(f"[OK] Fichier reçu: {filename} ({upload.size} octets, sha256 {upload.sha256[:12]})")
         
     except Exception as e:
         print(f"[ERROR] Erreur de sauvegarde du fichier: {e}")
         return jsonify({"error": f"Échec de la sauvegarde physique du fichier sur le serveur: {e}"}), 500
 
-    # 2. Enregistrement dans la base de données
+    # 2. Enregistrement dans la base de données, puis publication du blob
+    return enregistrer_upload(upload, filename, categorie)
+
+
+def enregistrer_upload(upload, filename, categorie):
+    """
+    Enregistre un fichier reçu (BlobUpload) comme document puis publie son blob.
+
+    Commun à l'envoi direct (/api/documents/ajouter) et à la finalisation d'un
+    envoi par morceaux (/api/uploads/<id>/finalize).
+    """
     simulated_path = f"//localhost/data/{filename}" 
     try:
-        doc_id = ajouter_document(filename, simulated_path, categorie)
-        
-        if doc_id:
-            return jsonify({"message": "Document et BDD mis à jour avec succès", "id": doc_id}), 201 
-        else:
-            return jsonify({"error": "Erreur lors de l'insertion dans la base de données"}), 500
+        # Texte du PDF pour la recherche plein texte ("" pour les autres fichiers)
+        contenu = extract_pdf_text(upload.temp_path, filename=filename)
+        doc_id = ajouter_document(filename, simulated_path, categorie, contenu, upload.sha256, upload.size)
     except Exception as e:
+        blob_store.discard(upload)
         print(f"[ERROR] Erreur lors de l'ajout du document en BDD: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Erreur lors de l'insertion en BDD: {str(e)}"}), 500
 
+    if not doc_id:
+        blob_store.discard(upload)
+        return jsonify({"error": "Erreur lors de l'insertion dans la base de données"}), 500
+
+    try:
+        # Publication du blob (un contenu déjà stocké n'est pas réécrit)
+        nouveau = blob_store.publish(upload)
+    except Exception as e:
+        # Le document ne doit pas pointer vers un blob absent : il est retiré de la base
+        print(f"[ERROR] Publication du fichier impossible, document {doc_id} retiré: {e}")
+        blob_store.discard(upload)
+        supprimer_documents_et_fichiers(ids=[doc_id])
+        return jsonify({"error": f"Échec de la sauvegarde physique du fichier sur le serveur: {e}"}), 500
+
+    return jsonify({
+        "message": "Document et BDD mis à jour avec succès",
+        "id": doc_id,
+        "sha256": upload.sha256,
+        "deduplicated": not nouveau
+    }), 201 
+
+# ============================================
+# ENVOIS PAR MORCEAUX (REPRENABLES)
+# ============================================
+
+def upload_session_error_response(error):
+    """Réponse d'erreur d'une session d'envoi; l'offset de reprise est joint si connu"""
+    body = {"error": str(error)}
+    if error.offset is not None:
+        body["offset"] = error.offset
+    response = jsonify(body)
+    response.status_code = error.status
+    if error.offset is not None:
+        response.headers['Upload-Offset'] = str(error.offset)
+    return response
+
+
+@app.route('/api/uploads', methods=['POST'])
+def api_creer_upload():
+    """
+    Crée une session d'envoi par morceaux.
+    Body: {"nom_fichier": "...", "categorie": "...", "taille": 123, "sha256": "..." (optionnel)}
+    """
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('nom_fichier') or '')
+    categorie = data.get('categorie')
+    if not filename:
+        return jsonify({"error": "Nom de fichier manquant."}), 400
+    if not categorie:
+        return jsonify({"error": "Catégorie manquante."}), 400
+
+    try:
+        session = upload_session_manager.create(filename, categorie, data.get('taille'), data.get('sha256'))
+    except UploadSessionError as e:
+        return upload_session_error_response(e)
+    print(f"[OK] Session d'envoi créée: {filename} ({session['taille']} octets, {session['upload_id']})")
+    return jsonify(session), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def api_envoyer_morceau(upload_id):
+    """
+    Envoie un morceau (corps brut de la requête) à la position ?offset=N
+    (ou en-tête Upload-Offset). Retourne l'offset du prochain morceau.
+    """
+    offset = request.args.get('offset', request.headers.get('Upload-Offset'))
+    try:
+        offset = int(offset) if offset is not None else None
+    except ValueError:
+        offset = None
+
+    try:
+        session = upload_session_manager.write_chunk(upload_id, offset, request.stream, request.content_length)
+    except UploadSessionError as e:
+        return upload_session_error_response(e)
+    response = jsonify(session)
+    response.headers['Upload-Offset'] = str(session['offset'])
+    return response, 200
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def api_statut_upload(upload_id):
+    """État d'une session d'envoi : offset à partir duquel reprendre l'envoi"""
+    try:
+        session = upload_session_manager.status(upload_id)
+    except UploadSessionError as e:
+        return upload_session_error_response(e)
+    response = jsonify(session)
+    response.headers['Upload-Offset'] = str(session['offset'])
+    return response, 200
+
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def api_finaliser_upload(upload_id):
+    """
+    Termine un envoi : vérifie la taille et le SHA-256 (body {"sha256": "..."} ou
+    celui donné à la création), puis enregistre le document comme /api/documents/ajouter.
+
+    Après un échec, la finalisation peut être relancée (le fichier reçu est conservé);
+    une session déjà finalisée retourne le document créé (200).
+    """
+    data = request.get_json(silent=True) or {}
+    reponses = []
+
+    def enregistrer(session, upload):
+        print(f"[OK] Fichier reçu par morceaux: {session['nom_fichier']} ({upload.size} octets, sha256 {upload.sha256[:12]})")
+        reponses.append(enregistrer_upload(upload, session['nom_fichier'], session['categorie']))
+        body, status = reponses[-1]
+        return body.get_json()['id'] if status == 201 else None
+
+    try:
+        session, doc_id, cree = upload_session_manager.finalize(upload_id, enregistrer, data.get('sha256'))
+    except UploadSessionError as e:
+        return upload_session_error_response(e)
+    except Exception as e:
+        print(f"[ERROR] Erreur lors de la finalisation de l'envoi {upload_id}: {e}")
+        return jsonify({"error": f"Erreur lors de la finalisation de l'envoi: {e}"}), 500
+
+    if cree:
+        return reponses[-1]
+    doc = recuperer_document_par_id(doc_id)
+    return jsonify({
+        "message": "Envoi déjà finalisé",
+        "id": doc_id,
+        "sha256": doc['blob_sha256'] if doc else session['sha256'],
+    }), 200
+
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def api_annuler_upload(upload_id):
+    """Abandonne une session d'envoi et supprime le fichier partiel"""
+    if upload_session_manager.abort(upload_id):
+        return jsonify({"message": "Envoi annulé"}), 200
+    return jsonify({"error": "Session d'envoi introuvable"}), 404
+
 # ============================================
 # ENDPOINTS POUR LES CATÉGORIES
 # ============================================
@@ -150,26 +426,104 @@ def api_recuperer_stats():
         print(f"Erreur lors de la récupération des statistiques: {e}")
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
+# Endpoint pour les métriques internes (cache PDF, ...)
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Retourne les compteurs internes du serveur au format JSON"""
+    metrics = {"sqlite": statistiques_connexions(), "query_cache": statistiques_cache_lectures()}
+    if pdf_cache:
+        metrics["pdf_cache"] = pdf_cache.stats()
+    if pdf_pool:
+        metrics["pdf_pool"] = pdf_pool.stats()
+    if acroform_filler:
+        metrics["acroform"] = acroform_filler.stats()
+    if pdf_job_manager:
+        metrics["pdf_jobs"] = pdf_job_manager.stats()
+    metrics["blob_store"] = blob_store.stats()
+    metrics["uploads"] = upload_session_manager.stats()
+    metrics["file_inventory"] = file_inventory.stats()
+    metrics["document_files"] = document_file_server.stats()
+    return jsonify(metrics), 200
+
 # ============================================
 # ENDPOINTS POUR LES DOCUMENTS
 # ============================================
 
+def page_documents_response(categorie=None):
+    """
+    Réponse paginée d'une liste de documents (?limit=N&cursor=...).
+
+    Returns:
+        {"documents": [...], "next_cursor": "..." ou null, "limit": N}
+    """
+    try:
+        limite = int(request.args.get('limit', TAILLE_PAGE_DEFAUT))
+    except ValueError:
+        return jsonify({"error": "Le paramètre 'limit' doit être un entier"}), 400
+    if limite < 1:
+        return jsonify({"error": "Le paramètre 'limit' doit être positif"}), 400
+    limite = min(limite, TAILLE_PAGE_MAX)
+
+    try:
+        documents, next_cursor = recuperer_page_documents(categorie, limite, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"documents": documents, "next_cursor": next_cursor, "limit": limite}), 200
+
+def pagination_demandee():
+    """True si la requête demande une page (limit ou cursor), sinon la liste complète historique"""
+    return 'limit' in request.args or 'cursor' in request.args
+
 # 4. Endpoint pour récupérer les documents par catégorie (Méthode GET)
+# Sans paramètre : liste complète (compatibilité) ; avec ?limit=&cursor= : une page
 @app.route('/api/documents/<categorie>', methods=['GET'])
 def api_recuperer_documents(categorie):
+    if pagination_demandee():
+        return page_documents_response(categorie)
     documents = recuperer_documents_par_categorie(categorie)
     return jsonify(documents), 200
 
 # Endpoint pour récupérer TOUS les documents
+# Sans paramètre : liste complète (compatibilité) ; avec ?limit=&cursor= : une page
 @app.route('/api/documents/all', methods=['GET'])
 def api_recuperer_tous_documents():
     try:
+        if pagination_demandee():
+            return page_documents_response()
         documents = recuperer_tous_documents()
         return jsonify(documents), 200
     except Exception as e:
         print(f"Erreur lors de la récupération de tous les documents: {e}")
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
+# Endpoint de recherche plein texte : GET /api/documents/search?q=...&limit=N&offset=M[&categorie=...]
+@app.route('/api/documents/search', methods=['GET'])
+def api_rechercher_documents():
+    """
+    Recherche dans les noms de fichiers, les catégories et le texte des PDFs.
+
+    Returns:
+        {"documents": [...], "next_offset": N ou null, "limit": N}, classés par pertinence
+    """
+    texte = request.args.get('q', '').strip()
+    if not texte:
+        return jsonify({"error": "Le paramètre 'q' est requis"}), 400
+    try:
+        limite = int(request.args.get('limit', TAILLE_PAGE_DEFAUT))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"error": "Les paramètres 'limit' et 'offset' doivent être des entiers"}), 400
+    if limite < 1 or offset < 0:
+        return jsonify({"error": "Les paramètres 'limit' et 'offset' doivent être positifs"}), 400
+    limite = min(limite, TAILLE_PAGE_MAX)
+
+    try:
+        documents, next_offset = rechercher_documents(texte, limite, offset, request.args.get('categorie'))
+        return jsonify({"documents": documents, "next_offset": next_offset, "limit": limite}), 200
+    except Exception as e:
+        print(f"Erreur lors de la recherche de documents: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
 # Endpoint pour récupérer les 4 documents récents
 @app.route('/api/documents/recents', methods=['GET'])
 def api_recuperer_documents_recents():
@@ -183,9 +537,34 @@ def api_recuperer_documents_recents():
 # Endpoint de diagnostic
 @app.route('/api/documents/diagnostiquer-fichiers', methods=['GET'])
 def api_diagnostiquer_fichiers():
+    # Liste lue dans l'inventaire, mis à jour s'il est trop ancien (FILE_INVENTORY_MAX_AGE)
+    file_inventory.ensure_fresh()
     diagnostic_result = diagnostiquer_fichiers_locaux(DATA_FOLDER_PATH)
     return jsonify(diagnostic_result), 200
 
+# Rapport de réconciliation base/disque (documents sans fichier, fichiers orphelins)
+@app.route('/api/documents/reconciliation', methods=['GET'])
+def api_reconciliation():
+    """
+    Compare l'inventaire des fichiers aux documents, sans relire le disque.
+    ?refresh=1 met d'abord l'inventaire à jour (incrémental); ?limit=N borne les exemples.
+    """
+    limit = request.args.get('limit', default=100, type=int)
+    if limit < 0:
+        return jsonify({"error": "limit doit être positif"}), 400
+    if request.args.get('refresh') in ('1', 'true'):
+        mise_a_jour = file_inventory.refresh()
+    else:
+        mise_a_jour = None
+        file_inventory.ensure_fresh()
+
+    rapport = file_inventory.report(limit)
+    if rapport is None:
+        return jsonify({"error": "Inventaire des fichiers indisponible"}), 500
+    if mise_a_jour:
+        rapport["mise_a_jour"] = mise_a_jour
+    return jsonify(rapport), 200
+
 # --- ENDPOINT FINAL POUR CONSULTER LE FICHIER (CORRIGÉ POUR SÉCURITÉ) ---
 @app.route('/api/documents/ouvrir/<filename>', methods=['GET'])
 def api_ouvrir_document(filename):
@@ -196,27 +575,19 @@ def api_ouvrir_document(filename):
         # Décodage de l'URL pour gérer les espaces (%20)
         decoded_filename = urllib.parse.unquote(filename)
         
-        full_path = os.path.join(DATA_FOLDER_PATH, decoded_filename)
-        
         print(f"\n--- DEBUG D'OUVERTURE ---")
         print(f"Fichier demandé (décodé) : {decoded_filename}")
         
-        if not os.path.exists(full_path):
-            print(f"ERREUR PHYSIQUE: Fichier introuvable à : {full_path}")
-            abort(404) 
+        # Le chemin vient de la base (blob) ou de safe_join (data/<nom>), jamais de l'URL seule
+        response = document_file_response(recuperer_document_par_nom(decoded_filename), decoded_filename)
+        if response is None:
+            print(f"ERREUR PHYSIQUE: Fichier introuvable : {decoded_filename}")
+            return jsonify({"error": "Fichier non trouvé"}), 404
 
-        print(f"Fichier trouvé : Tentative d'envoi.")
-        
-        # Utilise send_from_directory pour servir le fichier
-        response = send_from_directory(
-            directory=DATA_FOLDER_PATH,
-            path=decoded_filename, # Utilise le nom décodé
-            as_attachment=False,
-            mimetype=get_mimetype(decoded_filename)
-        )
+        print(f"Fichier trouvé : envoi ({response.status_code}).")
         
         # 🚨 CORRECTION CRITIQUE : Supprime les en-têtes de sécurité qui bloquent l'iFrame
-        # Les en-têtes sont ajoutés à l'objet 'response' retourné par send_from_directory
+        # Les en-têtes sont ajoutés à l'objet 'response' retourné par document_file_response
         response.headers['X-Frame-Options'] = 'ALLOWALL'
         response.headers['Content-Security-Policy'] = "frame-ancestors 'self' http://localhost:* https://localhost:*;"
         
@@ -248,9 +619,33 @@ def api_marquer_document_signe(doc_id):
         print(f"Erreur lors de la signature du document: {e}")
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
+# Remplissage du PDF envoyé (champs AcroForm), sans regénérer le document
+def remplir_document_acroform(doc_id, pdf_path, profile, filename):
+    """Remplit les champs du document stocké, le marque comme rempli et renvoie le PDF."""
+    etag = acroform_filler.etag(pdf_path, profile)
+    not_modified = pdf_not_modified_response(etag)
+    if not_modified:
+        if marquer_document_rempli(doc_id):
+            return not_modified
+        return jsonify({"error": f"Impossible de mettre à jour le document ID {doc_id}."}), 404
+    
+    success, result = acroform_filler.fill(pdf_path, profile)
+    if not success:
+        return jsonify({"error": f"Erreur de remplissage PDF: {result}"}), 500
+    
+    if marquer_document_rempli(doc_id):
+        return pdf_download_response(result, etag, filename)
+    return jsonify({"error": f"Impossible de mettre à jour le document ID {doc_id}."}), 404
+
 # 5.1 Endpoint pour marquer un document comme rempli (Méthode PUT)
 @app.route('/api/documents/<int:doc_id>/fill', methods=['PUT'])
 def api_marquer_document_rempli(doc_id):
+    """
+    Remplit un document avec le profil et renvoie le PDF.
+    
+    Corps JSON : user_id, profile (optionnel), form_id et output (mode cerfa) et
+    mode : "cerfa" (défaut), "acroform" ou "auto".
+    """
     try:
         # Récupérer les données envoyées
         data = request.get_json() or {}
@@ -270,21 +665,58 @@ def api_marquer_document_rempli(doc_id):
             if not profile:
                 return jsonify({"error": "Profil utilisateur vide. Veuillez remplir votre profil d'abord."}), 400
         
-        # 2. Générer le PDF
+        # 2. Remplir le PDF envoyé s'il contient des champs (modes acroform / auto)
+        mode = data.get('mode', FILL_MODE_CERFA)
+        if mode not in (FILL_MODE_CERFA, FILL_MODE_ACROFORM, FILL_MODE_AUTO):
+            return jsonify({"error": f"Mode de remplissage inconnu: {mode}"}), 400
+        
+        if mode != FILL_MODE_CERFA:
+            doc = recuperer_document_par_id(doc_id)
+            if not doc:
+                return jsonify({"error": f"Document ID {doc_id} non trouvé."}), 404
+            pdf_path = chemin_fichier_document(doc)
+            
+            if acroform_filler and acroform_filler.has_fields(pdf_path, filename=doc['nom_fichier']):
+                return remplir_document_acroform(doc_id, pdf_path, profile, doc['nom_fichier'])
+            if mode == FILL_MODE_ACROFORM:
+                if not acroform_filler or not acroform_filler.available:
+                    return jsonify({"error": "Remplissage des PDFs indisponible (pypdf n'est pas installé)"}), 501
+                return jsonify({"error": "Ce document n'est pas un PDF avec des champs remplissables."}), 422
+        
+        # 3. Générer le PDF
         if not pdf_generator:
             return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
         
-        success, result = pdf_generator.generate_pdf(profile, user_id)
+        try:
+            form = get_form(data.get('form_id'))
+        except UnknownFormError:
+            return unknown_form_response(data.get('form_id'))
+        output = data.get('output')
+        if output and output not in OUTPUT_PROFILES:
+            return unknown_output_response(output)
+        
+        # Le client a déjà ce PDF (même profil, même modèle) : pas de rendu ni de téléchargement
+        etag = pdf_generator.pdf_etag(profile, form.form_id, output)
+        not_modified = pdf_not_modified_response(etag)
+        if not_modified:
+            if marquer_document_rempli(doc_id):
+                return not_modified
+            return jsonify({"error": f"Impossible de mettre à jour le document ID {doc_id}."}), 404
+        
+        try:
+            success, result = pdf_generator.generate_pdf_bytes(profile, user_id, form.form_id, output)
+        except PDFPoolSaturated as e:
+            return pdf_pool_saturated_response(e)
         
         if not success:
             return jsonify({"error": f"Erreur de génération PDF: {result}"}), 500
         
-        pdf_path = result
+        pdf_bytes = result
         
-        # 3. Marquer le document comme rempli dans la BDD
+        # 4. Marquer le document comme rempli dans la BDD
         if marquer_document_rempli(doc_id):
-            # 4. Retourner le PDF généré au client pour téléchargement
-            return send_file(pdf_path, as_attachment=True, download_name="cerfa_14011-02.pdf")
+            # 5. Retourner le PDF généré au client pour téléchargement (directement depuis la mémoire)
+            return pdf_download_response(pdf_bytes, etag, form.output_filename)
         else:
             return jsonify({"error": f"Impossible de mettre à jour le document ID {doc_id}."}), 404
     
@@ -310,32 +742,148 @@ def api_get_signature(doc_id):
 # 6. Endpoint pour supprimer un document (Méthode DELETE)
 @app.route('/api/documents/<int:doc_id>', methods=['DELETE'])
 def api_supprimer_document(doc_id):
-    if supprimer_document(doc_id):
+    # Le blob du document est supprimé du disque si plus aucun autre document ne le référence
+    doc_ids, _, _ = supprimer_documents_et_fichiers(ids=[doc_id])
+    if doc_ids:
         return jsonify({"message": f"Document ID {doc_id} supprimé."}), 200
     else:
         return jsonify({"error": f"Impossible de supprimer le document ID {doc_id}. Introuvable ou erreur interne."}), 404
 
+def supprimer_fichiers_documents(doc_ids, noms_fichiers, blobs=()):
+    """
+    Supprime du disque les fichiers, blobs et signatures des documents supprimés de la base.
+
+    Appelée après la transaction : la base reste cohérente même si un fichier ne
+    peut pas être supprimé (il est seulement signalé).
+
+    Returns:
+        Tuple (nombre de fichiers supprimés, liste des erreurs)
+    """
+    chemins = [os.path.join(DATA_FOLDER_PATH, nom) for nom in noms_fichiers]
+    chemins += [os.path.join(SIGNATURES_FOLDER_PATH, f'{doc_id}.png') for doc_id in doc_ids]
+    supprimes = 0
+    erreurs = []
+    for chemin in chemins:
+        try:
+            os.remove(chemin)
+            supprimes += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            erreurs.append(f"{os.path.basename(chemin)}: {e}")
+    try:
+        supprimes += blob_store.remove_unreferenced(blobs, blob_est_reference)
+    except OSError as e:
+        erreurs.append(f"blobs: {e}")
+    if erreurs:
+        print(f"[WARNING] {len(erreurs)} fichier(s) non supprimé(s): {erreurs[:5]}")
+    return supprimes, erreurs
+
+def supprimer_documents_et_fichiers(**selection):
+    """
+    Supprime les documents sélectionnés en base puis leurs fichiers, blobs et signatures.
+
+    Commun à toutes les suppressions (un document, tous, opération groupée) et à
+    l'annulation d'un envoi dont le blob n'a pas pu être publié.
+
+    Returns:
+        Tuple (ids supprimés ou None en cas d'erreur BDD, nombre de fichiers supprimés, erreurs)
+    """
+    doc_ids, noms_fichiers, blobs = supprimer_documents(**selection)
+    if doc_ids is None:
+        return None, 0, []
+    fichiers_supprimes, erreurs = supprimer_fichiers_documents(doc_ids, noms_fichiers, blobs)
+    return doc_ids, fichiers_supprimes, erreurs
+
 # 7. Endpoint pour supprimer tous les documents (Méthode DELETE)
 @app.route('/api/documents', methods=['DELETE'])
 def api_supprimer_tous_documents():
     try:
-        # Récupérer tous les documents
-        from gestion_db import recuperer_tous_documents, supprimer_document
-        documents = recuperer_tous_documents()
-        
-        # Supprimer chaque fichier du dossier /data
-        for doc in documents:
-            file_path = os.path.join(DATA_FOLDER_PATH, doc.get('nom_fichier'))
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            # Supprimer de la base de données
-            supprimer_document(doc.get('id'))
+        # Une seule transaction pour la base, puis suppression des fichiers devenus orphelins
+        doc_ids, _, _ = supprimer_documents_et_fichiers(tous=True)
+        if doc_ids is None:
+            return jsonify({"error": "Erreur lors de la suppression des documents en base"}), 500
         
         return jsonify({"message": "Tous les documents ont été supprimés"}), 200
     except Exception as e:
         print(f"Erreur lors de la suppression de tous les documents: {e}")
         return jsonify({"error": f"Erreur lors de la suppression: {e}"}), 500
 
+# Opérations groupées : POST /api/documents/bulk/<action>
+# Corps : {"ids": [1, 2]} ou {"filter": {"categorie": ..., "is_signed": ..., "is_filled": ...}} ou {"all": true}
+# ("move" attend en plus {"categorie": "<catégorie cible>"})
+BULK_ACTIONS = ("delete", "sign", "fill", "move")
+
+def booleen_requete(valeur, nom):
+    """
+    Booléen d'un paramètre de requête : true/false, 1/0 ou leurs équivalents en texte.
+    Lève ValueError pour toute autre valeur ("non", "", ...) au lieu de l'interpréter.
+    """
+    if isinstance(valeur, bool):
+        return valeur
+    if isinstance(valeur, int) and valeur in (0, 1):
+        return bool(valeur)
+    if isinstance(valeur, str) and valeur.strip().lower() in ('true', '1', 'false', '0'):
+        return valeur.strip().lower() in ('true', '1')
+    raise ValueError(f"'{nom}' doit être un booléen (true ou false)")
+
+
+def selection_depuis_requete(data):
+    """Critères de sélection des documents (arguments de gestion_db) à partir du corps JSON"""
+    selection = {}
+    if data.get('ids') is not None:
+        if not isinstance(data['ids'], list):
+            raise ValueError("'ids' doit être une liste d'identifiants")
+        selection['ids'] = data['ids']
+    filtre = data.get('filter') or {}
+    if not isinstance(filtre, dict):
+        raise ValueError("'filter' doit être un objet")
+    if filtre.get('categorie') is not None:
+        selection['categorie'] = filtre['categorie']
+    for cle in ('is_signed', 'is_filled'):
+        if filtre.get(cle) is not None:
+            selection[cle] = booleen_requete(filtre[cle], cle)
+    if data.get('all') is not None and booleen_requete(data['all'], 'all'):
+        selection['tous'] = True
+    return selection
+
+@app.route('/api/documents/bulk/<action>', methods=['POST'])
+def api_operation_groupee(action):
+    """Supprime, signe, marque remplis ou déplace plusieurs documents en une transaction"""
+    if action not in BULK_ACTIONS:
+        return jsonify({"error": f"Action inconnue: {action}", "actions": list(BULK_ACTIONS)}), 400
+    data = request.get_json(silent=True) or {}
+
+    try:
+        selection = selection_depuis_requete(data)
+        if action == "delete":
+            doc_ids, fichiers_supprimes, erreurs = supprimer_documents_et_fichiers(**selection)
+            if doc_ids is None:
+                return jsonify({"error": "Erreur lors de la suppression des documents en base"}), 500
+            return jsonify({
+                "action": action,
+                "count": len(doc_ids),
+                "ids": doc_ids,
+                "files_removed": fichiers_supprimes,
+                "file_errors": erreurs
+            }), 200
+
+        if action == "sign":
+            count = marquer_documents_signes(**selection)
+        elif action == "fill":
+            count = marquer_documents_remplis(**selection)
+        else:
+            categorie_cible = data.get('categorie')
+            if not categorie_cible:
+                return jsonify({"error": "Catégorie cible manquante ('categorie')"}), 400
+            count = deplacer_documents(categorie_cible, **selection)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if count is None:
+        return jsonify({"error": "Erreur lors de la mise à jour des documents en base"}), 500
+    return jsonify({"action": action, "count": count}), 200
+
 # 8. Endpoint pour prévisualiser un document
 @app.route('/api/documents/preview/<int:doc_id>')
 def api_preview_document(doc_id):
@@ -349,32 +897,19 @@ def api_preview_document(doc_id):
         if not document or not document.get('nom_fichier'):
             return jsonify({"error": "Document non trouvé"}), 404
         
-        # Utiliser le chemin absolu dans le dossier data
+        # Blob du document (ou data/<nom_fichier> pour les anciens documents), avec
+        # ETag et plages d'octets : react-pdf ne retélécharge pas un PDF inchangé
         filename = document.get('nom_fichier')
-        file_path = os.path.join(DATA_FOLDER_PATH, filename)
-        
-        # Vérifier que le fichier existe
-        if not os.path.exists(file_path):
-            print(f"Fichier non trouvé à: {file_path}")
+        response = document_file_response(document, filename)
+        if response is None:
+            print(f"Fichier non trouvé pour le document {doc_id}")
             return jsonify({"error": "Fichier non trouvé"}), 404
         
-        # Déterminer le MIME type
-        mimetype = get_mimetype(filename)
-        
-        print(f"Servant le document: {file_path} (MIME: {mimetype})")
-        
-        # Retourner le fichier avec les bons headers CORS
-        response = send_from_directory(
-            DATA_FOLDER_PATH, 
-            filename,
-            mimetype=mimetype
-        )
-        
         # Ajouter les headers CORS pour que react-pdf puisse charger
         response.headers['Access-Control-Allow-Origin'] = '*'
         response.headers['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Range'
-        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Range, If-None-Match, If-Modified-Since, If-Range'
+        response.headers['Access-Control-Expose-Headers'] = 'Accept-Ranges, Content-Range, Content-Length, ETag, Last-Modified'
         
         return response
     except Exception as e:
@@ -384,9 +919,12 @@ def api_preview_document(doc_id):
 # 9. Endpoint pour servir directement les fichiers du dossier data
 @app.route('/api/documents/file/<filename>')
 def serve_document_file(filename):
-    """Sert les fichiers du dossier data"""
+    """Sert le fichier du document portant ce nom (blob, ou fichier du dossier data)"""
     try:
-        return send_from_directory(DATA_FOLDER_PATH, filename)
+        response = document_file_response(recuperer_document_par_nom(filename), filename)
+        if response is None:
+            return jsonify({"error": "Fichier non trouvé"}), 404
+        return response
     except Exception as e:
         print(f"Erreur lors de la lecture du fichier: {e}")
         return jsonify({"error": "Fichier non trouvé"}), 404
@@ -491,6 +1029,12 @@ def api_delete_profile(user_id):
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
 
+# Endpoint pour lister les formulaires disponibles
+@app.route('/api/forms', methods=['GET'])
+def api_lister_formulaires():
+    """Retourne les formulaires du registre (form_id à passer aux endpoints de génération)"""
+    return jsonify(REGISTRY.list_forms()), 200
+
 # Endpoint dédié pour générer un PDF
 @app.route('/api/generate-pdf', methods=['POST'])
 def api_generate_pdf():
@@ -506,14 +1050,30 @@ def api_generate_pdf():
         if not pdf_generator:
             return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
         
-        success, result = pdf_generator.generate_pdf(profile_data, user_id)
+        try:
+            form = get_form(data.get('form_id'))
+        except UnknownFormError:
+            return unknown_form_response(data.get('form_id'))
+        output = data.get('output')
+        if output and output not in OUTPUT_PROFILES:
+            return unknown_output_response(output)
+        
+        # Le client a déjà ce PDF (même profil, même modèle) : 304 sans rendu
+        etag = pdf_generator.pdf_etag(profile_data, form.form_id, output)
+        not_modified = pdf_not_modified_response(etag)
+        if not_modified:
+            return not_modified
+        
+        try:
+            success, result = pdf_generator.generate_pdf_bytes(profile_data, user_id, form.form_id, output)
+        except PDFPoolSaturated as e:
+            return pdf_pool_saturated_response(e)
         
         if not success:
             return jsonify({"error": f"Erreur de génération PDF: {result}"}), 500
         
-        pdf_path = result
-        # Retourner le PDF comme fichier à télécharger
-        return send_file(pdf_path, as_attachment=True, download_name="cerfa_14011-02.pdf")
+        # Retourner le PDF comme fichier à télécharger (directement depuis la mémoire)
+        return pdf_download_response(result, etag, form.output_filename)
     
     except Exception as e:
         print(f"Erreur lors de la génération du PDF: {e}")
@@ -521,6 +1081,192 @@ def api_generate_pdf():
         traceback.print_exc()
         return jsonify({"error": f"Erreur interne du serveur: {str(e)}"}), 500
 
+# Endpoint pour générer un lot de PDFs, renvoyés dans une archive ZIP
+@app.route('/api/generate-pdf/batch', methods=['POST'])
+def api_generate_pdf_batch():
+    """
+    Génère un formulaire pour plusieurs profils et renvoie une archive ZIP en streaming.
+    
+    Corps JSON :
+        user_ids: liste d'IDs utilisateur dont le profil est stocké sur le serveur
+        profiles: liste de profils en ligne, soit {"user_id": ..., "profile": {...}}
+                  soit directement le dictionnaire du profil
+        form_id: formulaire à remplir (défaut: CERFA 14011-02)
+        output: profil de sortie ("fillable", "flattened" ou "compact")
+    """
+    try:
+        data = request.get_json() or {}
+        user_ids = data.get('user_ids', []) or []
+        inline_profiles = data.get('profiles', []) or []
+        
+        if not isinstance(user_ids, list) or not isinstance(inline_profiles, list):
+            return jsonify({"error": "'user_ids' et 'profiles' doivent être des listes"}), 400
+        
+        if not user_ids and not inline_profiles:
+            return jsonify({"error": "Aucun profil à générer"}), 400
+        
+        if len(user_ids) + len(inline_profiles) > PDF_BATCH_MAX:
+            return jsonify({"error": f"Lot trop volumineux (maximum {PDF_BATCH_MAX} profils)"}), 400
+        
+        if not pdf_generator:
+            return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
+        
+        try:
+            form = get_form(data.get('form_id'))
+        except UnknownFormError:
+            return unknown_form_response(data.get('form_id'))
+        output = data.get('output')
+        if output and output not in OUTPUT_PROFILES:
+            return unknown_output_response(output)
+        
+        if user_ids and not profile_manager:
+            return jsonify({"error": "Gestionnaire de profils non disponible"}), 500
+        
+        # Construire la liste (nom du fichier, profil) avant de commencer le streaming
+        labels = []
+        profiles = []
+        errors = []
+        for user_id in user_ids:
+            profile = profile_manager.load_profile(str(user_id))
+            if not profile:
+                errors.append(f"{user_id}: profil introuvable ou vide")
+                continue
+            labels.append(secure_filename(str(user_id)) or "profil")
+            profiles.append(profile)
+        
+        for position, item in enumerate(inline_profiles, start=1):
+            if not isinstance(item, dict) or not item:
+                errors.append(f"profil #{position}: profil invalide")
+                continue
+            profile = item.get('profile', item) if isinstance(item.get('profile'), dict) else item
+            label = item.get('user_id') or f"profil_{position}"
+            labels.append(secure_filename(str(label)) or f"profil_{position}")
+            profiles.append(profile)
+        
+        # Rendre les noms de fichiers uniques dans l'archive
+        base_name = os.path.splitext(form.output_filename)[0]
+        filenames = []
+        seen = {}
+        for label in labels:
+            seen[label] = seen.get(label, 0) + 1
+            suffix = f"_{seen[label]}" if seen[label] > 1 else ""
+            filenames.append(f"{base_name}_{label}{suffix}.pdf")
+        
+        def archive_entries():
+            for index, success, result in pdf_generator.render_many(profiles, form_id=form.form_id, output=output):
+                if success:
+                    yield filenames[index], result
+                else:
+                    errors.append(f"{filenames[index]}: {result}")
+            if errors:
+                yield "erreurs.txt", "\n".join(errors).encode('utf-8')
+        
+        return Response(
+            stream_zip(archive_entries()),
+            mimetype='application/zip',
+            headers={"Content-Disposition": f"attachment; filename={base_name}_lot.zip"}
+        )
+    
+    except Exception as e:
+        print(f"Erreur lors de la génération du lot de PDFs: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Erreur interne du serveur: {str(e)}"}), 500
+
+# ============================================
+# ENDPOINTS POUR LA GÉNÉRATION PDF ASYNCHRONE
+# ============================================
+
+# Endpoint pour soumettre un job de génération PDF
+@app.route('/api/pdf-jobs', methods=['POST'])
+def api_soumettre_job_pdf():
+    """
+    Crée un job de génération PDF et retourne immédiatement son ID.
+    Si 'doc_id' est fourni, le document est marqué comme rempli une fois le PDF généré.
+    """
+    try:
+        data = request.get_json() or {}
+        user_id = data.get('user_id', 'default_user')
+        doc_id = data.get('doc_id')
+        profile = data.get('profile', None)
+        
+        if not profile:
+            if not profile_manager:
+                return jsonify({"error": "Gestionnaire de profils non disponible"}), 500
+            
+            profile = profile_manager.load_profile(user_id)
+            
+            if not profile:
+                return jsonify({"error": "Profil utilisateur vide. Veuillez remplir votre profil d'abord."}), 400
+        
+        if not pdf_job_manager:
+            return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
+        
+        try:
+            form = get_form(data.get('form_id'))
+        except UnknownFormError:
+            return unknown_form_response(data.get('form_id'))
+        output = data.get('output')
+        if output and output not in OUTPUT_PROFILES:
+            return unknown_output_response(output)
+        
+        job_id = pdf_job_manager.submit(profile, user_id, doc_id, form.form_id, output)
+        if not job_id:
+            return jsonify({"error": "Impossible d'enregistrer le job en base de données"}), 500
+        
+        return jsonify({
+            "job_id": job_id,
+            "statut": "en_attente",
+            "status_url": f"/api/pdf-jobs/{job_id}",
+            "download_url": f"/api/pdf-jobs/{job_id}/download"
+        }), 202
+    
+    except Exception as e:
+        print(f"Erreur lors de la création du job PDF: {e}")
+        return jsonify({"error": f"Erreur interne du serveur: {str(e)}"}), 500
+
+# Endpoint pour consulter l'état d'un job PDF
+@app.route('/api/pdf-jobs/<job_id>', methods=['GET'])
+def api_statut_job_pdf(job_id):
+    try:
+        if not pdf_job_manager:
+            return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
+        
+        job = pdf_job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job introuvable"}), 404
+        
+        if job["statut"] == "termine":
+            job["download_url"] = f"/api/pdf-jobs/{job_id}/download"
+        return jsonify(job), 200
+    except Exception as e:
+        print(f"Erreur lors de la récupération du job PDF: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+# Endpoint pour télécharger le PDF d'un job terminé
+@app.route('/api/pdf-jobs/<job_id>/download', methods=['GET'])
+def api_telecharger_job_pdf(job_id):
+    try:
+        if not pdf_job_manager:
+            return jsonify({"error": "Gestionnaire PDF non disponible"}), 500
+        
+        job = pdf_job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job introuvable"}), 404
+        
+        pdf_path = pdf_job_manager.get_pdf_path(job_id)
+        if not pdf_path:
+            return jsonify({"error": f"PDF non disponible (statut: {job['statut']})"}), 409
+        
+        etag = pdf_job_manager.get_etag(job_id)
+        download_name = get_form(job['form_id']).output_filename
+        response = send_file(pdf_path, as_attachment=True, download_name=download_name, etag=etag or True, conditional=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except Exception as e:
+        print(f"Erreur lors du téléchargement du job PDF: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
 # ============================================
 # ROUTES POUR SERVIR L'INTERFACE FRONTEND
 # ============================================
@@ -575,8 +1321,19 @@ def serve_spa(path):
     return jsonify({"error": "Not found"}), 404
 
 # 7. Lancement du serveur
-if __name__ == '__main__':
+def demarrer_services():
+    """Tâches de démarrage communes à app_server.py et app.py"""
     initialiser_base_de_donnees()
+    if pdf_job_manager:
+        pdf_job_manager.resume_pending_jobs()
+        # Jobs terminés expirés pendant l'arrêt du serveur
+        pdf_job_manager.collect_expired()
+    # Sessions d'envoi expirées pendant l'arrêt du serveur
+    upload_session_manager.collect_expired()
+
+
+if __name__ == '__main__':
+    demarrer_services()
     print(f"\n[INFO] Dossier de documents configuré : {DATA_FOLDER_PATH}\n")
     # Lancement du serveur Flask sur le port 5001 avec waitress (compatible Windows)
     from waitress import serve
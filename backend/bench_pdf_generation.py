@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la génération PDF (render_cerfa et PDFGenerator.generate_pdf_bytes).
+
+Scénarios : démarrage à froid, rendu unitaire à chaud, profils de sortie
+(fillable/flattened/compact : taille et temps de rendu), rendus concurrents
+(1/4/16 threads) et lots de 100 à 1000 profils. Chaque scénario rapporte les
+latences p50/p95/p99, le débit et le pic de mémoire (RSS). Les résultats sont
+sauvegardés en JSON pour comparer les commits entre eux.
+
+Usage :
+    python backend/bench_pdf_generation.py
+    python backend/bench_pdf_generation.py --quick
+    python backend/bench_pdf_generation.py --threads 1,4,16 --batch-sizes 100,1000 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import threading
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PDF_GEN_PATH = os.path.join(SCRIPT_DIR, 'pdf_generation')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'bench_results')
+
+sys.path.insert(0, SCRIPT_DIR)
+
+from profile_schema import AVAILABLE_FIELDS
+from pdf_generation.main import render_cerfa, CERFA_IMAGE_PATH, OUTPUT_PROFILES
+from pdf_generator import PDFGenerator, ISOLATION_INPROCESS, ISOLATION_SUBPROCESS
+from pdf_worker_pool import PDFWorkerPool
+
+
+# --- PROFILS SYNTHÉTIQUES ---
+def make_synthetic_profile(rng):
+    """Construit un profil aléatoire mais valide à partir de AVAILABLE_FIELDS"""
+    profile = {}
+    for field_name, spec in AVAILABLE_FIELDS.items():
+        field_type = spec.get("type")
+        if field_type == "select":
+            profile[field_name] = rng.choice(spec.get("options") or [""])
+        elif field_type == "checkbox":
+            profile[field_name] = rng.choice(["true", "false"])
+        elif field_type == "date":
+            profile[field_name] = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2010)}"
+        elif field_type == "email":
+            profile[field_name] = f"user{rng.randint(0, 10**6)}@example.com"
+        elif field_type == "tel":
+            profile[field_name] = "06 " + " ".join(f"{rng.randint(0, 99):02d}" for _ in range(4))
+        elif field_type == "number":
+            profile[field_name] = str(rng.randint(1, 200))
+        else:
+            placeholder = spec.get("placeholder") or field_name
+            profile[field_name] = f"{placeholder} {rng.randint(0, 10**6)}"
+    return profile
+
+
+# --- MESURES ---
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses enfants terminés (Mo), None si indisponible"""
+    if resource is None:
+        return None
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(max(self_rss, children_rss) / divisor, 1)
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * p)))]
+
+
+def summarize(name, latencies, elapsed, extra=None):
+    """Résumé d'un scénario : latences en ms, débit en PDFs/s, pic RSS en Mo"""
+    result = {
+        "scenario": name,
+        "count": len(latencies),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            "p95": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "p99": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            "max": round(max(latencies) * 1000, 2) if latencies else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if extra:
+        result.update(extra)
+    lat = result["latency_ms"]
+    print(f"  {name:<40} n={result['count']:<5} p50={lat['p50']}ms p95={lat['p95']}ms "
+          f"p99={lat['p99']}ms débit={result['throughput_per_s']}/s RSS={result['peak_rss_mb']}Mo")
+    return result
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+# --- SCÉNARIOS ---
+def bench_cold_start(repeat):
+    """Processus Python neuf : import du moteur + chargement du modèle + premier rendu"""
+    code = (
+        "import sys, json; sys.path.insert(0, %r); "
+        "from pdf_generation.main import render_cerfa; "
+        "render_cerfa(json.loads(sys.argv[1]), invariant=True)"
+    ) % SCRIPT_DIR
+    profile = json.dumps(make_synthetic_profile(random.Random(0)))
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        elapsed, result = timed(subprocess.run, [sys.executable, "-c", code, profile], capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', 'replace'))
+        latencies.append(elapsed)
+    return summarize("cold_start (nouveau processus)", latencies, time.perf_counter() - start)
+
+
+def bench_warm_render(profiles):
+    """render_cerfa à chaud dans le processus courant"""
+    render_cerfa(profiles[0], CERFA_IMAGE_PATH, invariant=True)  # chauffe
+    latencies = []
+    sizes = []
+    start = time.perf_counter()
+    for profile in profiles:
+        elapsed, pdf_bytes = timed(render_cerfa, profile, CERFA_IMAGE_PATH, invariant=True)
+        latencies.append(elapsed)
+        sizes.append(len(pdf_bytes))
+    return summarize("warm_render (render_cerfa)", latencies, time.perf_counter() - start,
+                     {"avg_pdf_bytes": int(sum(sizes) / len(sizes))})
+
+
+def bench_output_profiles(profiles):
+    """render_cerfa à chaud pour chaque profil de sortie : temps de rendu et taille du PDF"""
+    results = []
+    for output in OUTPUT_PROFILES:
+        render_cerfa(profiles[0], CERFA_IMAGE_PATH, invariant=True, output=output)  # chauffe (ré-échantillonnage compris)
+        latencies = []
+        sizes = []
+        start = time.perf_counter()
+        for profile in profiles:
+            elapsed, pdf_bytes = timed(render_cerfa, profile, CERFA_IMAGE_PATH, invariant=True, output=output)
+            latencies.append(elapsed)
+            sizes.append(len(pdf_bytes))
+        avg_bytes = int(sum(sizes) / len(sizes))
+        result = summarize(f"output_profile ({output})", latencies, time.perf_counter() - start,
+                           {"output": output, "avg_pdf_bytes": avg_bytes})
+        print(f"  {'':<40} taille moyenne={avg_bytes / 1024:.1f}Ko")
+        results.append(result)
+    return results
+
+
+def bench_generator_single(generator, profiles, label):
+    """PDFGenerator.generate_pdf_bytes en séquentiel (sans cache)"""
+    generator.generate_pdf_bytes(profiles[0], "bench")  # chauffe
+    latencies = []
+    start = time.perf_counter()
+    for profile in profiles:
+        elapsed, (success, result) = timed(generator.generate_pdf_bytes, profile, "bench")
+        if not success:
+            raise RuntimeError(result)
+        latencies.append(elapsed)
+    return summarize(f"generate_pdf_bytes ({label})", latencies, time.perf_counter() - start)
+
+
+def bench_concurrent(generator, profiles, threads):
+    """generate_pdf_bytes appelé depuis plusieurs threads (comme des requêtes waitress)"""
+    latencies = []
+    lock = threading.Lock()
+    errors = []
+    work = list(profiles)
+
+    def worker():
+        while True:
+            with lock:
+                if not work:
+                    return
+                profile = work.pop()
+            try:
+                elapsed, (success, result) = timed(generator.generate_pdf_bytes, profile, "bench")
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                if success:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(result)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(f"concurrent ({threads} threads)", latencies, time.perf_counter() - start,
+                     {"threads": threads, "errors": len(errors)})
+
+
+def bench_batch(generator, size, rng):
+    """PDFGenerator.render_many sur un lot de profils (chemin de /api/generate-pdf/batch)"""
+    profiles = [make_synthetic_profile(rng) for _ in range(size)]
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    last = start
+    for _, success, _ in generator.render_many(profiles):
+        now = time.perf_counter()
+        # Latence = temps entre deux PDFs reçus, comme vu par le client du ZIP
+        latencies.append(now - last)
+        last = now
+        if not success:
+            errors += 1
+    return summarize(f"batch ({size} profils)", latencies, time.perf_counter() - start,
+                     {"batch_size": size, "errors": errors})
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la génération PDF")
+    parser.add_argument("--iterations", type=int, default=50, help="Rendus par scénario unitaire/concurrent")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="Nombre de démarrages à froid")
+    parser.add_argument("--threads", default="1,4,16", help="Niveaux de concurrence, séparés par des virgules")
+    parser.add_argument("--batch-sizes", default="100,1000", help="Tailles de lot, séparées par des virgules")
+    parser.add_argument("--workers", type=int, default=None, help="Processus du pool (défaut: PDF_POOL_WORKERS)")
+    parser.add_argument("--subprocess", action="store_true", help="Mesurer aussi le mode isolé (sous-processus)")
+    parser.add_argument("--quick", action="store_true", help="Exécution rapide (petits effectifs)")
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.quick:
+        args.iterations = 10
+        args.cold_repeat = 1
+        args.batch_sizes = "20"
+
+    thread_levels = [int(t) for t in args.threads.split(',') if t.strip()]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',') if b.strip()]
+    rng = random.Random(args.seed)
+    profiles = [make_synthetic_profile(rng) for _ in range(args.iterations)]
+
+    print(f"📊 Benchmark génération PDF ({args.iterations} rendus par scénario)")
+    results = []
+
+    results.append(bench_cold_start(args.cold_repeat))
+    results.append(bench_warm_render(profiles))
+    results.extend(bench_output_profiles(profiles))
+
+    # Générateurs sans cache : on mesure le rendu, pas le cache
+    inprocess = PDFGenerator(PDF_GEN_PATH, PROJECT_ROOT, isolation=ISOLATION_INPROCESS)
+    results.append(bench_generator_single(inprocess, profiles, "dans le processus"))
+
+    pool = PDFWorkerPool(max_workers=args.workers, max_queue=max(thread_levels + [16]))
+    pooled = PDFGenerator(PDF_GEN_PATH, PROJECT_ROOT, isolation=ISOLATION_INPROCESS, pool=pool)
+    try:
+        results.append(bench_generator_single(pooled, profiles, f"pool {pool.max_workers} processus"))
+        for threads in thread_levels:
+            results.append(bench_concurrent(pooled, profiles, threads))
+        for size in batch_sizes:
+            results.append(bench_batch(pooled, size, rng))
+    finally:
+        pool.shutdown()
+
+    if args.subprocess:
+        isolated = PDFGenerator(PDF_GEN_PATH, PROJECT_ROOT, isolation=ISOLATION_SUBPROCESS)
+        results.append(bench_generator_single(isolated, profiles[:max(3, args.iterations // 5)], "sous-processus"))
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pool_workers": pool.max_workers,
+        "iterations": args.iterations,
+        "results": results,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join(DEFAULT_OUTPUT_DIR, f"pdf_generation_{report['commit'] or 'local'}_{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Résultats sauvegardés: {output}")
+
+
+if __name__ == "__main__":
+    main()
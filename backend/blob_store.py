@@ -0,0 +1,187 @@
+import os
+import uuid
+import hashlib
+import threading
+
+# Taille des blocs lus dans le flux d'upload
+CHUNK_SIZE = 1024 * 1024
+# Sous-dossiers par préfixe du hash : <root>/ab/cd/abcd...  (256 x 256 dossiers)
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def is_sha256(name):
+    """Vrai si name est un hash SHA-256 hexadécimal (nom d'un blob)"""
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
+
+
+class BlobUpload:
+    """Fichier reçu dans le dossier temporaire du store, pas encore publié"""
+
+    def __init__(self, temp_path, sha256, size):
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.size = size
+
+
+class BlobStore:
+    """
+    Stockage des fichiers envoyés, adressé par le contenu (SHA-256).
+
+    Un même contenu n'est écrit qu'une fois sur le disque, quel que soit le nom
+    sous lequel il est envoyé : le nom d'origine est une métadonnée du document.
+    Le nombre de documents qui référencent chaque blob est tenu en base (table
+    blobs de gestion_db) ; un blob n'est supprimé du disque que lorsque plus aucun
+    document ne le référence.
+
+    Les blobs sont répartis dans deux niveaux de sous-dossiers nommés d'après le
+    début du hash, pour qu'aucun dossier ne contienne des centaines de milliers de
+    fichiers. Les blobs écrits à plat par les versions précédentes (<root>/<sha256>)
+    restent lisibles jusqu'à leur déplacement par migrate_storage_layout.py.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Dossier des blobs (un fichier par contenu, nommé par son hash)
+        """
+        self.root = root
+        self.temp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+        # Sérialise la publication et la suppression des blobs (voir publish et remove_unreferenced)
+        self._lock = threading.Lock()
+        # Blobs encore à plat à la racine : chemins résolus dans les deux dispositions
+        self.flat_layout_pending = self._has_flat_blobs()
+        self.stored = 0
+        self.deduplicated = 0
+        self.removed = 0
+
+    def _has_flat_blobs(self):
+        with os.scandir(self.root) as entries:
+            return any(is_sha256(entry.name) and entry.is_file() for entry in entries)
+
+    def sharded_path(self, sha256):
+        """Emplacement du blob dans la disposition en sous-dossiers"""
+        prefixes = [sha256[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+        return os.path.join(self.root, *prefixes, sha256)
+
+    def flat_path(self, sha256):
+        """Emplacement du blob dans l'ancienne disposition à plat"""
+        return os.path.join(self.root, sha256)
+
+    def path(self, sha256):
+        """Chemin du blob sur le disque (ancienne disposition à plat si le blob n'a pas encore été déplacé)"""
+        path = self.sharded_path(sha256)
+        if self.flat_layout_pending and not os.path.exists(path) and os.path.exists(self.flat_path(sha256)):
+            return self.flat_path(sha256)
+        return path
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def receive(self, stream):
+        """
+        Copie un flux dans le dossier temporaire en calculant son hash au passage.
+
+        Returns:
+            BlobUpload à publier (publish) une fois le document enregistré en base,
+            ou à abandonner (discard) en cas d'erreur
+        """
+        temp_path = os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.part")
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            self._remove(temp_path)
+            raise
+        return BlobUpload(temp_path, sha.hexdigest(), size)
+
+    def publish(self, upload):
+        """
+        Publie le blob reçu, après l'enregistrement du document en base.
+
+        Si le contenu est déjà stocké, le fichier temporaire est simplement supprimé.
+
+        Returns:
+            True si le blob a été écrit, False s'il existait déjà (doublon)
+        """
+        with self._lock:
+            if self.exists(upload.sha256):
+                self._remove(upload.temp_path)
+                self.deduplicated += 1
+                return False
+            path = self.sharded_path(upload.sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(upload.temp_path, path)
+            self.stored += 1
+            return True
+
+    def migrate_flat_blob(self, sha256):
+        """
+        Déplace un blob de l'ancienne disposition à plat vers son sous-dossier.
+
+        Le déplacement est un renommage sur le même disque : le blob reste lisible
+        par path() avant comme après.
+
+        Returns:
+            True si le blob a été déplacé
+        """
+        with self._lock:
+            flat = self.flat_path(sha256)
+            if not os.path.exists(flat):
+                return False
+            path = self.sharded_path(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                self._remove(flat)
+            else:
+                os.replace(flat, path)
+            return True
+
+    def discard(self, upload):
+        """Abandonne un blob reçu (enregistrement en base impossible)"""
+        self._remove(upload.temp_path)
+
+    def remove_unreferenced(self, sha256_list, is_referenced):
+        """
+        Supprime du disque les blobs qui ne sont plus référencés.
+
+        Un upload du même contenu peut avoir lieu entre la suppression des documents
+        et celle des fichiers : chaque blob est revérifié en base (is_referenced) sous
+        le verrou qui protège aussi publish.
+
+        Returns:
+            Nombre de blobs supprimés
+        """
+        removed = 0
+        with self._lock:
+            for sha256 in sha256_list:
+                if is_referenced(sha256):
+                    continue
+                # Les deux emplacements : le blob peut ne pas avoir encore été migré
+                removed_flat = self._remove(self.flat_path(sha256))
+                if self._remove(self.sharded_path(sha256)) or removed_flat:
+                    removed += 1
+            self.removed += removed
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self):
+        """Compteurs du stockage (pour /api/metrics)"""
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "removed": self.removed,
+        }
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Vérifie les compteurs de documents de /api/stats (table compteurs_documents).
+
+Recompte les documents à partir de zéro, affiche les compteurs incohérents et
+les remplace par les valeurs recalculées. Avec --check, la base n'est pas
+modifiée et le script échoue (code 1) si un compteur est faux.
+
+Usage :
+    python backend/check_counters.py
+    python backend/check_counters.py --check
+    python backend/check_counters.py --db /chemin/vers/pro.db
+"""
+
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import gestion_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcule les compteurs de documents")
+    parser.add_argument("--check", action="store_true", help="Vérifier seulement, sans corriger")
+    parser.add_argument("--db", default=None, help="Base à vérifier (défaut: data/pro.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        gestion_db.utiliser_base(args.db)
+    if not os.path.exists(gestion_db.DB_NAME):
+        print(f"🛑 Base introuvable : {gestion_db.DB_NAME}")
+        sys.exit(1)
+    # Crée la table et les triggers sur une base qui ne les a pas encore
+    gestion_db.initialiser_base_de_donnees()
+
+    ecarts = gestion_db.recalculer_compteurs_documents(corriger=not args.check)
+    if ecarts is None:
+        sys.exit(1)
+
+    if not ecarts:
+        print("✅ Compteurs cohérents avec la table documents")
+        return
+
+    for cle, (enregistre, recalcule) in ecarts.items():
+        print(f"  {'🛑' if args.check else '🔧'} {cle} : {enregistre} enregistré, {recalcule} recalculé")
+    if args.check:
+        print(f"🛑 {len(ecarts)} compteur(s) incohérent(s)")
+        sys.exit(1)
+    print(f"✅ {len(ecarts)} compteur(s) corrigé(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Vérifie les plans d'exécution SQLite des requêtes des endpoints documents.
+
+Crée une base temporaire de N documents (1 000 000 par défaut) avec le schéma de
+initialiser_base_de_donnees(), exécute les fonctions de gestion_db utilisées par
+les endpoints en capturant leurs requêtes, puis affiche EXPLAIN QUERY PLAN pour
+chacune. Échoue (code 1) si une requête parcourt la table sans index ou trie
+dans un B-tree temporaire.
+
+Usage :
+    python backend/check_query_plans.py
+    python backend/check_query_plans.py --rows 100000 --keep /tmp/plans.db
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import gestion_db
+
+# Parcours complet de la table (sans index) ou tri hors index
+FULL_SCAN = re.compile(r'^SCAN documents$|^SCAN documents USING ROWID|USE TEMP B-TREE')
+
+CATEGORIES = ("Documents archivés", "Documents supportés", "Factures", "Identité")
+
+
+def remplir(conn, rows):
+    """Insère `rows` documents répartis sur plusieurs catégories et sur ~1 an"""
+    conn.execute(
+        """
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO documents (nom_fichier, chemin_local, categorie, date_ajout, date_ajout_ts, is_signed, is_filled)
+        SELECT 'doc_' || i || '.pdf',
+               '//localhost/data/doc_' || i || '.pdf',
+               CASE i % 4 WHEN 0 THEN ? WHEN 1 THEN ? WHEN 2 THEN ? ELSE ? END,
+               datetime(1700000000 + i * 30, 'unixepoch'),
+               1700000000 + i * 30,
+               i % 2,
+               i % 5 = 0
+        FROM n
+        """,
+        (rows, *CATEGORIES)
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def capturer_requetes(conn, appel):
+    """Exécute `appel` et retourne les requêtes SQL (valeurs incluses) envoyées à SQLite"""
+    requetes = []
+    gestion_db.invalider_cache_lectures()  # mesurer la requête, pas le cache des lectures
+    conn.set_trace_callback(requetes.append)
+    try:
+        appel()
+    finally:
+        conn.set_trace_callback(None)
+    return [r for r in requetes if r.lstrip().upper().startswith("SELECT")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN des requêtes des endpoints documents")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Nombre de documents générés")
+    parser.add_argument("--keep", default=None, help="Conserver la base générée à ce chemin")
+    args = parser.parse_args()
+
+    db_path = args.keep or os.path.join(tempfile.mkdtemp(prefix="plans_"), "plans.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db_par_defaut = gestion_db.DB_NAME
+    gestion_db.utiliser_base(db_path)
+    gestion_db.initialiser_base_de_donnees()
+    conn = gestion_db.obtenir_connexion()
+
+    start = time.perf_counter()
+    remplir(conn, args.rows)
+    print(f"📂 {args.rows} documents générés dans {db_path} ({time.perf_counter() - start:.1f}s)\n")
+
+    endpoints = [
+        ("GET /api/documents/all", lambda: gestion_db.recuperer_tous_documents()),
+        ("GET /api/documents/<categorie>", lambda: gestion_db.recuperer_documents_par_categorie("Factures")),
+        ("GET /api/documents/all?limit=50", lambda: gestion_db.recuperer_page_documents(limite=50)),
+        ("GET /api/documents/all?limit=50&cursor=...", lambda: gestion_db.recuperer_page_documents(
+            limite=50, curseur=gestion_db.encoder_curseur(1700000000 + args.rows * 15, args.rows // 2))),
+        ("GET /api/documents/<categorie>?limit=50&cursor=...", lambda: gestion_db.recuperer_page_documents(
+            "Factures", limite=50, curseur=gestion_db.encoder_curseur(1700000000 + args.rows * 15, args.rows // 2))),
+        ("GET /api/documents/recents", lambda: gestion_db.recuperer_4_derniers_documents()),
+        ("GET /api/documents/stats", lambda: gestion_db.recuperer_stats()),
+        ("GET /api/documents/preview/<id>", lambda: gestion_db.recuperer_document_par_id(args.rows // 2)),
+    ]
+
+    echecs = 0
+    for endpoint, appel in endpoints:
+        start = time.perf_counter()
+        requetes = capturer_requetes(conn, appel)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"▶ {endpoint} ({elapsed:.1f} ms)")
+        for requete in requetes:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + requete)]
+            mauvais = [ligne for ligne in plan if FULL_SCAN.search(ligne)]
+            echecs += bool(mauvais)
+            print(f"  {'🛑' if mauvais else '✅'} {' '.join(requete.split())[:110]}")
+            for ligne in plan:
+                print(f"       {ligne}")
+        print()
+
+    gestion_db.utiliser_base(db_par_defaut)
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        os.rmdir(os.path.dirname(db_path))
+
+    if echecs:
+        print(f"🛑 {echecs} requête(s) avec un parcours complet ou un tri temporaire")
+        sys.exit(1)
+    print("✅ Aucun parcours complet de table ni tri temporaire")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteConnectionManager:
+    """
+    Connexions SQLite réutilisables, une par thread.
+
+    Chaque thread (waitress, jobs PDF, ...) garde sa connexion ouverte au lieu d'en
+    ouvrir une par requête. La base est en mode WAL : les lectures ne sont plus
+    bloquées par une écriture en cours, et un écrivain attend (busy_timeout) au
+    lieu d'échouer immédiatement avec "database is locked".
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=None, cache_size_kb=None, mmap_size_mb=None, synchronous=None):
+        """
+        Args:
+            db_path: Chemin du fichier SQLite
+            busy_timeout_ms: Attente maximale d'un verrou en écriture (DB_BUSY_TIMEOUT_MS, défaut: 5000)
+            cache_size_kb: Cache de pages par connexion (DB_CACHE_SIZE_KB, défaut: 16384)
+            mmap_size_mb: Taille de la projection mémoire du fichier (DB_MMAP_SIZE_MB, défaut: 256)
+            synchronous: Niveau de synchronisation disque (DB_SYNCHRONOUS, défaut: NORMAL,
+                sûr en mode WAL : seule la dernière transaction peut être perdue en cas de coupure)
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms or int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+        self.cache_size_kb = cache_size_kb or int(os.environ.get('DB_CACHE_SIZE_KB', '16384'))
+        self.mmap_size_mb = mmap_size_mb if mmap_size_mb is not None else int(os.environ.get('DB_MMAP_SIZE_MB', '256'))
+        self.synchronous = synchronous or os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> connexion, pour fermer celles des threads terminés
+        self.opened = 0
+        self.reused = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False  # seulement pour pouvoir la fermer depuis un autre thread
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size_mb * 1024 * 1024}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self):
+        """
+        Connexion du thread courant (ouverte au premier appel).
+
+        S'utilise comme `with manager.connection() as conn:` : la transaction est
+        validée en sortie du bloc, annulée en cas d'exception; la connexion reste ouverte.
+        """
+        conn = getattr(self._local, 'conn', None)
+        # Après un fork, la connexion héritée du parent ne doit pas être réutilisée
+        if conn is not None and self._local.pid == os.getpid() and self._local.path == self.db_path:
+            self.reused += 1
+            return conn
+
+        conn = self._open()
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._local.path = self.db_path
+        with self._lock:
+            self.opened += 1
+            self._close_dead_threads()
+            self._connections[threading.current_thread()] = conn
+        return conn
+
+    def _close_dead_threads(self):
+        """Ferme les connexions des threads terminés (appelé avec le verrou)"""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+            except sqlite3.Error:
+                pass
+
+    def close_all(self):
+        """Ferme toutes les connexions (arrêt du serveur, changement de fichier)"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+    def stats(self):
+        """Compteurs des connexions (pour /api/metrics)"""
+        with self._lock:
+            return {
+                "open_connections": len(self._connections),
+                "opened": self.opened,
+                "reused": self.reused,
+                "journal_mode": "wal",
+                "synchronous": self.synchronous,
+                "cache_size_kb": self.cache_size_kb,
+                "mmap_size_mb": self.mmap_size_mb,
+                "busy_timeout_ms": self.busy_timeout_ms,
+            }
@@ -0,0 +1,231 @@
+import os
+import time
+import hashlib
+import datetime
+import threading
+
+from gestion_db import (
+    recuperer_inventaire_dossiers, recuperer_inventaire_fichiers, enregistrer_inventaire_dossiers,
+    supprimer_inventaire_dossiers, supprimer_inventaire_fichiers, marquer_inventaire_verifie,
+    date_inventaire, rapport_reconciliation, blob_est_reference, date_vers_ts,
+    ZONE_BLOB, ZONE_DATA, ZONE_SIGNATURE
+)
+from blob_store import CHUNK_SIZE, is_sha256
+
+# Dossiers relus enregistrés par transaction
+INVENTORY_BATCH_DIRS = 500
+# Âge maximal de l'inventaire avant une mise à jour automatique (diagnostic, rapport)
+FILE_INVENTORY_MAX_AGE = int(os.environ.get('FILE_INVENTORY_MAX_AGE', '300'))
+
+
+def _hash_fichier(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def est_fichier_de_base(nom):
+    """Fichiers de la base SQLite (pro.db, -wal, -shm, ...), hors inventaire"""
+    return '.db' in nom or '.sqlite' in nom
+
+
+class FileInventory:
+    """
+    Inventaire persistant des fichiers de data/ (taille, date de modification, hash).
+
+    L'inventaire est tenu en base (tables inventaire_* de gestion_db) et mis à jour
+    de façon incrémentale avec os.scandir :
+    - un dossier de blobs dont la date de modification n'a pas changé n'a ni gagné
+      ni perdu de fichier, et un blob n'est jamais réécrit : il n'est pas relu ;
+    - dans data/ et data/signatures/, seuls les fichiers dont la taille ou la date
+      de modification ont changé sont re-hachés.
+    Le rapport de réconciliation (fichiers orphelins ou manquants) est une requête
+    sur ces tables : il ne relit pas le disque.
+    """
+
+    def __init__(self, data_folder, blob_store, signatures_folder=None):
+        """
+        Args:
+            data_folder: Dossier des données (data/)
+            blob_store: BlobStore dont les blobs sont inventoriés
+            signatures_folder: Dossier des signatures (défaut: data/signatures)
+        """
+        self.data_folder = data_folder
+        self.blob_store = blob_store
+        self.signatures_folder = signatures_folder or os.path.join(data_folder, 'signatures')
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        self.files_hashed = 0
+
+    def _relatif(self, path):
+        """Chemin relatif à data/ ("" pour data/ lui-même), tel qu'enregistré dans l'inventaire"""
+        relatif = os.path.relpath(path, self.data_folder)
+        return "" if relatif == "." else relatif
+
+    def refresh(self):
+        """
+        Met à jour l'inventaire; si une mise à jour est déjà en cours, attend sa fin.
+
+        Returns:
+            Statistiques de la mise à jour (dossiers listés ou sautés, fichiers hachés, durée)
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def age(self):
+        """Âge de l'inventaire en secondes (None s'il n'a jamais été construit)"""
+        date_scan_ts = date_inventaire()
+        if date_scan_ts is None:
+            return None
+        return date_vers_ts(datetime.datetime.now()) - date_scan_ts
+
+    def ensure_fresh(self, max_age=None):
+        """Met à jour l'inventaire s'il est plus ancien que max_age secondes (FILE_INVENTORY_MAX_AGE)"""
+        max_age = FILE_INVENTORY_MAX_AGE if max_age is None else max_age
+        age = self.age()
+        if age is None or age > max_age:
+            self.refresh()
+
+    def _refresh(self):
+        start = time.perf_counter()
+        listed = skipped = hashed = 0
+        date_scan_ts = date_vers_ts(datetime.datetime.now())
+        connus = recuperer_inventaire_dossiers()
+        if connus is None:
+            return None
+        # Sous-dossiers connus de chaque dossier (pour parcourir un dossier inchangé sans le lister)
+        enfants = {}
+        for chemin in connus:
+            enfants.setdefault(os.path.dirname(chemin), []).append(chemin)
+
+        vus = set()
+        mises_a_jour = []
+        a_parcourir = [
+            (self.data_folder, ZONE_DATA),
+            (self.signatures_folder, ZONE_SIGNATURE),
+            (self.blob_store.root, ZONE_BLOB),
+        ]
+        while a_parcourir:
+            dossier, zone = a_parcourir.pop()
+            relatif = self._relatif(dossier)
+            try:
+                mtime_ns = os.stat(dossier).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            vus.add(relatif)
+
+            # Les blobs ne sont jamais modifiés : dossier inchangé => contenu inchangé
+            if zone == ZONE_BLOB and connus.get(relatif) == mtime_ns:
+                skipped += 1
+                a_parcourir.extend((os.path.join(self.data_folder, c), zone) for c in enfants.get(relatif, []))
+                continue
+
+            listed += 1
+            inventorie = recuperer_inventaire_fichiers(relatif)
+            modifies = []
+            presents = set()
+            with os.scandir(dossier) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        # data/ : seuls signatures/ et blobs/ (parcourus à part) ; blobs/ : pas les fichiers en cours d'envoi
+                        if zone == ZONE_BLOB and entry.path != self.blob_store.temp_dir:
+                            a_parcourir.append((entry.path, zone))
+                        continue
+                    if zone == ZONE_DATA and est_fichier_de_base(entry.name):
+                        continue
+                    if zone == ZONE_BLOB and not is_sha256(entry.name):
+                        continue
+                    presents.add(entry.name)
+                    stat = entry.stat()
+                    ancien = inventorie.get(entry.name)
+                    if ancien and ancien[0] == stat.st_size and ancien[1] == stat.st_mtime_ns:
+                        continue
+                    if zone == ZONE_BLOB:
+                        sha256 = entry.name
+                    else:
+                        try:
+                            sha256 = _hash_fichier(entry.path)
+                        except OSError:
+                            continue
+                        hashed += 1
+                    modifies.append((entry.name, stat.st_size, stat.st_mtime_ns, sha256))
+
+            disparus = [nom for nom in inventorie if nom not in presents]
+            mises_a_jour.append((relatif, zone, mtime_ns, modifies, disparus))
+            if len(mises_a_jour) >= INVENTORY_BATCH_DIRS:
+                enregistrer_inventaire_dossiers(mises_a_jour, date_scan_ts)
+                mises_a_jour = []
+
+        if mises_a_jour:
+            enregistrer_inventaire_dossiers(mises_a_jour, date_scan_ts)
+
+        disparus = [chemin for chemin in connus if chemin not in vus]
+        if disparus:
+            supprimer_inventaire_dossiers(disparus)
+        marquer_inventaire_verifie(date_scan_ts)
+
+        self.refreshes += 1
+        self.dirs_listed += listed
+        self.dirs_skipped += skipped
+        self.files_hashed += hashed
+        return {
+            "dossiers_listes": listed,
+            "dossiers_inchanges": skipped,
+            "fichiers_haches": hashed,
+            "duree_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def report(self, limit=100):
+        """Rapport de réconciliation base/disque (voir gestion_db.rapport_reconciliation)"""
+        return rapport_reconciliation(limit)
+
+    def repair(self):
+        """
+        Supprime les fichiers orphelins : blobs qu'aucun document ne référence et
+        signatures de documents supprimés.
+
+        Les documents sans fichier et les fichiers de data/ non référencés ne sont
+        que signalés : aucun fichier d'origine ne permet de les réparer, et un
+        fichier déposé à la main dans data/ peut être importé (init_db_with_documents.py).
+
+        Returns:
+            Nombre de fichiers supprimés, ou None si le rapport est indisponible
+        """
+        rapport = rapport_reconciliation(limite=-1)
+        if rapport is None:
+            return None
+        supprimes = 0
+
+        # Revérifié en base sous le verrou du BlobStore : un envoi du même contenu peut avoir eu lieu
+        blobs = rapport["blobs_orphelins"]["exemples"]
+        supprimes += self.blob_store.remove_unreferenced([b['sha256'] for b in blobs], blob_est_reference)
+
+        signatures = rapport["signatures_orphelines"]["exemples"]
+        for signature in signatures:
+            try:
+                os.remove(os.path.join(self.data_folder, signature['chemin']))
+                supprimes += 1
+            except FileNotFoundError:
+                pass
+
+        supprimer_inventaire_fichiers(
+            [b['chemin'] for b in blobs if not os.path.exists(os.path.join(self.data_folder, b['chemin']))]
+            + [s['chemin'] for s in signatures]
+        )
+        return supprimes
+
+    def stats(self):
+        """Compteurs de l'inventaire (pour /api/metrics)"""
+        return {
+            "refreshes": self.refreshes,
+            "dirs_listed": self.dirs_listed,
+            "dirs_skipped": self.dirs_skipped,
+            "files_hashed": self.files_hashed,
+            "age": self.age(),
+        }
@@ -0,0 +1,229 @@
+import os
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date
+from werkzeug.wsgi import wrap_file
+
+# Taille des blocs lus pour les plages et les réponses multipart
+CHUNK_SIZE = 256 * 1024
+# Au-delà, une demande de plages multiples est servie en entier (200)
+MAX_RANGES = 16
+
+
+class DocumentFileServer:
+    """
+    Envoi des fichiers de documents (ouverture, prévisualisation, téléchargement).
+
+    - ETag fort : hash SHA-256 du contenu (nom du blob, ou hash calculé une fois
+      pour les fichiers historiques de data/)
+    - Last-Modified et réponses 304 (If-None-Match, If-Modified-Since)
+    - Plages d'octets : 206 pour une plage, multipart/byteranges pour plusieurs,
+      416 si aucune n'est satisfiable; If-Range est respecté
+    - Le fichier entier, ou une plage unique, est transmis par wsgi.file_wrapper
+      quand le serveur WSGI le fournit (envoi sans copie par sendfile selon le
+      serveur). La longueur envoyée est bornée par Content-Length (PEP 3333).
+    """
+
+    def __init__(self, max_hashes=1024, cache_control='private, no-cache'):
+        """
+        Args:
+            max_hashes: Nombre de hash de fichiers historiques gardés en mémoire
+            cache_control: En-tête Cache-Control des réponses (le navigateur garde le
+                fichier et le revalide à chaque ouverture : 304 s'il n'a pas changé)
+        """
+        self.cache_control = cache_control
+        self.max_hashes = max_hashes
+        self._hashes = OrderedDict()  # (chemin, taille, mtime_ns) -> sha256
+        self._lock = threading.Lock()
+        self.full = 0
+        self.partial = 0
+        self.multipart = 0
+        self.not_modified = 0
+        self.unsatisfiable = 0
+
+    def _hash(self, path, stat):
+        """SHA-256 d'un fichier sans hash enregistré, calculé une fois par version du fichier"""
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            sha256 = self._hashes.get(key)
+            if sha256:
+                self._hashes.move_to_end(key)
+                return sha256
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+        with self._lock:
+            self._hashes[key] = sha.hexdigest()
+            while len(self._hashes) > self.max_hashes:
+                self._hashes.popitem(last=False)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _not_modified(etag, mtime):
+        # If-None-Match l'emporte sur If-Modified-Since (RFC 9110, 13.2.2)
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag
+        if request.if_modified_since:
+            return int(mtime) <= request.if_modified_since.timestamp()
+        return False
+
+    @staticmethod
+    def _if_range_matches(etag, mtime):
+        valeur = request.headers.get('If-Range')
+        if not valeur:
+            return True
+        if valeur.startswith('"'):
+            # Comparaison forte : une plage n'est valable que pour ce contenu exact
+            return valeur == f'"{etag}"'
+        date = parse_date(valeur)
+        return date is not None and int(mtime) == int(date.timestamp())
+
+    @staticmethod
+    def _ranges(header, size):
+        """
+        Plages demandées, triées et fusionnées : liste de (début, fin exclue).
+
+        Returns:
+            None si l'en-tête est absent ou invalide (fichier entier), [] si aucune plage n'est satisfiable
+        """
+        if not header or not header.startswith('bytes='):
+            return None
+        ranges = []
+        try:
+            for spec in header[len('bytes='):].split(','):
+                debut, tiret, fin = spec.strip().partition('-')
+                if not tiret:
+                    return None
+                if debut == '':
+                    # Suffixe : les N derniers octets
+                    longueur = int(fin)
+                    if longueur > 0 and size > 0:
+                        ranges.append((max(0, size - longueur), size))
+                    continue
+                debut = int(debut)
+                if fin and int(fin) < debut:
+                    return None
+                fin = int(fin) + 1 if fin else size
+                if debut < size:
+                    ranges.append((debut, min(fin, size)))
+        except ValueError:
+            return None
+
+        fusionnees = []
+        for debut, fin in sorted(ranges):
+            if fusionnees and debut <= fusionnees[-1][1]:
+                fusionnees[-1] = (fusionnees[-1][0], max(fin, fusionnees[-1][1]))
+            else:
+                fusionnees.append((debut, fin))
+        return fusionnees
+
+    @staticmethod
+    def _read_range(path, debut, fin):
+        with open(path, 'rb') as f:
+            f.seek(debut)
+            reste = fin - debut
+            while reste > 0:
+                chunk = f.read(min(CHUNK_SIZE, reste))
+                if not chunk:
+                    break
+                reste -= len(chunk)
+                yield chunk
+
+    def send(self, path, mimetype, sha256=None):
+        """
+        Réponse Flask qui envoie le fichier path, selon les en-têtes conditionnels et Range de la requête.
+
+        Args:
+            path: Chemin du fichier (issu de la base, jamais de l'URL seule)
+            mimetype: Type MIME du fichier
+            sha256: Hash du contenu s'il est connu (blob); sinon il est calculé
+
+        Raises:
+            FileNotFoundError: Si le fichier n'existe pas
+        """
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = sha256 or self._hash(path, stat)
+        headers = {
+            'ETag': f'"{etag}"',
+            'Last-Modified': http_date(int(stat.st_mtime)),
+            'Cache-Control': self.cache_control,
+            'Accept-Ranges': 'bytes',
+        }
+
+        if self._not_modified(etag, stat.st_mtime):
+            self.not_modified += 1
+            return Response(status=304, headers=headers)
+
+        ranges = None
+        if self._if_range_matches(etag, stat.st_mtime):
+            ranges = self._ranges(request.headers.get('Range'), size)
+        if ranges is not None and len(ranges) > MAX_RANGES:
+            ranges = None
+
+        if ranges == []:
+            self.unsatisfiable += 1
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+        if ranges is None or len(ranges) == 1:
+            debut, fin = ranges[0] if ranges else (0, size)
+            f = open(path, 'rb')
+            f.seek(debut)
+            if fin == size or 'wsgi.file_wrapper' in request.environ:
+                # Le serveur n'envoie pas plus que Content-Length : le fichier n'a pas à être tronqué
+                body = wrap_file(request.environ, f, CHUNK_SIZE)
+            else:
+                f.close()
+                body = self._read_range(path, debut, fin)
+            response = Response(body, status=206 if ranges else 200, mimetype=mimetype,
+                                headers=headers, direct_passthrough=True)
+            response.content_length = fin - debut
+            if ranges:
+                response.headers['Content-Range'] = f'bytes {debut}-{fin - 1}/{size}'
+                self.partial += 1
+            else:
+                self.full += 1
+            return response
+
+        # Plusieurs plages : multipart/byteranges
+        boundary = uuid.uuid4().hex
+        entetes = [
+            (f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+             f'Content-Range: bytes {debut}-{fin - 1}/{size}\r\n\r\n').encode('latin-1')
+            for debut, fin in ranges
+        ]
+        fin_multipart = f'--{boundary}--\r\n'.encode('latin-1')
+
+        def parties():
+            for entete, (debut, fin) in zip(entetes, ranges):
+                yield entete
+                yield from self._read_range(path, debut, fin)
+                yield b'\r\n'
+            yield fin_multipart
+
+        response = Response(parties(), status=206, mimetype=f'multipart/byteranges; boundary={boundary}',
+                            headers=headers, direct_passthrough=True)
+        response.content_length = (
+            sum(len(entete) + (fin - debut) + 2 for entete, (debut, fin) in zip(entetes, ranges)) + len(fin_multipart)
+        )
+        self.multipart += 1
+        return response
+
+    def stats(self):
+        """Compteurs des envois de fichiers (pour /api/metrics)"""
+        with self._lock:
+            hashes = len(self._hashes)
+        return {
+            "full": self.full,
+            "partial": self.partial,
+            "multipart": self.multipart,
+            "not_modified": self.not_modified,
+            "unsatisfiable": self.unsatisfiable,
+            "cached_hashes": hashes,
+        }
@@ -1,36 +1,353 @@
 import sqlite3
 import datetime 
+import calendar
+import base64
+import json
 import os
 
+from db_connection import SQLiteConnectionManager
+from query_cache import QueryCache, UncachedResult
+
 # Chemin vers la base de données (chemin absolu pour éviter les problèmes relatifs)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 DB_NAME = os.path.join(PROJECT_ROOT, 'data', 'pro.db') 
 
-def supprimer_document(doc_id: int):
+# Une connexion SQLite par thread, réutilisée d'un appel à l'autre (WAL, voir db_connection.py)
+_connexions = SQLiteConnectionManager(DB_NAME)
+
+# Cache des lectures fréquentes (catégories, statistiques, documents récents, ...),
+# invalidé par chaque fonction d'écriture (voir query_cache.py). Une lecture en
+# erreur lève UncachedResult avec sa valeur de repli, qui n'est pas gardée.
+_cache_lectures = QueryCache(
+    max_entries=int(os.environ.get('DB_QUERY_CACHE_ENTRIES', '1024')),
+    ttl=float(os.environ.get('DB_QUERY_CACHE_TTL', '30'))
+)
+
+
+def obtenir_connexion():
+    """Retourne la connexion du thread courant (ouverte au premier appel, jamais fermée après usage)."""
+    return _connexions.connection()
+
+
+def liberer_connexion(conn):
+    """Fin d'utilisation : annule la transaction laissée ouverte par une erreur, la connexion reste ouverte."""
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def date_vers_ts(date):
+    """
+    Horodatage entier triable d'une date (secondes depuis l'epoch).
+
+    La date locale est lue telle quelle, comme le fait strftime('%s', date_ajout) en SQL :
+    les lignes converties par la migration et les nouvelles lignes se trient ensemble.
+    """
+    return calendar.timegm(date.timetuple())
+
+
+def utiliser_base(db_path):
+    """Change de fichier de base de données (scripts de maintenance, vérifications)."""
+    global DB_NAME
+    DB_NAME = db_path
+    _connexions.close_all()
+    _connexions.db_path = db_path
+    _cache_lectures.clear()
+
+
+def invalider_cache_lectures():
+    """Signale une modification des données : les lectures en cache ne sont plus servies."""
+    _cache_lectures.invalidate()
+
+
+# Catégorie des documents archivés (les autres sont "supportés")
+CATEGORIE_ARCHIVES = "Documents archivés"
+
+# Compteurs de la table compteurs_documents (plus un compteur "categorie:<nom>" par catégorie)
+COMPTEUR_TOTAL = "total"
+COMPTEUR_SIGNES = "signes"
+COMPTEUR_NON_SIGNES = "non_signes"
+PREFIXE_COMPTEUR_CATEGORIE = "categorie:"
+
+# Recherche plein texte : poids BM25 des colonnes de documents_fts (nom, catégorie, texte du PDF)
+POIDS_RECHERCHE = (10.0, 5.0, 1.0)
+# Nombre de correspondances (les plus récentes) classées par pertinence : borne le temps
+# de réponse quand un mot très courant correspond à presque toute la bibliothèque
+FENETRE_RECHERCHE = int(os.environ.get('SEARCH_RANK_WINDOW', '5000'))
+
+# Pagination des listes de documents (voir recuperer_page_documents)
+TAILLE_PAGE_DEFAUT = 50
+TAILLE_PAGE_MAX = 500
+
+# Zones de l'inventaire : blobs du stockage par hash, fichiers historiques de data/, signatures
+ZONE_BLOB = "blob"
+ZONE_DATA = "data"
+ZONE_SIGNATURE = "signature"
+
+
+def statistiques_connexions():
+    """Compteurs des connexions SQLite (pour /api/metrics)."""
+    return _connexions.stats()
+
+
+def statistiques_cache_lectures():
+    """Compteurs du cache des lectures (pour /api/metrics)."""
+    return _cache_lectures.stats()
+
+
+def _maj_compteur(cle_sql, delta_sql):
+    """Instruction d'un trigger qui ajoute delta_sql au compteur cle_sql (créé à 0 s'il n'existe pas)"""
+    return f"""
+            INSERT INTO compteurs_documents (cle, valeur) VALUES ({cle_sql}, {delta_sql})
+            ON CONFLICT(cle) DO UPDATE SET valeur = valeur + excluded.valeur;"""
+
+
+def creer_compteurs_documents(cursor):
+    """
+    Crée la table compteurs_documents et les triggers qui la maintiennent.
+
+    Chaque INSERT, DELETE ou UPDATE (is_signed, categorie) sur documents ajuste les
+    compteurs dans la même transaction : /api/stats lit quelques lignes au lieu de
+    compter toute la table. Les scripts qui écrivent directement dans la base
+    (migrations, init_db_with_documents) sont aussi pris en compte.
+
+    Returns:
+        True si la table vient d'être créée (elle doit alors être remplie)
     """
-    Supprime un enregistrement de document de la base de données par son ID.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'compteurs_documents'")
+    nouvelle_table = cursor.fetchone() is None
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS compteurs_documents (
+        cle TEXT PRIMARY KEY,
+        valeur INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    """)
+
+    categorie_new = f"'{PREFIXE_COMPTEUR_CATEGORIE}' || NEW.categorie"
+    categorie_old = f"'{PREFIXE_COMPTEUR_CATEGORIE}' || OLD.categorie"
+    triggers = {
+        "documents_compteurs_insert": ("AFTER INSERT ON documents", "", [
+            _maj_compteur(f"'{COMPTEUR_TOTAL}'", "1"),
+            _maj_compteur(f"'{COMPTEUR_SIGNES}'", "NEW.is_signed IS 1"),
+            _maj_compteur(f"'{COMPTEUR_NON_SIGNES}'", "NEW.is_signed IS 0"),
+            _maj_compteur(categorie_new, "1"),
+        ]),
+        "documents_compteurs_delete": ("AFTER DELETE ON documents", "", [
+            _maj_compteur(f"'{COMPTEUR_TOTAL}'", "-1"),
+            _maj_compteur(f"'{COMPTEUR_SIGNES}'", "-(OLD.is_signed IS 1)"),
+            _maj_compteur(f"'{COMPTEUR_NON_SIGNES}'", "-(OLD.is_signed IS 0)"),
+            _maj_compteur(categorie_old, "-1"),
+        ]),
+        "documents_compteurs_signature": (
+            "AFTER UPDATE OF is_signed ON documents", "WHEN OLD.is_signed IS NOT NEW.is_signed", [
+            _maj_compteur(f"'{COMPTEUR_SIGNES}'", "(NEW.is_signed IS 1) - (OLD.is_signed IS 1)"),
+            _maj_compteur(f"'{COMPTEUR_NON_SIGNES}'", "(NEW.is_signed IS 0) - (OLD.is_signed IS 0)"),
+        ]),
+        "documents_compteurs_categorie": (
+            "AFTER UPDATE OF categorie ON documents", "WHEN OLD.categorie IS NOT NEW.categorie", [
+            _maj_compteur(categorie_old, "-1"),
+            _maj_compteur(categorie_new, "1"),
+        ]),
+    }
+    for nom, (evenement, condition, instructions) in triggers.items():
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {nom}
+        {evenement}
+        {condition}
+        BEGIN{"".join(instructions)}
+        END;
+        """)
+    return nouvelle_table
+
+
+def _compter_documents(cursor):
+    """Compteurs recalculés à partir de la table documents : {cle: valeur}"""
+    cursor.execute(
+        "SELECT COUNT(*), COALESCE(SUM(is_signed IS 1), 0), COALESCE(SUM(is_signed IS 0), 0) FROM documents"
+    )
+    total, signes, non_signes = cursor.fetchone()
+    compteurs = {COMPTEUR_TOTAL: total, COMPTEUR_SIGNES: signes, COMPTEUR_NON_SIGNES: non_signes}
+    cursor.execute("SELECT categorie, COUNT(*) FROM documents GROUP BY categorie")
+    for categorie, nombre in cursor.fetchall():
+        compteurs[PREFIXE_COMPTEUR_CATEGORIE + categorie] = nombre
+    return compteurs
+
+
+def recalculer_compteurs_documents(corriger=True):
+    """
+    Recompte les documents et compare le résultat à la table compteurs_documents.
+
+    Args:
+        corriger: Si True, remplace les compteurs par les valeurs recalculées
+
+    Returns:
+        Dictionnaire {cle: (valeur enregistrée, valeur recalculée)} des compteurs
+        incohérents (vide si tout est cohérent), ou None en cas d'erreur.
     """
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
-        
-        # Requête DELETE : utilise l'ID pour identifier la ligne
-        suppression_query = "DELETE FROM documents WHERE id = ?"
-        
-        cursor.execute(suppression_query, (doc_id,))
+        # Verrou d'écriture : aucun document ne peut changer entre le comptage et la correction
+        cursor.execute("BEGIN IMMEDIATE")
+
+        attendus = _compter_documents(cursor)
+        cursor.execute("SELECT cle, valeur FROM compteurs_documents")
+        enregistres = {row[0]: row[1] for row in cursor.fetchall()}
+
+        ecarts = {}
+        for cle in sorted(set(attendus) | set(enregistres)):
+            if enregistres.get(cle, 0) != attendus.get(cle, 0):
+                ecarts[cle] = (enregistres.get(cle, 0), attendus.get(cle, 0))
+
+        if corriger:
+            cursor.execute("DELETE FROM compteurs_documents")
+            cursor.executemany(
+                "INSERT INTO compteurs_documents (cle, valeur) VALUES (?, ?)",
+                list(attendus.items())
+            )
         conn.commit()
-        
-        # Vérifie si une ligne a été affectée (si l'ID existait)
-        return cursor.rowcount > 0 
+        invalider_cache_lectures()
+        return ecarts
 
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la suppression du document ID {doc_id} : {e}")
-        return False
+        print(f"🛑 Erreur lors du recalcul des compteurs de documents : {e}")
+        return None
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
+
+
+def creer_index_recherche(cursor):
+    """
+    Crée l'index plein texte documents_fts (FTS5) et les triggers qui le synchronisent.
+
+    L'index contient le nom du fichier, la catégorie et le texte extrait des PDFs
+    (colonne contenu, renseignée par ajouter_document ou indexer_contenu_document).
+    Son rowid est l'id du document : les triggers ajoutent, renomment et suppriment
+    les entrées avec les documents, y compris pour les opérations groupées.
+
+    Returns:
+        True si l'index vient d'être créé (les documents existants y sont alors ajoutés)
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'")
+    nouvel_index = cursor.fetchone() is None
+
+    # remove_diacritics : "facture" trouve "Facturé"; '_', '-' et '.' séparent les mots des noms de fichiers
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        nom_fichier, categorie, contenu,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_insert
+    AFTER INSERT ON documents
+    BEGIN
+        INSERT INTO documents_fts (rowid, nom_fichier, categorie, contenu)
+        VALUES (NEW.id, NEW.nom_fichier, NEW.categorie, '');
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_delete
+    AFTER DELETE ON documents
+    BEGIN
+        DELETE FROM documents_fts WHERE rowid = OLD.id;
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_fts_update
+    AFTER UPDATE OF nom_fichier, categorie ON documents
+    BEGIN
+        UPDATE documents_fts SET nom_fichier = NEW.nom_fichier, categorie = NEW.categorie
+        WHERE rowid = NEW.id;
+    END;
+    """)
+
+    if nouvel_index:
+        cursor.execute("""
+        INSERT INTO documents_fts (rowid, nom_fichier, categorie, contenu)
+        SELECT id, nom_fichier, categorie, '' FROM documents
+        """)
+    return nouvel_index
+
+
+def creer_table_blobs(cursor):
+    """
+    Crée la table blobs (contenus du stockage par hash) et les triggers qui tiennent
+    son compteur de références.
+
+    Un blob est référencé par chaque document dont blob_sha256 vaut son hash : les
+    triggers ajustent refcount à chaque INSERT, DELETE ou changement de blob_sha256.
+    Les blobs à 0 référence sont retirés par supprimer_documents, qui renvoie leurs
+    hash pour que l'appelant supprime les fichiers.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha256 TEXT PRIMARY KEY,
+        taille INTEGER NOT NULL,
+        refcount INTEGER NOT NULL DEFAULT 0,
+        date_creation DATETIME
+    ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_blobs_insert
+    AFTER INSERT ON documents
+    WHEN NEW.blob_sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.blob_sha256;
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_blobs_delete
+    AFTER DELETE ON documents
+    WHEN OLD.blob_sha256 IS NOT NULL
+    BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.blob_sha256;
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS documents_blobs_update
+    AFTER UPDATE OF blob_sha256 ON documents
+    WHEN OLD.blob_sha256 IS NOT NEW.blob_sha256
+    BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.blob_sha256;
+        UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.blob_sha256;
+    END;
+    """)
+
+
+def creer_tables_inventaire(cursor):
+    """
+    Crée les tables de l'inventaire des fichiers de data/ (voir file_inventory.py).
+
+    inventaire_fichiers garde la taille, la date de modification et le hash de
+    chaque fichier ; inventaire_dossiers la date de modification de chaque dossier
+    parcouru, pour ne pas relister un dossier de blobs qui n'a pas changé. Le
+    rapport de réconciliation compare ces tables aux documents sans relire le disque.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS inventaire_fichiers (
+        chemin TEXT PRIMARY KEY,
+        dossier TEXT NOT NULL,
+        nom TEXT NOT NULL,
+        zone TEXT NOT NULL,
+        taille INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT
+    ) WITHOUT ROWID;
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventaire_dossier ON inventaire_fichiers (dossier)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventaire_zone_sha ON inventaire_fichiers (zone, sha256)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventaire_zone_nom ON inventaire_fichiers (zone, nom)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS inventaire_dossiers (
+        chemin TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        date_scan_ts INTEGER
+    ) WITHOUT ROWID;
+    """)
+
 
 def initialiser_base_de_donnees():
     """Crée le fichier DB et les tables 'documents' et 'categories' s'ils n'existent pas."""
@@ -39,7 +356,7 @@ def initialiser_base_de_donnees():
         # Assurez-vous que le répertoire 'data' existe
         os.makedirs(os.path.dirname(DB_NAME), exist_ok=True)
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
         
         # Créer la table 'categories'
@@ -63,8 +380,10 @@ def initialiser_base_de_donnees():
             chemin_local TEXT NOT NULL,
             categorie TEXT NOT NULL,
             date_ajout DATETIME,
+            date_ajout_ts INTEGER,
             is_signed BOOLEAN DEFAULT 0,
-            is_filled BOOLEAN DEFAULT 0
+            is_filled BOOLEAN DEFAULT 0,
+            blob_sha256 TEXT
         );
         """
         cursor.execute(creation_table_query)
@@ -84,11 +403,120 @@ def initialiser_base_de_donnees():
             conn.commit()
             print("[OK] Colonne 'is_filled' ajoutée à la table 'documents'.")
         
+        # Ajouter la colonne blob_sha256 (contenu du fichier dans le stockage par hash, NULL : fichier data/<nom_fichier>)
+        if 'blob_sha256' not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN blob_sha256 TEXT")
+            conn.commit()
+            print("[OK] Colonne 'blob_sha256' ajoutée à la table 'documents'.")
+        
+        # Ajouter la colonne date_ajout_ts (date d'ajout en entier, triable) et la remplir
+        if 'date_ajout_ts' not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN date_ajout_ts INTEGER")
+            conn.commit()
+            print("[OK] Colonne 'date_ajout_ts' ajoutée à la table 'documents'.")
+        cursor.execute(
+            "UPDATE documents SET date_ajout_ts = COALESCE(CAST(strftime('%s', date_ajout) AS INTEGER), 0) "
+            "WHERE date_ajout_ts IS NULL"
+        )
+        if cursor.rowcount > 0:
+            print(f"[OK] {cursor.rowcount} date(s) d'ajout converties en horodatage.")
+        conn.commit()
+        
+        # Les scripts qui insèrent directement date_ajout (init_db_with_documents, ...) restent triables
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS documents_date_ajout_ts
+        AFTER INSERT ON documents
+        WHEN NEW.date_ajout_ts IS NULL
+        BEGIN
+            UPDATE documents
+            SET date_ajout_ts = COALESCE(CAST(strftime('%s', NEW.date_ajout) AS INTEGER), 0)
+            WHERE id = NEW.id;
+        END;
+        """)
+        
+        # Index des listes (par catégorie ou non, triées par date) et des statistiques
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_categorie_date ON documents (categorie, date_ajout_ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date_ajout_ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_is_signed ON documents (is_signed)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_nom ON documents (nom_fichier)")
+        # Documents d'un blob (références, rapport de réconciliation)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_blob ON documents (blob_sha256)")
+        conn.commit()
+        
+        # Blobs du stockage par hash et leurs références (voir creer_table_blobs)
+        creer_table_blobs(cursor)
+        conn.commit()
+        
+        # Compteurs de /api/stats, tenus à jour par des triggers (voir creer_compteurs_documents)
+        if creer_compteurs_documents(cursor):
+            conn.commit()
+            recalculer_compteurs_documents()
+            print("[OK] Table 'compteurs_documents' créée et initialisée.")
+        conn.commit()
+        
+        # Inventaire des fichiers de data/ (voir creer_tables_inventaire)
+        creer_tables_inventaire(cursor)
+        conn.commit()
+        
+        # Index de recherche plein texte (voir creer_index_recherche)
+        if creer_index_recherche(cursor):
+            print("[OK] Index de recherche 'documents_fts' créé (texte des PDFs : voir index_documents_text.py).")
+        conn.commit()
+        
+        # Créer la table 'pdf_jobs' (génération PDF asynchrone)
+        creation_jobs_query = """
+        CREATE TABLE IF NOT EXISTS pdf_jobs (
+            id TEXT PRIMARY KEY,
+            statut TEXT NOT NULL,
+            user_id TEXT,
+            doc_id INTEGER,
+            form_id TEXT,
+            profil_sortie TEXT,
+            profil_json TEXT NOT NULL,
+            chemin_pdf TEXT,
+            erreur TEXT,
+            date_creation DATETIME,
+            date_maj DATETIME
+        );
+        """
+        cursor.execute(creation_jobs_query)
+        conn.commit()
+        
+        # Créer la table 'upload_sessions' (envois de fichiers par morceaux, reprenables)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            nom_fichier TEXT NOT NULL,
+            categorie TEXT NOT NULL,
+            taille INTEGER NOT NULL,
+            sha256 TEXT,
+            recu INTEGER NOT NULL DEFAULT 0,
+            date_creation DATETIME,
+            expiration_ts INTEGER NOT NULL,
+            doc_id INTEGER
+        );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_upload_sessions_expiration ON upload_sessions (expiration_ts)")
+        # Document créé par la finalisation (NULL tant que l'envoi n'est pas terminé)
+        cursor.execute("PRAGMA table_info(upload_sessions)")
+        if 'doc_id' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE upload_sessions ADD COLUMN doc_id INTEGER")
+        conn.commit()
+        
+        # Ajouter les colonnes form_id et profil_sortie si elles n'existent pas (NULL = valeur par défaut)
+        cursor.execute("PRAGMA table_info(pdf_jobs)")
+        job_columns = [column[1] for column in cursor.fetchall()]
+        for job_column in ('form_id', 'profil_sortie'):
+            if job_column not in job_columns:
+                cursor.execute(f"ALTER TABLE pdf_jobs ADD COLUMN {job_column} TEXT")
+                conn.commit()
+                print(f"[OK] Colonne '{job_column}' ajoutée à la table 'pdf_jobs'.")
+        
         # Initialiser les catégories par défaut si la table est vide
         cursor.execute("SELECT COUNT(*) FROM categories")
         if cursor.fetchone()[0] == 0:
             default_categories = [
-                ("Documents archivés", "Documents archivés"),
+                (CATEGORIE_ARCHIVES, CATEGORIE_ARCHIVES),
                 ("Documents supportés", "Documents supportés"),
             ]
             for nom, description in default_categories:
@@ -103,6 +531,7 @@ def initialiser_base_de_donnees():
             conn.commit()
             print("[OK] Catégories par défaut initialisées.")
         
+        invalider_cache_lectures()
         print(f"[OK] Base de données '{DB_NAME}' initialisée avec succès.")
 
     except sqlite3.Error as e:
@@ -110,19 +539,19 @@ def initialiser_base_de_donnees():
     except Exception as e:
         print(f"[ERREUR] Erreur système lors de l'initialisation : {e}")
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
 
 def marquer_document_signe(doc_id: int):
     """Marque un document comme signé."""
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
         
         update_query = "UPDATE documents SET is_signed = 1 WHERE id = ?"
         cursor.execute(update_query, (doc_id,))
         conn.commit()
+        invalider_cache_lectures()
         
         return cursor.rowcount > 0
     
@@ -130,19 +559,19 @@ def marquer_document_signe(doc_id: int):
         print(f"🛑 Erreur lors de la mise à jour du document ID {doc_id} : {e}")
         return False
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
 
 def marquer_document_rempli(doc_id: int):
     """Marque un document comme rempli."""
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
         
         update_query = "UPDATE documents SET is_filled = 1 WHERE id = ?"
         cursor.execute(update_query, (doc_id,))
         conn.commit()
+        invalider_cache_lectures()
         
         return cursor.rowcount > 0
     
@@ -150,275 +579,1326 @@ def marquer_document_rempli(doc_id: int):
         print(f"🛑 Erreur lors de la mise à jour du document ID {doc_id} : {e}")
         return False
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
 
-def ajouter_document(nom, chemin, categorie):
-    """Ajoute un enregistrement de document."""
+def ajouter_document(nom, chemin, categorie, contenu=None, blob_sha256=None, taille=None):
+    """
+    Ajoute un enregistrement de document.
+
+    contenu : texte extrait du fichier, ajouté à l'index de recherche dans la même transaction.
+    blob_sha256, taille : contenu du fichier dans le stockage par hash (le blob est
+    enregistré s'il est nouveau, sinon seule sa référence est ajoutée).
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
         
         insertion_query = """
-        INSERT INTO documents (nom_fichier, chemin_local, categorie, date_ajout)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO documents (nom_fichier, chemin_local, categorie, date_ajout, date_ajout_ts, blob_sha256)
+        VALUES (?, ?, ?, ?, ?, ?)
         """
+        maintenant = datetime.datetime.now()
         data = (
             nom,
             chemin,
             categorie,
             # Correction de la syntaxe de datetime
-            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") 
+            maintenant.strftime("%Y-%m-%d %H:%M:%S"),
+            date_vers_ts(maintenant),
+            blob_sha256
         )
+        
+        # Le compteur de références du blob est incrémenté par trigger à l'insertion du document
+        if blob_sha256:
+            cursor.execute(
+                "INSERT OR IGNORE INTO blobs (sha256, taille, refcount, date_creation) VALUES (?, ?, 0, ?)",
+                (blob_sha256, taille or 0, maintenant.strftime("%Y-%m-%d %H:%M:%S"))
+            )
 
         # Exécute la requête
         cursor.execute(insertion_query, data)
-        conn.commit()
-        
         # Récupère l'ID du document inséré
         doc_id = cursor.lastrowid
+        
+        # Le nom et la catégorie sont indexés par trigger, le texte du fichier ici
+        if contenu:
+            cursor.execute("UPDATE documents_fts SET contenu = ? WHERE rowid = ?", (contenu, doc_id))
+        conn.commit()
+        invalider_cache_lectures()
+        
         return doc_id
 
     except sqlite3.Error as e:
         print(f"🛑 Erreur lors de l'ajout du document '{nom}' : {e}")
         return False
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
 
-def recuperer_documents_par_categorie(categorie):
-    """Récupère tous les documents pour une catégorie donnée."""
+# --- RECHERCHE PLEIN TEXTE ---
+def indexer_contenu_document(doc_id, contenu):
+    """Remplace le texte indexé d'un document (réindexation). Retourne True si le document existe."""
     conn = None
-    documents = []
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        conn = obtenir_connexion()
         cursor = conn.cursor()
-
-        select_query = """
-        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
-        FROM documents
-        WHERE categorie = ?
-        ORDER BY date_ajout DESC
-        """
-        
-        # Utilise la catégorie pour filtrer
-        cursor.execute(select_query, (categorie,))
-        documents = [dict(row) for row in cursor.fetchall()]
+        cursor.execute("UPDATE documents_fts SET contenu = ? WHERE rowid = ?", (contenu or '', doc_id))
+        conn.commit()
+        invalider_cache_lectures()
+        return cursor.rowcount > 0
 
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la récupération pour la catégorie '{categorie}' : {e}")
-        
+        print(f"🛑 Erreur lors de l'indexation du document ID {doc_id} : {e}")
+        return False
     finally:
-        if conn:
-            conn.close()
-            
-    return documents
+        liberer_connexion(conn)
 
-def recuperer_document_par_id(doc_id):
-    """Récupère un document spécifique par son ID"""
+
+def optimiser_index_recherche():
+    """Fusionne les segments de l'index plein texte (après une indexation en masse)."""
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        select_query = """
-        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
-        FROM documents
-        WHERE id = ?
-        """
-        
-        cursor.execute(select_query, (doc_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return dict(result)
-        return None
+        conn = obtenir_connexion()
+        conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        conn.commit()
+        return True
 
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la récupération du document {doc_id} : {e}")
-        return None
-        
+        print(f"🛑 Erreur lors de l'optimisation de l'index de recherche : {e}")
+        return False
     finally:
-        if conn:
-            conn.close()
+        liberer_connexion(conn)
 
-def recuperer_tous_documents():
-    """
-    Récupère TOUS les documents de la base de données, peu importe la catégorie.
-    """
+
+def recuperer_documents_sans_contenu(extension='.pdf'):
+    """Documents dont le texte n'est pas encore indexé : [{"id", "nom_fichier", "blob_sha256"}, ...]"""
     conn = None
-    documents = []
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        conn = obtenir_connexion()
         cursor = conn.cursor()
-
-        select_query = """
-        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
-        FROM documents
-        ORDER BY date_ajout DESC
-        """
-        
-        cursor.execute(select_query)
-        documents = [dict(row) for row in cursor.fetchall()]
-
-        return documents
+        cursor.execute(
+            """
+            SELECT d.id, d.nom_fichier, d.blob_sha256
+            FROM documents_fts f JOIN documents d ON d.id = f.rowid
+            WHERE f.contenu = '' AND lower(d.nom_fichier) LIKE ?
+            ORDER BY d.id
+            """,
+            ('%' + extension,)
+        )
+        return [dict(row) for row in cursor.fetchall()]
 
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la récupération de tous les documents : {e}")
+        print(f"🛑 Erreur lors de la récupération des documents à indexer : {e}")
         return []
     finally:
-        if conn:
-            conn.close()
-            
-    return documents
+        liberer_connexion(conn)
 
-def recuperer_4_derniers_documents():
+
+def requete_fts(texte, prefixe=True, tous=True):
     """
-    Récupère les 4 documents les plus récemment ajoutés, quelle que soit leur catégorie.
-    Ceci est utilisé pour l'aperçu sur la page d'accueil (Dashboard).
+    Requête FTS5 à partir du texte saisi par l'utilisateur.
+
+    Tous les mots doivent être présents (un seul si tous=False) ; le dernier est un
+    préfixe ("fact" trouve "facture") pour la recherche pendant la saisie, sauf si
+    prefixe=False. Les mots
+    sont entre guillemets : la syntaxe FTS5 (AND, NEAR, *, ...) saisie par
+    l'utilisateur n'est pas interprétée. Retourne None si le texte ne contient aucun mot.
+    """
+    mots = [mot.replace('"', '""') for mot in str(texte).split()]
+    mots = [f'"{mot}"' for mot in mots if any(c.isalnum() for c in mot)]
+    if not mots:
+        return None
+    if prefixe:
+        mots[-1] += '*'
+    return (" " if tous else " OR ").join(mots)
+
+
+@_cache_lectures.cached
+def rechercher_documents(texte, limite=TAILLE_PAGE_DEFAUT, offset=0, categorie=None):
     """
+    Recherche les documents dont le nom, la catégorie ou le texte contient tous les mots de `texte`.
+
+    Les résultats sont classés par pertinence (BM25, le nom pèse plus que la
+    catégorie, elle-même plus que le texte du PDF) puis du plus récent au plus ancien.
+    Seules les FENETRE_RECHERCHE correspondances les plus récentes sont classées.
+
+    Args:
+        texte: Mots recherchés
+        limite: Nombre maximal de résultats (borné à TAILLE_PAGE_MAX)
+        offset: Nombre de résultats à sauter (pages suivantes)
+        categorie: Restreindre la recherche à une catégorie
+
+    Returns:
+        Tuple (documents, next_offset) ; chaque document a en plus "score" et
+        "extrait" (passage du texte contenant les mots, entre [ ]). next_offset vaut
+        None s'il n'y a pas d'autre page.
+    """
+    requete = requete_fts(texte)
+    if requete is None:
+        return [], None
+    limite = max(1, min(int(limite), TAILLE_PAGE_MAX))
+    offset = max(0, int(offset))
+    if offset >= FENETRE_RECHERCHE:
+        return [], None
+
+    # 1. Correspondances les plus récentes (rowid = id, croissant avec la date d'ajout),
+    #    classées sur l'index seul ; les colonnes ne sont lues que pour la page
+    poids = ", ".join(str(p) for p in POIDS_RECHERCHE)
+    jointure_categorie = "JOIN documents c ON c.id = f.rowid AND c.categorie = ?" if categorie is not None else ""
+    select_query = f"""
+    WITH candidats AS (
+        SELECT f.rowid AS id, bm25(documents_fts, {poids}) AS score
+        FROM documents_fts f {jointure_categorie}
+        WHERE documents_fts MATCH ?
+        ORDER BY f.rowid DESC
+        LIMIT ?
+    ), page AS (
+        SELECT id, score FROM candidats
+        ORDER BY score, id DESC
+        LIMIT ? OFFSET ?
+    )
+    SELECT d.id, d.nom_fichier, d.chemin_local, d.categorie, d.date_ajout, d.is_signed, d.is_filled, page.score
+    FROM page JOIN documents d ON d.id = page.id
+    ORDER BY page.score, page.id DESC
+    """
+    params = ([categorie] if categorie is not None else []) + [requete, FENETRE_RECHERCHE, limite + 1, offset]
+
     conn = None
     documents = []
     try:
-        conn = sqlite3.connect(DB_NAME)
-        # Permet d'accéder aux colonnes par leur nom (comme un dictionnaire)
-        conn.row_factory = sqlite3.Row 
+        conn = obtenir_connexion()
         cursor = conn.cursor()
-
-        select_query = """
-        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
-        FROM documents
-        ORDER BY date_ajout DESC
-        LIMIT 4
-        """
-        
-        # Exécute la requête sans filtre spécifique
-        cursor.execute(select_query)
-        # Convertit les lignes (sqlite3.Row) en une liste de dictionnaires/objets
+        cursor.execute(select_query, params)
         documents = [dict(row) for row in cursor.fetchall()]
 
+        next_offset = None
+        if len(documents) > limite:
+            documents = documents[:limite]
+            if offset + limite < FENETRE_RECHERCHE:
+                next_offset = offset + limite
+
+        # 2. Extraits, pour la page seulement. snippet() avec un préfixe relit toutes ses
+        #    variantes à chaque ligne : les mots complets saisis sont surlignés, et un
+        #    document qui n'en contient aucun reçoit le début de son texte.
+        ids = json.dumps([doc['id'] for doc in documents])
+        cursor.execute(
+            """
+            SELECT rowid, snippet(documents_fts, 2, '[', ']', '…', 12)
+            FROM documents_fts
+            WHERE documents_fts MATCH ? AND rowid IN (SELECT value FROM json_each(?))
+            """,
+            (requete_fts(texte, prefixe=False, tous=False), ids)
+        )
+        extraits = {row[0]: row[1] for row in cursor.fetchall()}
+        sans_extrait = [doc['id'] for doc in documents if doc['id'] not in extraits]
+        if sans_extrait:
+            cursor.execute(
+                "SELECT rowid, substr(contenu, 1, 100) FROM documents_fts WHERE rowid IN (SELECT value FROM json_each(?))",
+                (json.dumps(sans_extrait),)
+            )
+            extraits.update({row[0]: row[1] for row in cursor.fetchall()})
+        for doc in documents:
+            doc['extrait'] = extraits.get(doc['id'], '')
+        return documents, next_offset
+
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la récupération des 4 derniers documents : {e}")
-        
+        print(f"🛑 Erreur lors de la recherche '{texte}' : {e}")
+        raise UncachedResult(([], None))
     finally:
-        if conn:
-            conn.close()
-            
-    return documents
+        liberer_connexion(conn)
 
 
-# --- NOUVELLE FONCTION DE DIAGNOSTIC ---
-def diagnostiquer_fichiers_locaux(data_folder_path):
+# --- OPÉRATIONS GROUPÉES ---
+def _booleen(valeur, nom):
+    """Booléen d'un critère de sélection : True/False ou 1/0 (pas de conversion implicite de "false" ou "0")"""
+    if isinstance(valeur, bool):
+        return valeur
+    if isinstance(valeur, int) and valeur in (0, 1):
+        return bool(valeur)
+    raise ValueError(f"'{nom}' doit être un booléen (true ou false)")
+
+
+def _selection_documents(ids=None, categorie=None, is_signed=None, is_filled=None, tous=False):
     """
-    Liste les fichiers présents dans le dossier de données local.
-    Ceci est utilisé pour vérifier la casse et l'existence des fichiers sur le serveur.
+    Clause WHERE (et ses paramètres) d'une sélection de documents.
+
+    Les critères se cumulent (ET). La liste d'ids est passée en un seul paramètre
+    JSON (json_each), sans limite sur le nombre d'ids. Sans aucun critère, la
+    sélection doit être explicitement étendue à tous les documents (tous=True).
+
+    Lève ValueError si la sélection est vide ou mal formée.
     """
-    try:
-        # Liste tous les fichiers et dossiers dans DATA_FOLDER_PATH
-        all_items = os.listdir(data_folder_path)
-        # Filtre pour ne garder que les fichiers (pas les dossiers) et les fichiers pertinents
-        local_files = [item for item in all_items if os.path.isfile(os.path.join(data_folder_path, item)) and not item.startswith('.')]
-        return {
-            "dossier_recherche": data_folder_path,
-            "fichiers_locaux": local_files,
-            "statut": "SUCCÈS"
-        }
-    except FileNotFoundError:
-        return {
-            "dossier_recherche": data_folder_path,
-            "fichiers_locaux": [],
-            "statut": "ERREUR: Dossier de données introuvable par le serveur Python."
-        }
-    except Exception as e:
-        return {
-            "dossier_recherche": data_folder_path,
-            "fichiers_locaux": [],
-            "statut": f"ERREUR INCONNUE: {str(e)}"
-        }
+    conditions = []
+    params = []
+    if ids is not None:
+        ids = [int(doc_id) for doc_id in ids]
+        conditions.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(ids))
+    if categorie is not None:
+        conditions.append("categorie = ?")
+        params.append(categorie)
+    if is_signed is not None:
+        conditions.append("is_signed = ?")
+        params.append(1 if _booleen(is_signed, 'is_signed') else 0)
+    if is_filled is not None:
+        conditions.append("is_filled = ?")
+        params.append(1 if _booleen(is_filled, 'is_filled') else 0)
+    if not conditions and not _booleen(tous, 'tous'):
+        raise ValueError("Aucun document sélectionné (ids, filtre ou tous)")
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
 
 
-def recuperer_toutes_categories():
-    """Récupère toutes les catégories disponibles."""
+def supprimer_documents(**selection):
+    """
+    Supprime en une seule transaction les documents sélectionnés.
+
+    Args:
+        **selection: ids, categorie, is_signed, is_filled ou tous (voir _selection_documents)
+
+    Returns:
+        Tuple (ids supprimés, noms des fichiers data/<nom> qui ne sont plus référencés
+        par aucun document, hash des blobs qui ne sont plus référencés) ; les fichiers
+        sont à supprimer du disque par l'appelant, après la transaction.
+        (None, [], []) en cas d'erreur : rien n'est supprimé.
+        Lève ValueError si la sélection est vide.
+    """
+    where, params = _selection_documents(**selection)
     conn = None
-    categories = []
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        conn = obtenir_connexion()
         cursor = conn.cursor()
 
-        select_query = """
-        SELECT id, nom, description
-        FROM categories
-        ORDER BY nom ASC
-        """
-        
-        cursor.execute(select_query)
-        categories = [dict(row) for row in cursor.fetchall()]
+        cursor.execute(f"DELETE FROM documents {where} RETURNING id, nom_fichier, blob_sha256", params)
+        supprimes = cursor.fetchall()
+        ids = [row[0] for row in supprimes]
+        # Fichiers enregistrés avant le stockage par hash (data/<nom_fichier>)
+        noms = sorted({row[1] for row in supprimes if row[2] is None})
+
+        # Un même fichier peut être référencé par plusieurs documents : ne garder que les orphelins
+        cursor.execute(
+            "SELECT DISTINCT nom_fichier FROM documents "
+            "WHERE blob_sha256 IS NULL AND nom_fichier IN (SELECT value FROM json_each(?))",
+            (json.dumps(noms),)
+        )
+        encore_utilises = {row[0] for row in cursor.fetchall()}
+
+        # Blobs dont la dernière référence vient d'être supprimée (les triggers ont décrémenté refcount)
+        cursor.execute("DELETE FROM blobs WHERE refcount <= 0 RETURNING sha256")
+        blobs = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        invalider_cache_lectures()
+
+        print(f"[OK] {len(ids)} document(s) supprimé(s) de la base, {len(blobs)} blob(s) libéré(s).")
+        return ids, [nom for nom in noms if nom not in encore_utilises], blobs
 
     except sqlite3.Error as e:
-        print(f"🛑 Erreur lors de la récupération des catégories : {e}")
-        
+        print(f"🛑 Erreur lors de la suppression groupée des documents : {e}")
+        return None, [], []
     finally:
-        if conn:
-            conn.close()
-            
-    return categories
+        liberer_connexion(conn)
 
 
-def recuperer_stats():
-    """
-    Récupère les statistiques des documents :
-    - total : nombre total de documents
-    - signes : nombre de documents signés
-    - non_signes : nombre de documents non signés
-    - archives : nombre de documents dans la catégorie "Documents archivés"
-    """
+def blob_est_reference(sha256):
+    """True si le blob est encore enregistré en base (au moins un document le référence)."""
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = obtenir_connexion()
         cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,))
+        return cursor.fetchone() is not None
 
-        # Total de documents
-        cursor.execute("SELECT COUNT(*) FROM documents")
-        total = cursor.fetchone()[0]
-
-        # Nombre de documents signés
-        cursor.execute("SELECT COUNT(*) FROM documents WHERE is_signed = 1")
-        signes = cursor.fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la vérification du blob {sha256} : {e}")
+        # Dans le doute, le fichier est conservé
+        return True
+    finally:
+        liberer_connexion(conn)
 
-        # Nombre de documents non signés
-        cursor.execute("SELECT COUNT(*) FROM documents WHERE is_signed = 0")
-        non_signes = cursor.fetchone()[0]
 
-        # Nombre de documents archivés
-        cursor.execute("SELECT COUNT(*) FROM documents WHERE categorie = 'Documents archivés'")
-        archives = cursor.fetchone()[0]
+def recuperer_noms_fichiers_hors_stockage():
+    """Noms des fichiers de documents encore stockés sous data/<nom_fichier> (sans blob)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT nom_fichier FROM documents WHERE blob_sha256 IS NULL")
+        return [row[0] for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des fichiers hors stockage : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def associer_blob_documents(nom_fichier, blob_sha256, taille):
+    """
+    Rattache au blob blob_sha256 les documents sans blob nommés nom_fichier
+    (migration des fichiers data/<nom_fichier> vers le stockage par hash).
+
+    Returns:
+        Nombre de documents rattachés (None en cas d'erreur)
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        # Le compteur de références est incrémenté par trigger pour chaque document
+        cursor.execute(
+            "INSERT OR IGNORE INTO blobs (sha256, taille, refcount, date_creation) VALUES (?, ?, 0, ?)",
+            (blob_sha256, taille, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        cursor.execute(
+            "UPDATE documents SET blob_sha256 = ? WHERE nom_fichier = ? AND blob_sha256 IS NULL",
+            (blob_sha256, nom_fichier)
+        )
+        rattaches = cursor.rowcount
+        conn.commit()
+        invalider_cache_lectures()
+        return rattaches
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors du rattachement de '{nom_fichier}' au blob {blob_sha256} : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_blob_par_nom_fichier(nom_fichier):
+    """
+    Hash du blob auquel les documents nommés nom_fichier ont été rattachés (None si aucun).
+
+    Lu sans le cache des lectures : la migration vers le stockage par hash tourne
+    dans un autre processus, qui n'invalide pas le cache du serveur.
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT blob_sha256 FROM documents WHERE nom_fichier = ? AND blob_sha256 IS NOT NULL LIMIT 1",
+            (nom_fichier,)
+        )
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération du blob de '{nom_fichier}' : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def _modifier_documents(affectation, valeurs, selection, description):
+    """UPDATE documents SET <affectation> sur la sélection, en une transaction. Retourne le nombre de lignes (None si erreur)."""
+    where, params = _selection_documents(**selection)
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE documents SET {affectation} {where}", list(valeurs) + params)
+        conn.commit()
+        invalider_cache_lectures()
+        return cursor.rowcount
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la mise à jour groupée ({description}) : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def marquer_documents_signes(**selection):
+    """Marque les documents sélectionnés comme signés. Retourne le nombre de documents modifiés (None si erreur)."""
+    return _modifier_documents("is_signed = 1", (), selection, "signature")
+
+
+def marquer_documents_remplis(**selection):
+    """Marque les documents sélectionnés comme remplis. Retourne le nombre de documents modifiés (None si erreur)."""
+    return _modifier_documents("is_filled = 1", (), selection, "remplissage")
+
+
+def deplacer_documents(categorie_cible, **selection):
+    """Déplace les documents sélectionnés dans une catégorie. Retourne le nombre de documents modifiés (None si erreur)."""
+    return _modifier_documents("categorie = ?", (categorie_cible,), selection, "changement de catégorie")
+
+
+def recuperer_documents_par_categorie(categorie):
+    """Récupère tous les documents pour une catégorie donnée."""
+    conn = None
+    documents = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        select_query = """
+        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
+        FROM documents
+        WHERE categorie = ?
+        ORDER BY date_ajout_ts DESC, id DESC
+        """
+        
+        # Utilise la catégorie pour filtrer
+        cursor.execute(select_query, (categorie,))
+        documents = [dict(row) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération pour la catégorie '{categorie}' : {e}")
+        
+    finally:
+        liberer_connexion(conn)
+            
+    return documents
+
+@_cache_lectures.cached
+def recuperer_document_par_id(doc_id):
+    """Récupère un document spécifique par son ID"""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        select_query = """
+        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled, blob_sha256
+        FROM documents
+        WHERE id = ?
+        """
+        
+        cursor.execute(select_query, (doc_id,))
+        result = cursor.fetchone()
+        
+        if result:
+            return dict(result)
+        return None
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération du document {doc_id} : {e}")
+        raise UncachedResult(None)
+        
+    finally:
+        liberer_connexion(conn)
+
+@_cache_lectures.cached
+def recuperer_document_par_nom(nom_fichier):
+    """Récupère le document le plus récent portant ce nom de fichier (None si aucun)"""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled, blob_sha256
+            FROM documents
+            WHERE nom_fichier = ?
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (nom_fichier,)
+        )
+        result = cursor.fetchone()
+        return dict(result) if result else None
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération du document '{nom_fichier}' : {e}")
+        raise UncachedResult(None)
+    finally:
+        liberer_connexion(conn)
+
+def recuperer_tous_documents():
+    """
+    Récupère TOUS les documents de la base de données, peu importe la catégorie.
+    """
+    conn = None
+    documents = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        select_query = """
+        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
+        FROM documents
+        ORDER BY date_ajout_ts DESC, id DESC
+        """
+        
+        cursor.execute(select_query)
+        documents = [dict(row) for row in cursor.fetchall()]
+
+        return documents
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération de tous les documents : {e}")
+        return []
+    finally:
+        liberer_connexion(conn)
+            
+    return documents
+
+def encoder_curseur(date_ajout_ts, doc_id):
+    """Curseur opaque désignant la position (date_ajout_ts, id) du dernier document d'une page."""
+    return base64.urlsafe_b64encode(f"{date_ajout_ts}:{doc_id}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decoder_curseur(curseur):
+    """
+    Position (date_ajout_ts, id) codée dans un curseur.
+
+    Lève ValueError si le curseur est mal formé.
+    """
+    try:
+        texte = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4)).decode('ascii')
+        date_ajout_ts, doc_id = texte.split(':')
+        return int(date_ajout_ts), int(doc_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Curseur invalide: {curseur}") from e
+
+
+@_cache_lectures.cached
+def recuperer_page_documents(categorie=None, limite=TAILLE_PAGE_DEFAUT, curseur=None):
+    """
+    Récupère une page de documents, du plus récent au plus ancien (pagination par curseur).
+
+    La page suivante reprend juste après le dernier document renvoyé, sur
+    (date_ajout_ts, id) : chaque page est lue par l'index sans OFFSET, et un ajout
+    ou une suppression entre deux pages ne décale pas les résultats.
+
+    Args:
+        categorie: Filtrer sur une catégorie (None : tous les documents)
+        limite: Nombre maximal de documents (borné à TAILLE_PAGE_MAX)
+        curseur: next_cursor de la page précédente (None : première page)
+
+    Returns:
+        Tuple (documents, next_cursor) ; next_cursor vaut None sur la dernière page.
+        Lève ValueError si le curseur est invalide.
+    """
+    limite = max(1, min(int(limite), TAILLE_PAGE_MAX))
+    conditions = []
+    params = []
+    if categorie is not None:
+        conditions.append("categorie = ?")
+        params.append(categorie)
+    if curseur:
+        conditions.append("(date_ajout_ts, id) < (?, ?)")
+        params.extend(decoder_curseur(curseur))
+
+    select_query = f"""
+    SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled, date_ajout_ts
+    FROM documents
+    {"WHERE " + " AND ".join(conditions) if conditions else ""}
+    ORDER BY date_ajout_ts DESC, id DESC
+    LIMIT ?
+    """
+    # Une ligne de plus que demandé pour savoir s'il reste une page
+    params.append(limite + 1)
+
+    conn = None
+    documents = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(select_query, params)
+        documents = [dict(row) for row in cursor.fetchall()]
 
-        # Nombre de documents supportés (non archivés)
-        cursor.execute("SELECT COUNT(*) FROM documents WHERE categorie != 'Documents archivés'")
-        supportes = cursor.fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération d'une page de documents : {e}")
+        raise UncachedResult(([], None))
+    finally:
+        liberer_connexion(conn)
+
+    next_cursor = None
+    if len(documents) > limite:
+        documents = documents[:limite]
+        next_cursor = encoder_curseur(documents[-1]["date_ajout_ts"], documents[-1]["id"])
+    for document in documents:
+        del document["date_ajout_ts"]
+    return documents, next_cursor
+
+@_cache_lectures.cached
+def recuperer_4_derniers_documents():
+    """
+    Récupère les 4 documents les plus récemment ajoutés, quelle que soit leur catégorie.
+    Ceci est utilisé pour l'aperçu sur la page d'accueil (Dashboard).
+    """
+    conn = None
+    documents = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        select_query = """
+        SELECT id, nom_fichier, chemin_local, categorie, date_ajout, is_signed, is_filled
+        FROM documents
+        ORDER BY date_ajout_ts DESC, id DESC
+        LIMIT 4
+        """
+        
+        # Exécute la requête sans filtre spécifique
+        cursor.execute(select_query)
+        # Convertit les lignes (sqlite3.Row) en une liste de dictionnaires/objets
+        documents = [dict(row) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des 4 derniers documents : {e}")
+        raise UncachedResult([])
+        
+    finally:
+        liberer_connexion(conn)
+            
+    return documents
+
+
+# --- NOUVELLE FONCTION DE DIAGNOSTIC ---
+def diagnostiquer_fichiers_locaux(data_folder_path):
+    """
+    Liste les fichiers présents dans le dossier de données local.
+    Ceci est utilisé pour vérifier la casse et l'existence des fichiers sur le serveur.
+
+    La liste vient de l'inventaire des fichiers (voir file_inventory.py), à mettre
+    à jour avant l'appel : le dossier n'est pas relu.
+    """
+    fichiers = recuperer_fichiers_inventaire(ZONE_DATA)
+    if fichiers is None:
+        return {
+            "dossier_recherche": data_folder_path,
+            "fichiers_locaux": [],
+            "statut": "ERREUR: Inventaire des fichiers illisible."
+        }
+    return {
+        "dossier_recherche": data_folder_path,
+        "fichiers_locaux": fichiers,
+        "statut": "SUCCÈS"
+    }
+
+
+@_cache_lectures.cached
+def recuperer_toutes_categories():
+    """Récupère toutes les catégories disponibles."""
+    conn = None
+    categories = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        select_query = """
+        SELECT id, nom, description
+        FROM categories
+        ORDER BY nom ASC
+        """
+        
+        cursor.execute(select_query)
+        categories = [dict(row) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des catégories : {e}")
+        raise UncachedResult([])
+        
+    finally:
+        liberer_connexion(conn)
+            
+    return categories
+
+
+@_cache_lectures.cached
+def recuperer_stats():
+    """
+    Récupère les statistiques des documents :
+    - total : nombre total de documents
+    - signes : nombre de documents signés
+    - non_signes : nombre de documents non signés
+    - archives : nombre de documents dans la catégorie "Documents archivés"
+    - supportes : nombre de documents hors de cette catégorie
+    - par_categorie : nombre de documents de chaque catégorie
+
+    Les valeurs sont lues dans compteurs_documents (maintenue par triggers), sans
+    parcourir la table documents.
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT cle, valeur FROM compteurs_documents")
+        compteurs = {row[0]: row[1] for row in cursor.fetchall()}
+
+        total = compteurs.get(COMPTEUR_TOTAL, 0)
+        archives = compteurs.get(PREFIXE_COMPTEUR_CATEGORIE + CATEGORIE_ARCHIVES, 0)
+        par_categorie = {
+            cle[len(PREFIXE_COMPTEUR_CATEGORIE):]: valeur
+            for cle, valeur in sorted(compteurs.items())
+            if cle.startswith(PREFIXE_COMPTEUR_CATEGORIE) and valeur > 0
+        }
 
         return {
             "total": total,
-            "signes": signes,
-            "non_signes": non_signes,
+            "signes": compteurs.get(COMPTEUR_SIGNES, 0),
+            "non_signes": compteurs.get(COMPTEUR_NON_SIGNES, 0),
             "archives": archives,
-            "supportes": supportes
+            # Documents supportés (non archivés) : le reste
+            "supportes": total - archives,
+            "par_categorie": par_categorie
         }
 
     except sqlite3.Error as e:
         print(f"🛑 Erreur lors de la récupération des statistiques : {e}")
-        return {
+        raise UncachedResult({
             "total": 0,
             "signes": 0,
             "non_signes": 0,
             "archives": 0,
-            "supportes": 0
+            "supportes": 0,
+            "par_categorie": {}
+        })
+    finally:
+        liberer_connexion(conn)
+
+
+# --- JOBS DE GÉNÉRATION PDF ASYNCHRONE ---
+JOB_EN_ATTENTE = "en_attente"
+JOB_EN_COURS = "en_cours"
+JOB_TERMINE = "termine"
+JOB_ECHEC = "echec"
+
+
+def creer_job_pdf(job_id, profil_json, user_id, doc_id=None, form_id=None, profil_sortie=None):
+    """Enregistre un nouveau job de génération PDF (statut 'en_attente')."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        maintenant = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute(
+            """
+            INSERT INTO pdf_jobs (id, statut, user_id, doc_id, form_id, profil_sortie, profil_json, date_creation, date_maj)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, JOB_EN_ATTENTE, user_id, doc_id, form_id, profil_sortie, profil_json, maintenant, maintenant)
+        )
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la création du job PDF {job_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def mettre_a_jour_job_pdf(job_id, statut, chemin_pdf=None, erreur=None):
+    """Met à jour le statut d'un job PDF (et son résultat)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            UPDATE pdf_jobs SET statut = ?, chemin_pdf = ?, erreur = ?, date_maj = ?
+            WHERE id = ?
+            """,
+            (statut, chemin_pdf, erreur, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), job_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la mise à jour du job PDF {job_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_job_pdf(job_id):
+    """Récupère un job PDF par son ID."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT id, statut, user_id, doc_id, form_id, profil_sortie, profil_json, chemin_pdf, erreur, date_creation, date_maj
+            FROM pdf_jobs
+            WHERE id = ?
+            """,
+            (job_id,)
+        )
+        result = cursor.fetchone()
+        return dict(result) if result else None
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération du job PDF {job_id} : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_jobs_pdf_non_termines():
+    """Récupère les jobs PDF en attente ou en cours (à relancer après un redémarrage)."""
+    conn = None
+    jobs = []
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT id, statut, user_id, doc_id, form_id, profil_sortie, profil_json, chemin_pdf, erreur, date_creation, date_maj
+            FROM pdf_jobs
+            WHERE statut IN (?, ?)
+            ORDER BY date_creation ASC
+            """,
+            (JOB_EN_ATTENTE, JOB_EN_COURS)
+        )
+        jobs = [dict(row) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des jobs PDF non terminés : {e}")
+
+    finally:
+        liberer_connexion(conn)
+
+    return jobs
+
+
+def supprimer_jobs_pdf_expires(avant):
+    """
+    Supprime les jobs PDF terminés ou en échec dont la dernière mise à jour est antérieure à avant (datetime).
+
+    Returns:
+        Liste de (id, chemin_pdf) des jobs supprimés (PDFs à supprimer par l'appelant)
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM pdf_jobs WHERE statut IN (?, ?) AND date_maj < ? RETURNING id, chemin_pdf",
+            (JOB_TERMINE, JOB_ECHEC, avant.strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        jobs = [(row[0], row[1]) for row in cursor.fetchall()]
+        conn.commit()
+        return jobs
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la suppression des jobs PDF expirés : {e}")
+        return []
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_ids_jobs_pdf():
+    """IDs de tous les jobs PDF enregistrés."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM pdf_jobs")
+        return {row[0] for row in cursor.fetchall()}
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des jobs PDF : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+# --- ENVOIS DE FICHIERS PAR MORCEAUX ---
+def creer_session_upload(session_id, nom_fichier, categorie, taille, sha256, expiration_ts):
+    """Enregistre une nouvelle session d'envoi par morceaux."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            INSERT INTO upload_sessions (id, nom_fichier, categorie, taille, sha256, recu, date_creation, expiration_ts)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+            """,
+            (session_id, nom_fichier, categorie, taille, sha256,
+             datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), expiration_ts)
+        )
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la création de la session d'envoi {session_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def avancer_session_upload(session_id, recu, expiration_ts):
+    """Enregistre le nombre d'octets reçus d'une session et repousse son expiration."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "UPDATE upload_sessions SET recu = ?, expiration_ts = ? WHERE id = ?",
+            (recu, expiration_ts, session_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la mise à jour de la session d'envoi {session_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_session_upload(session_id):
+    """Récupère une session d'envoi par son ID."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT id, nom_fichier, categorie, taille, sha256, recu, date_creation, expiration_ts, doc_id
+            FROM upload_sessions
+            WHERE id = ?
+            """,
+            (session_id,)
+        )
+        result = cursor.fetchone()
+        return dict(result) if result else None
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération de la session d'envoi {session_id} : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def terminer_session_upload(session_id, doc_id):
+    """
+    Enregistre le document créé par la finalisation d'une session d'envoi.
+
+    La session est conservée jusqu'à son expiration : une nouvelle finalisation
+    retourne ce document au lieu d'en créer un autre.
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE upload_sessions SET doc_id = ? WHERE id = ?", (doc_id, session_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la finalisation de la session d'envoi {session_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def supprimer_session_upload(session_id):
+    """Supprime une session d'envoi (terminée, abandonnée ou expirée)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM upload_sessions WHERE id = ?", (session_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la suppression de la session d'envoi {session_id} : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def supprimer_sessions_upload_expirees(maintenant_ts):
+    """Supprime les sessions d'envoi expirées et retourne leurs IDs (fichiers partiels à supprimer)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM upload_sessions WHERE expiration_ts < ? RETURNING id", (maintenant_ts,))
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        return ids
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la suppression des sessions d'envoi expirées : {e}")
+        return []
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_ids_sessions_upload():
+    """IDs de toutes les sessions d'envoi en cours."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM upload_sessions")
+        return {row[0] for row in cursor.fetchall()}
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la récupération des sessions d'envoi : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+# --- INVENTAIRE DES FICHIERS ET RÉCONCILIATION ---
+def recuperer_inventaire_dossiers():
+    """Dossiers inventoriés : {chemin relatif: mtime_ns} (None en cas d'erreur)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT chemin, mtime_ns FROM inventaire_dossiers")
+        return {chemin: mtime_ns for chemin, mtime_ns in cursor.fetchall()}
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la lecture de l'inventaire des dossiers : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_inventaire_fichiers(dossier):
+    """Fichiers inventoriés d'un dossier : {nom: (taille, mtime_ns, sha256)}."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT nom, taille, mtime_ns, sha256 FROM inventaire_fichiers WHERE dossier = ?", (dossier,)
+        )
+        return {nom: (taille, mtime_ns, sha256) for nom, taille, mtime_ns, sha256 in cursor.fetchall()}
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la lecture de l'inventaire de {dossier} : {e}")
+        return {}
+    finally:
+        liberer_connexion(conn)
+
+
+def enregistrer_inventaire_dossiers(mises_a_jour, date_scan_ts):
+    """
+    Met à jour l'inventaire de dossiers relus sur le disque, en une transaction.
+
+    Args:
+        mises_a_jour: Liste de (dossier, zone, mtime_ns, fichiers, noms_disparus) où
+            fichiers est la liste des fichiers nouveaux ou modifiés (nom, taille, mtime_ns, sha256)
+            et noms_disparus celle des fichiers qui ne sont plus dans le dossier
+    """
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO inventaire_fichiers (chemin, dossier, nom, zone, taille, mtime_ns, sha256)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chemin) DO UPDATE SET
+                taille = excluded.taille, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256
+            """,
+            [(os.path.join(dossier, nom), dossier, nom, zone, taille, mtime, sha)
+             for dossier, zone, _, fichiers, _ in mises_a_jour
+             for nom, taille, mtime, sha in fichiers]
+        )
+        cursor.executemany(
+            "DELETE FROM inventaire_fichiers WHERE chemin = ?",
+            [(os.path.join(dossier, nom),) for dossier, _, _, _, disparus in mises_a_jour for nom in disparus]
+        )
+        cursor.executemany(
+            """
+            INSERT INTO inventaire_dossiers (chemin, mtime_ns, date_scan_ts) VALUES (?, ?, ?)
+            ON CONFLICT(chemin) DO UPDATE SET mtime_ns = excluded.mtime_ns, date_scan_ts = excluded.date_scan_ts
+            """,
+            [(dossier, mtime_ns, date_scan_ts) for dossier, _, mtime_ns, _, _ in mises_a_jour]
+        )
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la mise à jour de l'inventaire des fichiers : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def supprimer_inventaire_dossiers(dossiers):
+    """Retire de l'inventaire des dossiers disparus du disque, avec leurs fichiers."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM inventaire_fichiers WHERE dossier = ?", [(d,) for d in dossiers])
+        cursor.executemany("DELETE FROM inventaire_dossiers WHERE chemin = ?", [(d,) for d in dossiers])
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la suppression de dossiers de l'inventaire : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def supprimer_inventaire_fichiers(chemins):
+    """Retire de l'inventaire des fichiers supprimés (réparation)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM inventaire_fichiers WHERE chemin = ?", [(c,) for c in chemins])
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la suppression de fichiers de l'inventaire : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def marquer_inventaire_verifie(date_scan_ts):
+    """Date de la dernière vérification complète de l'inventaire (tous les dossiers parcourus)."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE inventaire_dossiers SET date_scan_ts = ?", (date_scan_ts,))
+        conn.commit()
+        return True
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la mise à jour de la date de l'inventaire : {e}")
+        return False
+    finally:
+        liberer_connexion(conn)
+
+
+def date_inventaire():
+    """Horodatage (date_vers_ts) de la dernière vérification de l'inventaire, None s'il n'a jamais été construit."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(date_scan_ts) FROM inventaire_dossiers")
+        return cursor.fetchone()[0]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la lecture de la date de l'inventaire : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def rapport_reconciliation(limite=100):
+    """
+    Compare l'inventaire des fichiers à la base, sans relire le disque.
+
+    - documents_sans_fichier : documents dont le blob ou le fichier data/<nom> est absent
+    - blobs_orphelins : fichiers de blobs qu'aucun document ne référence
+    - blobs_taille_incorrecte : blobs dont la taille sur le disque diffère de celle enregistrée
+    - signatures_orphelines : signatures d'un document supprimé
+    - fichiers_non_references : fichiers de data/ qu'aucun document n'utilise
+
+    Les documents et blobs enregistrés depuis le début de la dernière vérification
+    de l'inventaire sont ignorés (leur fichier n'y figure pas forcément).
+
+    Returns:
+        Dictionnaire {catégorie: {"total", "exemples"}} plus l'état de l'inventaire,
+        ou None en cas d'erreur
+    """
+    date_scan_ts = date_inventaire()
+    if date_scan_ts is None:
+        return None
+    date_scan = datetime.datetime.fromtimestamp(date_scan_ts, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    requetes = {
+        "documents_sans_fichier": ("""
+            SELECT d.id, d.nom_fichier, d.blob_sha256
+            FROM blobs b
+            JOIN documents d ON d.blob_sha256 = b.sha256
+            WHERE b.date_creation < :date_scan
+              AND NOT EXISTS (SELECT 1 FROM inventaire_fichiers i WHERE i.zone = :zone_blob AND i.sha256 = b.sha256)
+            UNION ALL
+            SELECT d.id, d.nom_fichier, d.blob_sha256
+            FROM documents d
+            WHERE d.blob_sha256 IS NULL AND d.date_ajout_ts < :date_scan_ts
+              AND NOT EXISTS (SELECT 1 FROM inventaire_fichiers i WHERE i.zone = :zone_data AND i.nom = d.nom_fichier)
+        """),
+        "blobs_orphelins": ("""
+            SELECT i.sha256, i.chemin, i.taille
+            FROM inventaire_fichiers i
+            WHERE i.zone = :zone_blob AND NOT EXISTS (SELECT 1 FROM blobs b WHERE b.sha256 = i.sha256)
+        """),
+        "blobs_taille_incorrecte": ("""
+            SELECT b.sha256, i.chemin, b.taille AS taille_enregistree, i.taille
+            FROM inventaire_fichiers i
+            JOIN blobs b ON b.sha256 = i.sha256
+            WHERE i.zone = :zone_blob AND b.taille > 0 AND b.taille != i.taille
+        """),
+        "signatures_orphelines": ("""
+            SELECT i.nom, i.chemin, i.taille
+            FROM inventaire_fichiers i
+            WHERE i.zone = :zone_signature
+              AND NOT EXISTS (
+                  SELECT 1 FROM documents d WHERE d.id = CAST(substr(i.nom, 1, length(i.nom) - 4) AS INTEGER)
+              )
+        """),
+        "fichiers_non_references": ("""
+            SELECT i.nom, i.chemin, i.taille
+            FROM inventaire_fichiers i
+            WHERE i.zone = :zone_data
+              AND NOT EXISTS (SELECT 1 FROM documents d WHERE d.nom_fichier = i.nom AND d.blob_sha256 IS NULL)
+        """),
+    }
+    params = {
+        "date_scan": date_scan, "date_scan_ts": date_scan_ts,
+        "zone_blob": ZONE_BLOB, "zone_data": ZONE_DATA, "zone_signature": ZONE_SIGNATURE,
+    }
+
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        rapport = {}
+        for categorie, requete in requetes.items():
+            cursor.execute(f"SELECT COUNT(*) FROM ({requete})", params)
+            total = cursor.fetchone()[0]
+            cursor.execute(f"{requete} LIMIT {int(limite)}", params)
+            rapport[categorie] = {"total": total, "exemples": [dict(row) for row in cursor.fetchall()]}
+
+        cursor.execute(
+            "SELECT zone, COUNT(*), COALESCE(SUM(taille), 0) FROM inventaire_fichiers GROUP BY zone"
+        )
+        rapport["inventaire"] = {
+            "date_scan": date_scan,
+            "zones": {zone: {"fichiers": nombre, "octets": octets} for zone, nombre, octets in cursor.fetchall()},
         }
+        return rapport
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors du rapport de réconciliation : {e}")
+        return None
+    finally:
+        liberer_connexion(conn)
+
+
+def recuperer_fichiers_inventaire(zone):
+    """Noms des fichiers inventoriés d'une zone, triés."""
+    conn = None
+    try:
+        conn = obtenir_connexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT nom FROM inventaire_fichiers WHERE zone = ? ORDER BY nom", (zone,))
+        return [row[0] for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        print(f"🛑 Erreur lors de la lecture de l'inventaire : {e}")
+        return None
     finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+        liberer_connexion(conn)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Ajoute le texte des PDFs déjà enregistrés à l'index de recherche (documents_fts).
+
+Les documents envoyés après la création de l'index sont indexés à l'ajout ; ce
+script traite ceux qui l'ont été avant (texte encore vide dans l'index). Avec
+--all, tous les PDFs sont réindexés.
+
+Usage :
+    python backend/index_documents_text.py
+    python backend/index_documents_text.py --all
+"""
+
+import os
+import sys
+import time
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import gestion_db
+from blob_store import BlobStore
+from pdf_text import PdfReader, extract_pdf_text
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'data')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexe le texte des PDFs pour la recherche")
+    parser.add_argument("--all", action="store_true", help="Réindexer tous les PDFs")
+    parser.add_argument("--db", default=None, help="Base à indexer (défaut: data/pro.db)")
+    parser.add_argument("--data", default=DATA_FOLDER_PATH, help="Dossier des fichiers (défaut: data/)")
+    args = parser.parse_args()
+
+    if PdfReader is None:
+        print("🛑 pypdf n'est pas installé : le texte des PDFs ne peut pas être extrait")
+        sys.exit(1)
+    if args.db:
+        gestion_db.utiliser_base(args.db)
+    gestion_db.initialiser_base_de_donnees()
+
+    if args.all:
+        documents = [
+            gestion_db.recuperer_document_par_id(doc['id']) for doc in gestion_db.recuperer_tous_documents()
+            if doc['nom_fichier'].lower().endswith('.pdf')
+        ]
+    else:
+        documents = gestion_db.recuperer_documents_sans_contenu()
+    print(f"📂 {len(documents)} PDF(s) à indexer")
+
+    start = time.perf_counter()
+    indexes = 0
+    blob_store = BlobStore(os.path.join(args.data, 'blobs'))
+    for doc in documents:
+        if doc.get('blob_sha256'):
+            chemin = blob_store.path(doc['blob_sha256'])
+        else:
+            chemin = os.path.join(args.data, doc['nom_fichier'])
+        if not os.path.exists(chemin):
+            print(f"  ⚠️ Fichier introuvable : {doc['nom_fichier']}")
+            continue
+        contenu = extract_pdf_text(chemin, filename=doc['nom_fichier'])
+        if contenu and gestion_db.indexer_contenu_document(doc['id'], contenu):
+            indexes += 1
+
+    if indexes:
+        gestion_db.optimiser_index_recherche()
+    print(f"✅ {indexes} PDF(s) indexé(s) en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
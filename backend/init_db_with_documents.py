@@ -8,6 +8,8 @@ import os
 import sys
 from datetime import datetime
 
+from file_inventory import est_fichier_de_base
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 DB_NAME = os.path.join(PROJECT_ROOT, 'data', 'pro.db')
@@ -50,12 +52,14 @@ def init_database():
         # Lister les fichiers PDF et documents existants
         pdf_files = []
         if os.path.exists(DATA_FOLDER):
-            for filename in os.listdir(DATA_FOLDER):
-                filepath = os.path.join(DATA_FOLDER, filename)
-                # Inclure les fichiers PDF et autres documents, exclure les .db et dossiers
-                if (os.path.isfile(filepath) and not filename.startswith('.') 
-                    and not filename.endswith('.db') and not filename.endswith('.sqlite3')):
-                    pdf_files.append(filename)
+            with os.scandir(DATA_FOLDER) as entries:
+                for entry in entries:
+                    filename = entry.name
+                    # Inclure les fichiers PDF et autres documents, exclure la base SQLite
+                    # (pro.db, -wal, -shm, -journal) et les dossiers
+                    if (entry.is_file() and not filename.startswith('.')
+                        and not est_fichier_de_base(filename)):
+                        pdf_files.append(filename)
         
         if not pdf_files:
             print("⚠️  Aucun document trouvé dans le dossier /data")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Range les fichiers de data/ dans le stockage par hash, en sous-dossiers (data/blobs/ab/cd/<sha256>).
+
+1. Les blobs écrits à plat (data/blobs/<sha256>) sont déplacés dans leur sous-dossier.
+2. Les fichiers des documents enregistrés avant le stockage par hash
+   (data/<nom_fichier>) y sont importés : les documents sont rattachés au blob,
+   puis l'ancien fichier est supprimé.
+
+La migration peut tourner pendant que le serveur répond : chaque fichier reste
+lisible à son ancien emplacement jusqu'à ce que son nouvel emplacement soit
+enregistré. Un ancien fichier supprimé alors que le serveur a encore le document
+en cache sans son blob est retrouvé par le serveur, qui relit le blob en base
+(app_server.emplacement_fichier_document). Elle peut être interrompue et relancée.
+
+Usage :
+    python backend/migrate_storage_layout.py
+    python backend/migrate_storage_layout.py --dry-run
+"""
+
+import os
+import sys
+import time
+import uuid
+import hashlib
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import gestion_db
+from blob_store import BlobStore, BlobUpload, CHUNK_SIZE, is_sha256
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'data')
+
+
+def recevoir_fichier(blob_store, chemin):
+    """
+    Prépare un fichier existant pour sa publication dans le stockage : lien physique
+    dans le dossier temporaire (pas de copie), ou copie si le lien est impossible.
+    """
+    sha = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    temp_path = os.path.join(blob_store.temp_dir, f"{uuid.uuid4().hex}.part")
+    try:
+        os.link(chemin, temp_path)
+    except OSError:
+        with open(chemin, 'rb') as f:
+            return blob_store.receive(f)
+    return BlobUpload(temp_path, sha.hexdigest(), os.path.getsize(chemin))
+
+
+def migrer_blobs_a_plat(blob_store, dry_run):
+    """Déplace les blobs de data/blobs/<sha256> vers data/blobs/ab/cd/<sha256>"""
+    with os.scandir(blob_store.root) as entries:
+        shas = [entry.name for entry in entries if is_sha256(entry.name) and entry.is_file()]
+    print(f"📂 {len(shas)} blob(s) à plat à déplacer")
+    if dry_run:
+        return 0
+    deplaces = 0
+    for sha in shas:
+        if blob_store.migrate_flat_blob(sha):
+            deplaces += 1
+    return deplaces
+
+
+def importer_fichiers_historiques(blob_store, data_folder, dry_run):
+    """Importe les fichiers data/<nom_fichier> des documents sans blob dans le stockage par hash"""
+    noms = gestion_db.recuperer_noms_fichiers_hors_stockage()
+    if noms is None:
+        sys.exit(1)
+    print(f"📂 {len(noms)} fichier(s) de documents hors du stockage par hash")
+
+    importes = 0
+    for nom in noms:
+        chemin = os.path.join(data_folder, nom)
+        if not os.path.isfile(chemin):
+            print(f"  ⚠️ Fichier introuvable : {nom}")
+            continue
+        if dry_run:
+            continue
+
+        upload = recevoir_fichier(blob_store, chemin)
+        # Blob publié avant le rattachement : le document reste lisible à chaque étape
+        blob_store.publish(upload)
+        if not gestion_db.associer_blob_documents(nom, upload.sha256, upload.size):
+            blob_store.remove_unreferenced([upload.sha256], gestion_db.blob_est_reference)
+            continue
+        # Le serveur relit le blob en base si sa ligne en cache pointe encore vers data/<nom>
+        os.remove(chemin)
+        importes += 1
+    return importes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range les fichiers de data/ en sous-dossiers par hash")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les fichiers à migrer, sans rien déplacer")
+    parser.add_argument("--db", default=None, help="Base des documents (défaut: data/pro.db)")
+    parser.add_argument("--data", default=DATA_FOLDER_PATH, help="Dossier des fichiers (défaut: data/)")
+    args = parser.parse_args()
+
+    if args.db:
+        gestion_db.utiliser_base(args.db)
+    if not os.path.exists(gestion_db.DB_NAME):
+        print(f"🛑 Base introuvable : {gestion_db.DB_NAME}")
+        sys.exit(1)
+    gestion_db.initialiser_base_de_donnees()
+
+    start = time.perf_counter()
+    blob_store = BlobStore(os.path.join(args.data, 'blobs'))
+    deplaces = migrer_blobs_a_plat(blob_store, args.dry_run)
+    importes = importer_fichiers_historiques(blob_store, args.data, args.dry_run)
+
+    if args.dry_run:
+        print("ℹ️ --dry-run : aucun fichier déplacé")
+        return
+    print(f"✅ {deplaces} blob(s) déplacé(s), {importes} fichier(s) importé(s) en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
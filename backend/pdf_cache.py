@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class PDFCache:
+    """Cache disque des PDFs générés, adressé par le contenu (hash des champs + version du modèle)"""
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        """
+        Initialise le cache
+
+        Args:
+            cache_dir: Dossier où sont stockés les PDFs en cache
+            max_bytes: Taille maximale du cache sur disque; au-delà, les
+                entrées les moins récemment utilisées sont supprimées (LRU)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> taille, du moins au plus récemment utilisé
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(clean_data, template_version, render_options=None):
+        """Calcule la clé du cache à partir des champs nettoyés, de la version du modèle et des options de rendu"""
+        payload = json.dumps(
+            {"template": template_version, "options": render_options or {}, "fields": clean_data},
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _load_index(self):
+        """Reconstruit l'index LRU à partir des fichiers présents (ordre = date d'accès)"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def get(self, key):
+        """Retourne le PDF en cache (bytes) ou None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # mémorise l'accès sur disque pour le prochain démarrage
+            return data
+        except OSError:
+            # Fichier supprimé entre-temps : on le traite comme un échec
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Ajoute un PDF au cache puis applique la politique d'éviction"""
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[PDF CACHE WARNING] Écriture impossible pour {key}: {e}")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées (appelé avec le verrou)"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Compteurs du cache (pour /api/metrics)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
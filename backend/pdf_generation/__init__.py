@@ -0,0 +1 @@
+"""Moteur de rendu des formulaires CERFA (importable par le serveur Flask)."""
@@ -0,0 +1,153 @@
+# Table de placement des champs des formulaires CERFA
+# Chaque entrée décrit un champ AcroForm : type, position, police et transformation de la valeur.
+# Ajouter un champ (ou un formulaire) ne demande qu'une nouvelle entrée, pas de nouveau code.
+
+import functools
+
+DEFAULT_FONT = ("Helvetica", 12)
+
+# --- TRANSFORMATIONS DE VALEUR ---
+# Chaque transformation reçoit la valeur brute (string) et retourne la valeur du champ.
+VALUE_TRANSFORMS = {
+    "texte": lambda v: v,
+    "est_vrai": lambda v: v.lower() == 'true',
+    "est_faux": lambda v: v.lower() == 'false',
+}
+
+CERFA_14011_02_FIELDS = [
+    #------------------------------------------------------------------------------------------
+    #CHAMPS TEXTUELS  (box = x, y, largeur, hauteur)
+    #------------------------------------------------------------------------------------------
+    {"name": "nom", "type": "text", "box": (144, 638, 150, 17)},
+    {"name": "nomUsage", "type": "text", "box": (135, 610, 150, 17)},
+    {"name": "prenom", "type": "text", "box": (124, 585, 300, 17)},
+    {"name": "dateNaissance", "type": "text", "box": (107, 560, 110, 15)},
+    {"name": "communeNaissance", "type": "text", "box": (280, 560, 250, 17)},
+    {"name": "codePostalNaissance", "type": "text", "box": (125, 542, 80, 17)},
+    {"name": "paysNaissance", "type": "text", "box": (245, 542, 285, 17)},
+    {"name": "numeroAdresse", "type": "text", "box": (115, 500, 75, 17)},
+    {"name": "typeVoieAdresse", "type": "text", "box": (200, 500, 75, 17)},
+    {"name": "nomVoieAdresse", "type": "text", "box": (300, 500, 220, 17)},
+    {"name": "codePostal", "type": "text", "box": (130, 475, 60, 17)},
+    {"name": "commune", "type": "text", "box": (280, 475, 225, 17)},
+    {"name": "pays", "type": "text", "box": (110, 455, 375, 17)},
+    {"name": "cni", "type": "text", "box": (124, 386, 135, 17)},
+    {"name": "passeport", "type": "text", "box": (124, 386, 135, 17)},
+
+    #------------------------------------------------------------------------------------------
+    #CHAMPS À COCHER  (box = x, y, taille)
+    #------------------------------------------------------------------------------------------
+    {"name": "perteIdentite", "type": "checkbox", "box": (340, 774, 13)},
+    {"name": "pertePasseport", "type": "checkbox", "box": (460, 774, 13)},
+    {"name": "majeur", "type": "checkbox", "box": (263.3, 696.4, 13)},
+    # "mineur" lit la clé "majeur" : coché si elle vaut "false" (casse ignorée) ou si elle est
+    # absente du profil (valeur par défaut des cases : "false"); une valeur vide ne coche rien
+    {"name": "mineur", "type": "checkbox", "box": (450.9, 696.4, 13), "source": "majeur", "transform": "est_faux"},
+    {"name": "homme", "type": "checkbox", "box": (225.95, 658.2, 13)},
+    {"name": "femme", "type": "checkbox", "box": (305.95, 658.2, 13)},
+]
+
+
+def _compile_field(field):
+    """Transforme une entrée de la table en (méthode acroForm, arguments fixes, clé source, défaut, transformation)"""
+    field_type = field["type"]
+    source = field.get("source", field["name"])
+
+    if field_type == "text":
+        x, y, width, height = field["box"]
+        font_name, font_size = field.get("font", DEFAULT_FONT)
+        static_kwargs = {
+            "name": field["name"],
+            "x": x,
+            "y": y,
+            "width": width,
+            "height": height,
+            "fontName": font_name,
+            "fontSize": font_size,
+            "borderStyle": field.get("borderStyle", 'underlined'),  # style de la bordure = souligné
+            "forceBorder": True,  # force l'affichage de la bordure du champ
+        }
+        transform = VALUE_TRANSFORMS[field.get("transform", "texte")]
+        return ("textfield", static_kwargs, "value", source, "", transform)
+
+    if field_type == "checkbox":
+        x, y, size = field["box"]
+        static_kwargs = {"name": field["name"], "x": x, "y": y, "size": size}
+        transform = VALUE_TRANSFORMS[field.get("transform", "est_vrai")]
+        return ("checkbox", static_kwargs, "checked", source, "false", transform)
+
+    raise ValueError(f"Type de champ inconnu pour '{field['name']}': {field_type}")
+
+
+def compile_layout(fields):
+    """
+    Compile une table de champs en plan de rendu.
+
+    Le plan est une liste de tuples prêts à être exécutés par render_plan :
+    toute la validation et la résolution des options est faite une seule fois.
+    """
+    return tuple(_compile_field(field) for field in fields)
+
+
+def render_plan(c, plan, data):
+    """Exécute un plan de rendu sur le canvas avec les valeurs du profil"""
+    form = c.acroForm
+    for method, static_kwargs, value_arg, source, default, transform in plan:
+        getattr(form, method)(**static_kwargs, **{value_arg: transform(data.get(source, default))})
+
+
+
+# --- RENDU APLATI ---
+# Mêmes positions et couleurs que les apparences AcroForm de ReportLab, mais dessinées
+# directement dans la page : plus de champs interactifs, un PDF plus léger.
+FLAT_INK = (0.1, 0.1, 0.1)  # couleur par défaut du texte et des bordures des champs ReportLab
+FLAT_BORDER_WIDTH = 1
+
+
+def _draw_flat_text(c, kwargs, value):
+    x, y, width, height = kwargs["x"], kwargs["y"], kwargs["width"], kwargs["height"]
+    bw = FLAT_BORDER_WIDTH
+    if kwargs.get("borderStyle") == 'underlined':
+        c.line(x, y + bw * 0.5, x + width, y + bw * 0.5)
+    if value:
+        c.setFont(kwargs["fontName"], kwargs["fontSize"])
+        c.drawString(x + 4 * bw, y + height - kwargs["fontSize"] - 2 * bw, value)
+
+
+def _draw_flat_checkbox(c, kwargs, checked):
+    x, y, size = kwargs["x"], kwargs["y"], kwargs["size"]
+    bw = FLAT_BORDER_WIDTH
+    c.rect(x + bw * 0.5, y + bw * 0.5, size - bw, size - bw, stroke=1, fill=0)
+    if checked:
+        # coche dessinée en tracé (ne dépend d'aucune police)
+        path = c.beginPath()
+        path.moveTo(x + size * 0.22, y + size * 0.52)
+        path.lineTo(x + size * 0.42, y + size * 0.28)
+        path.lineTo(x + size * 0.80, y + size * 0.78)
+        c.saveState()
+        c.setLineWidth(size * 0.12)
+        c.setLineJoin(1)
+        c.setLineCap(1)
+        c.drawPath(path, stroke=1, fill=0)
+        c.restoreState()
+
+
+_FLAT_DRAWERS = {"textfield": _draw_flat_text, "checkbox": _draw_flat_checkbox}
+
+
+def render_plan_flat(c, plan, data):
+    """Exécute un plan de rendu en dessinant les valeurs dans la page (sans champs AcroForm)"""
+    c.saveState()
+    c.setStrokeColorRGB(*FLAT_INK)
+    c.setFillColorRGB(*FLAT_INK)
+    c.setLineWidth(FLAT_BORDER_WIDTH)
+    for method, static_kwargs, value_arg, source, default, transform in plan:
+        _FLAT_DRAWERS[method](c, static_kwargs, transform(data.get(source, default)))
+    c.restoreState()
+
+
+
+@functools.lru_cache(maxsize=None)
+def cerfa_14011_02_plan():
+    """Plan compilé du CERFA 14011-02, au premier appel (le registre compile le sien : FormTemplate.plan)"""
+    return compile_layout(CERFA_14011_02_FIELDS)
@@ -1,289 +1,142 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
+from io import BytesIO
 import json
 import os
 import sys
 
 try:
-    # Vérifier que bdd.json existe
-    if not os.path.exists('bdd.json'):
-        print("ERREUR: bdd.json non trouvé", file=sys.stderr)
+    from pdf_generation.template import get_background
+    from pdf_generation.layout import cerfa_14011_02_plan, render_plan, render_plan_flat
+except ImportError:  # exécution directe : python main.py
+    from template import get_background
+    from layout import cerfa_14011_02_plan, render_plan, render_plan_flat
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CERFA_IMAGE_PATH = os.path.join(SCRIPT_DIR, "cerfaimage.jpg")
+OUTPUT_FILENAME = "cerfa_14011-02.pdf"
+
+# --- PROFILS DE SORTIE ---
+# fillable  : champs AcroForm modifiables, arrière plan pleine résolution (comportement historique)
+# flattened : valeurs dessinées dans la page (non modifiables), flux compressés, JPEG binaire
+# compact   : comme flattened, avec un arrière plan ré-échantillonné à PDF_COMPACT_DPI
+OUTPUT_FILLABLE = "fillable"
+OUTPUT_FLATTENED = "flattened"
+OUTPUT_COMPACT = "compact"
+COMPACT_BACKGROUND_DPI = int(os.environ.get('PDF_COMPACT_DPI', '110'))
+
+OUTPUT_PROFILES = {
+    OUTPUT_FILLABLE: {"flatten": False, "background_dpi": None, "binary": False, "page_compression": None},
+    OUTPUT_FLATTENED: {"flatten": True, "background_dpi": None, "binary": True, "page_compression": 1},
+    OUTPUT_COMPACT: {"flatten": True, "background_dpi": COMPACT_BACKGROUND_DPI, "binary": True, "page_compression": 1},
+}
+
+
+def render_cerfa(data, background_path=CERFA_IMAGE_PATH, plan=None, invariant=False, output=OUTPUT_FILLABLE):
+    """
+    Génère le CERFA 14011-02 en mémoire.
+
+    Args:
+        data: Dictionnaire des valeurs du profil (clé du champ -> string)
+        background_path: Chemin vers l'image d'arrière plan du CERFA
+        plan: Plan de rendu compilé des champs (voir layout.compile_layout; défaut : CERFA 14011-02)
+        invariant: Si True, la date de création et l'identifiant du document sont
+            fixes : des données identiques donnent un PDF identique à l'octet près
+        output: Profil de sortie ("fillable", "flattened" ou "compact")
+
+    Returns:
+        Le contenu du PDF (bytes)
+    """
+    profile = OUTPUT_PROFILES[output]
+    if plan is None:
+        plan = cerfa_14011_02_plan()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1 if invariant else 0, pageCompression=profile["page_compression"]) #créer l'objet canvas avec sa sortie et sa taille
+
+    page_width, page_height = A4 #mets les valeurs du format A4 dans les deux variables pour les utiliser plus tard
+
+    # image cerfa d'arrière plan, lue et encodée une seule fois par processus
+    get_background(background_path, profile["background_dpi"], profile["binary"]).stamp(
+        c,
+        0, 0,#position de l'image, comme elle fait la taille de la page on la place à l'origine.
+        width=page_width,#donne à la largeur de l'image la largeur de la page
+        height=page_height#donne à la hauteur de l'image la hauteur de la page
+    )
+
+    # champs textuels et cases à cocher, décrits dans layout.py
+    if profile["flatten"]:
+        render_plan_flat(c, plan, data)
+    else:
+        render_plan(c, plan, data)
+
+    c.save()#sauvegarde le pdf
+    return buffer.getvalue()
+
+
+def _option(name):
+    """Valeur d'une option de la ligne de commande (--name valeur), ou None"""
+    args = sys.argv[1:]
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return None
+
+
+def main():
+    """
+    Mode script : lit bdd.json et écrit le PDF dans le dossier courant.
+
+    Options : --invariant, --form <form_id> (formulaire du registre, CERFA 14011-02 par défaut),
+    --output <profil> (fillable, flattened ou compact)
+    """
+    try:
+        from pdf_generation.registry import get_form
+    except ImportError:  # exécution directe : python main.py
+        from registry import get_form
+
+    try:
+        # Vérifier que bdd.json existe
+        if not os.path.exists('bdd.json'):
+            print("ERREUR: bdd.json non trouvé", file=sys.stderr)
+            sys.exit(1)
+
+        with open('bdd.json', 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        form_id = _option('--form')
+        form = get_form(form_id)
+        background_path = form.background_path
+        # Sans --form : utiliser cerfaimage.jpg du dossier courant s'il existe
+        if form_id is None and os.path.exists('cerfaimage.jpg'):
+            background_path = 'cerfaimage.jpg'
+        if not os.path.exists(background_path):
+            print(f"ERREUR: {background_path} non trouvé", file=sys.stderr)
+            sys.exit(1)
+
+        output = _option('--output') or OUTPUT_FILLABLE
+        if output not in OUTPUT_PROFILES:
+            print(f"ERREUR: profil de sortie inconnu {output}", file=sys.stderr)
+            sys.exit(1)
+
+    except KeyError as e:
+        print(f"ERREUR: formulaire inconnu {e}", file=sys.stderr)
         sys.exit(1)
-    
-    with open('bdd.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Vérifier que cerfaimage.jpg existe
-    if not os.path.exists('cerfaimage.jpg'):
-        print("ERREUR: cerfaimage.jpg non trouvé", file=sys.stderr)
+    except json.JSONDecodeError as e:
+        print(f"ERREUR JSON dans bdd.json: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"ERREUR lors du chargement des données: {e}", file=sys.stderr)
         sys.exit(1)
-    
-except json.JSONDecodeError as e:
-    print(f"ERREUR JSON dans bdd.json: {e}", file=sys.stderr)
-    sys.exit(1)
-except Exception as e:
-    print(f"ERREUR lors du chargement des données: {e}", file=sys.stderr)
-    sys.exit(1)
-
-c = canvas.Canvas("cerfa_14011-02.pdf", pagesize=A4) #créer l'objet canvas avec son nom et sa taille
-
-page_width, page_height = A4 #mets les valeurs du format A4 dans les deux variables pour les utiliser plus tard
-
-c.drawImage(# image cerfa d'arrière plan
-    "cerfaimage.jpg",#nom du fichier d'où vient l'arrière plan
-    0, 0,#position de l'image, comme elle fait la taille de la page on la place à l'origine.
-    width=page_width,#donne à la largeur de l'image la largeur de la page
-    height=page_height#donne à la hauteur de l'image la hauteur de la page
-)
-
-#----------------------------------------------------------------------------------------------------------------------------------------------
-#CHAMPS TEXTUELS
-#----------------------------------------------------------------------------------------------------------------------------------------------
-
-nom_valeur = data.get('nom', '') #récupère la valeur associé à la clé 'nom'
-c.acroForm.textfield(#acroForm permet de créer des champs
-    name="nom",#clé
-    x=144,#position horizontale
-    y=638, #position verticale
-    width=150,#largeur du champ
-    height=17,#hauteur du champ
-    value=nom_valeur,#valeur
-    borderStyle='underlined',#style de la bordure = souligné
-    forceBorder=True # force l'affichage de la bordure du champ
-)
-
-nomUsage_valeur = data.get('nomUsage', '')
-c.acroForm.textfield(
-    name="nomUsage",
-    x=135,
-    y=610,
-    width=150,
-    height=17,
-    value=nomUsage_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-prenom_valeur = data.get('prenom', '')
-c.acroForm.textfield(
-    name="prenom",
-    x=124,
-    y=585,
-    width=300,
-    height=17,
-    value=prenom_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-dateNaissance_valeur = data.get('dateNaissance', '')
-c.acroForm.textfield(
-    name="dateNaissance",
-    x=107,
-    y=560,
-    width=110,
-    height=15,
-    value=dateNaissance_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-communeNaissance_valeur = data.get('communeNaissance', '')
-c.acroForm.textfield(
-    name="communeNaissance",
-    x=280,
-    y=560,
-    width=250,
-    height=17,
-    value=communeNaissance_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-codePostalNaissance_valeur = data.get('codePostalNaissance', '')
-c.acroForm.textfield(
-    name="codePostalNaissance",
-    x=125,
-    y=542,
-    width=80,
-    height=17,
-    value=codePostalNaissance_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-paysNaissance_valeur = data.get('paysNaissance', '')
-c.acroForm.textfield(
-    name="paysNaissance",
-    x=245,
-    y=542,
-    width=285,
-    height=17,
-    value=paysNaissance_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-numeroAdresse_valeur = data.get('numeroAdresse', '')
-c.acroForm.textfield(
-    name="numeroAdresse",
-    x=115,
-    y=500,
-    width=75,
-    height=17,
-    value=numeroAdresse_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-typeVoieAdresse_valeur = data.get('typeVoieAdresse', '')
-c.acroForm.textfield(
-    name="typeVoieAdresse",
-    x=200,
-    y=500,
-    width=75,
-    height=17,
-    value=typeVoieAdresse_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-nomVoieAdresse_valeur = data.get('nomVoieAdresse', '')
-c.acroForm.textfield(
-    name="nomVoieAdresse",
-    x=300,
-    y=500,
-    width=220,
-    height=17,
-    value=nomVoieAdresse_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-codePostal_valeur = data.get('codePostal', '')
-c.acroForm.textfield(
-    name="codePostal",
-    x=130,
-    y=475,
-    width=60,
-    height=17,
-    value=codePostal_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-commune_valeur = data.get('commune', '')
-c.acroForm.textfield(
-    name="commune",
-    x=280,
-    y=475,
-    width=225,
-    height=17,
-    value=commune_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-pays_valeur = data.get('pays', '')
-c.acroForm.textfield(
-    name="pays",
-    x=110,
-    y=455,
-    width=375,
-    height=17,
-    value=pays_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-cni_valeur = data.get('cni', '')
-c.acroForm.textfield(
-    name='cni',
-    x=124,
-    y=386,
-    width=135,
-    height=17,
-    value=cni_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-passeport_valeur = data.get('passeport', '')
-c.acroForm.textfield(
-    name='passeport',
-    x=124,
-    y=386,
-    width=135,
-    height=17,
-    value=passeport_valeur,
-    borderStyle='underlined',
-    forceBorder=True
-)
-
-#----------------------------------------------------------------------------------------------------------------------------------------------
-#CHAMPS À COCHER
-#----------------------------------------------------------------------------------------------------------------------------------------------
-
-perteIdentite_valeur = (data.get('perteIdentite', 'false').lower() == 'true')
-c.acroForm.checkbox(
-    name="perteIdentite",
-    x=340,
-    y=774,
-    size=13,
-    checked=perteIdentite_valeur
-)
-
-pertePasseport_valeur = (data.get('pertePasseport', 'false').lower() == 'true')
-c.acroForm.checkbox(
-    name="pertePasseport",
-    x=460,
-    y=774,
-    size=13,
-    checked=pertePasseport_valeur
-)
-
-majeur_valeur = (data.get('majeur', 'false').lower() == 'true')
-c.acroForm.checkbox(
-    name="majeur",
-    x=263.3,
-    y=696.4,
-    size=13,
-    checked=majeur_valeur
-)
-
-# Sauvegarder le PDF
-try:
-    c.save()
-    print("PDF sauvegardé avec succès: cerfa_14011-02.pdf")
-except Exception as e:
-    print(f"ERREUR lors de la sauvegarde du PDF: {e}", file=sys.stderr)
-    sys.exit(1)
-
-mineur_valeur = (data.get('majeur', 'false').lower() == 'false')
-c.acroForm.checkbox(
-    name="mineur",
-    x=450.9,
-    y=696.4,
-    size=13,
-    checked=mineur_valeur
-)
 
-homme_valeur = (data.get('homme', 'false').lower() == 'true')
-c.acroForm.checkbox(
-    name="homme",
-    x=225.95,
-    y=658.2,
-    size=13,
-    checked=homme_valeur
-)
+    # Sauvegarder le PDF
+    try:
+        pdf_bytes = render_cerfa(data, background_path, form.plan, invariant='--invariant' in sys.argv[1:], output=output)
+        with open(form.output_filename, 'wb') as f:
+            f.write(pdf_bytes)
+        print(f"PDF sauvegardé avec succès: {form.output_filename}")
+    except Exception as e:
+        print(f"ERREUR lors de la sauvegarde du PDF: {e}", file=sys.stderr)
+        sys.exit(1)
 
-femme_valeur = (data.get('femme', 'false').lower() == 'true')
-c.acroForm.checkbox(
-    name="femme",
-    x=305.95,
-    y=658.2,
-    size=13,
-    checked=femme_valeur
-)
 
-c.save()#sauvegarde le pdf
+if __name__ == "__main__":
+    main()
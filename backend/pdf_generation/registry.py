@@ -0,0 +1,142 @@
+import os
+import hashlib
+import threading
+
+try:
+    from pdf_generation.layout import CERFA_14011_02_FIELDS, compile_layout
+    from pdf_generation.template import get_background
+    from pdf_generation.main import render_cerfa, OUTPUT_PROFILES, OUTPUT_FILLABLE
+except ImportError:  # exécution directe : python main.py
+    from layout import CERFA_14011_02_FIELDS, compile_layout
+    from template import get_background
+    from main import render_cerfa, OUTPUT_PROFILES, OUTPUT_FILLABLE
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FORM_ID = "cerfa_14011-02"
+
+
+class UnknownFormError(KeyError):
+    """Levée quand un formulaire demandé n'est pas enregistré"""
+
+
+class FormTemplate:
+    """
+    Un formulaire : image d'arrière plan, table des champs et version.
+
+    Rien n'est chargé à la création : la table est compilée et l'image encodée
+    au premier rendu, puis gardées en mémoire pour les suivants. L'image n'est
+    encodée que pour les profils de sortie effectivement rendus (pleine résolution,
+    JPEG binaire ou ré-échantillonnée : voir main.OUTPUT_PROFILES).
+    """
+
+    def __init__(self, form_id, background, fields, version, title=None, output_filename=None):
+        """
+        Args:
+            form_id: Identifiant du formulaire (ex: "cerfa_14011-02")
+            background: Nom de l'image d'arrière plan (relatif à pdf_generation/) ou chemin absolu
+            fields: Table des champs (voir layout.py)
+            version: Version de la définition; à incrémenter quand le formulaire change
+            title: Libellé lisible du formulaire
+            output_filename: Nom du PDF téléchargé (défaut: "<form_id>.pdf")
+        """
+        self.form_id = form_id
+        self.background_path = background if os.path.isabs(background) else os.path.join(SCRIPT_DIR, background)
+        self.fields = fields
+        self.version = version
+        self.title = title or form_id
+        self.output_filename = output_filename or f"{form_id}.pdf"
+        self._plan = None
+        self._version_key = None
+        self._lock = threading.Lock()
+
+    @property
+    def plan(self):
+        """Plan de rendu compilé (au premier accès)"""
+        if self._plan is None:
+            with self._lock:
+                if self._plan is None:
+                    self._plan = compile_layout(self.fields)
+        return self._plan
+
+    @property
+    def version_key(self):
+        """
+        Version complète du modèle pour le cache et les ETags : identifiant, version
+        déclarée et empreinte de la table des champs et de l'image d'arrière plan.
+        """
+        if self._version_key is None:
+            with self._lock:
+                if self._version_key is None:
+                    digest = hashlib.sha256(repr(self.fields).encode('utf-8'))
+                    with open(self.background_path, 'rb') as f:
+                        digest.update(f.read())
+                    self._version_key = f"{self.form_id}:{self.version}:{digest.hexdigest()[:16]}"
+        return self._version_key
+
+    @property
+    def loaded(self):
+        return self._plan is not None
+
+    def load(self, output=None):
+        """Compile la table et encode l'arrière plan du profil de sortie output maintenant (préchauffage)"""
+        profile = OUTPUT_PROFILES[output or OUTPUT_FILLABLE]
+        get_background(self.background_path, profile["background_dpi"], profile["binary"])
+        return self.plan
+
+    def render(self, data, **render_options):
+        """Génère le PDF (bytes) de ce formulaire pour les valeurs données"""
+        # L'arrière plan du profil demandé est chargé par render_cerfa
+        return render_cerfa(data, self.background_path, self.plan, **render_options)
+
+    def describe(self):
+        """Description publique (pour /api/forms)"""
+        return {
+            "form_id": self.form_id,
+            "title": self.title,
+            "version": self.version,
+            "output_filename": self.output_filename,
+            "fields": [field["name"] for field in self.fields],
+            "loaded": self.loaded,
+        }
+
+
+class FormRegistry:
+    """Registre des formulaires disponibles"""
+
+    def __init__(self):
+        self._forms = {}
+
+    def register(self, form):
+        self._forms[form.form_id] = form
+        return form
+
+    def get(self, form_id=None):
+        """Retourne le formulaire demandé (le CERFA 14011-02 par défaut)"""
+        form_id = form_id or DEFAULT_FORM_ID
+        try:
+            return self._forms[form_id]
+        except KeyError:
+            raise UnknownFormError(form_id) from None
+
+    def __contains__(self, form_id):
+        return form_id in self._forms
+
+    def list_forms(self):
+        return [form.describe() for form in self._forms.values()]
+
+
+REGISTRY = FormRegistry()
+
+REGISTRY.register(FormTemplate(
+    form_id=DEFAULT_FORM_ID,
+    background="cerfaimage.jpg",
+    fields=CERFA_14011_02_FIELDS,
+    version="1",
+    title="CERFA 14011-02 - Déclaration de perte",
+    output_filename="cerfa_14011-02.pdf",
+))
+
+
+def get_form(form_id=None):
+    """Raccourci vers REGISTRY.get"""
+    return REGISTRY.get(form_id)
@@ -0,0 +1,102 @@
+import copy
+import threading
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import _digester
+from reportlab.pdfbase import pdfdoc
+
+# Qualité JPEG de l'arrière plan ré-échantillonné (profil de sortie "compact")
+DOWNSAMPLED_JPEG_QUALITY = 75
+
+
+def load_jpeg(path, dpi=None, page_width=A4[0]):
+    """
+    Retourne le JPEG de l'arrière plan, sa taille en pixels et son mode.
+
+    Avec `dpi`, l'image est ré-échantillonnée pour faire `dpi` points par pouce une
+    fois étalée sur la largeur de la page (elle n'est jamais agrandie).
+    """
+    with Image.open(path) as image:
+        if dpi is None and image.format == "JPEG" and image.mode in ("RGB", "L"):
+            with open(path, 'rb') as f:
+                return f.read(), image.size, image.mode
+        target_width = round(page_width / 72 * dpi) if dpi else image.width
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if image.width > target_width:
+            target_height = round(image.height * target_width / image.width)
+            image = image.resize((target_width, target_height), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=DOWNSAMPLED_JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), image.size, image.mode
+
+
+class CerfaBackground:
+    """
+    Image d'arrière plan d'un CERFA, lue et encodée une seule fois par processus.
+
+    ReportLab relit le JPEG et le ré-encode en ASCII85 à chaque drawImage.
+    Ici, l'objet image PDF est construit une fois puis copié (copie superficielle,
+    le flux encodé est partagé) dans chaque nouveau document.
+
+    Avec `binary`, le JPEG est embarqué tel quel (sans ASCII85, qui ajoute 25 % au
+    flux); avec `dpi`, il est en plus ré-échantillonné une fois à cette résolution.
+    """
+
+    def __init__(self, path, dpi=None, binary=False):
+        self.path = path
+        self.dpi = dpi
+        # Même signature que celle calculée par canvas.drawImage(path) sans masque
+        self.name = _digester('%s%s' % (path, None))
+        if dpi is None and not binary:
+            self._prototype = pdfdoc.PDFImageXObject(self.name, path)
+        else:
+            jpeg, (width, height), mode = load_jpeg(path, dpi)
+            self._prototype = pdfdoc.PDFImageXObject(self.name)
+            self._prototype.width = width
+            self._prototype.height = height
+            self._prototype.bitsPerComponent = 8
+            self._prototype.colorSpace = 'DeviceGray' if mode == "L" else 'DeviceRGB'
+            self._prototype.streamContent = jpeg
+            self._prototype._filters = ('DCTDecode',)
+        self._prototype.name = self.name
+
+    @property
+    def width(self):
+        return self._prototype.width
+
+    @property
+    def height(self):
+        return self._prototype.height
+
+    def stamp(self, c, x, y, width, height):
+        """Dessine l'arrière plan sur le canvas en réutilisant l'image déjà encodée"""
+        reg_name = c._doc.getXObjectName(self.name)
+        if reg_name not in c._doc.idToObject:
+            img_obj = copy.copy(self._prototype)
+            c._doc.Reference(img_obj, reg_name)
+            c._doc.addForm(self.name, img_obj)
+        # drawImage trouve l'objet déjà enregistré et se contente de le placer
+        c.drawImage(self.path, x, y, width=width, height=height)
+
+
+_backgrounds = {}
+_backgrounds_lock = threading.Lock()
+
+
+def get_background(path, dpi=None, binary=False):
+    """Retourne l'arrière plan en cache pour ce fichier et cet encodage (chargé au premier appel)"""
+    binary = binary or dpi is not None
+    key = (path, dpi, binary)
+    background = _backgrounds.get(key)
+    if background is None:
+        with _backgrounds_lock:
+            background = _backgrounds.get(key)
+            if background is None:
+                background = CerfaBackground(path, dpi, binary)
+                _backgrounds[key] = background
+                suffix = f" ({dpi} dpi)" if dpi else ""
+                print(f"[PDF] Arrière plan chargé en cache: {path}{suffix}")
+    return background
@@ -3,83 +3,336 @@ import json
 import subprocess
 import shutil
 import sys
+import uuid
+import queue
 from pathlib import Path
 from profile_manager import ProfileManager
+from pdf_generation.registry import get_form, DEFAULT_FORM_ID
+from pdf_generation.main import OUTPUT_PROFILES, OUTPUT_FILLABLE
+from pdf_worker_pool import PDFPoolSaturated
+from pdf_cache import PDFCache
+
+# Modes d'exécution du rendu PDF
+ISOLATION_INPROCESS = "inprocess"
+ISOLATION_SUBPROCESS = "subprocess"
 
 
 class PDFGenerator:
-    """Génère les PDFs en utilisant le script main.py"""
+    """Génère les PDFs des formulaires du registre (dans le processus ou en sous-processus)"""
     
-    def __init__(self, pdf_gen_path, project_root):
+    def __init__(self, pdf_gen_path, project_root, isolation=None, cache=None, pool=None, debug_workdir=None, invariant=None, output=None):
         """
         Initialise le générateur de PDF
         
         Args:
             pdf_gen_path: Chemin vers backend/pdf_generation/
             project_root: Chemin racine du projet
+            isolation: "inprocess" (défaut) ou "subprocess" pour lancer main.py
+                dans un processus Python séparé. Par défaut, lit la variable
+                d'environnement PDF_ISOLATION.
+            cache: PDFCache optionnel; les PDFs déjà générés pour les mêmes
+                champs et la même version du modèle sont servis depuis le cache.
+            pool: PDFWorkerPool optionnel; en mode "inprocess", le rendu est
+                exécuté dans ce pool de processus au lieu du thread appelant.
+            debug_workdir: Si True, écrit aussi bdd.json et le PDF dans
+                public/temp/pdf_gen_<user_id>/ pour inspection. Par défaut, lit la
+                variable d'environnement PDF_DEBUG_WORKDIR.
+            invariant: Si True (défaut), des données identiques produisent un PDF
+                identique à l'octet près (date et ID de document fixes), ce qui
+                permet le cache HTTP par ETag. Par défaut, lit PDF_INVARIANT.
+            output: Profil de sortie par défaut ("fillable", "flattened" ou
+                "compact"). Par défaut, lit PDF_OUTPUT_PROFILE ("fillable").
         """
         self.pdf_gen_path = pdf_gen_path
         self.project_root = project_root
+        self.isolation = isolation or os.environ.get("PDF_ISOLATION", ISOLATION_INPROCESS)
+        self.cache = cache
+        self.pool = pool
+        if debug_workdir is None:
+            debug_workdir = os.environ.get("PDF_DEBUG_WORKDIR", "") not in ("", "0", "false")
+        self.debug_workdir = debug_workdir
+        if invariant is None:
+            invariant = os.environ.get("PDF_INVARIANT", "1") not in ("", "0", "false")
+        self.invariant = invariant
+        self.output = output or os.environ.get("PDF_OUTPUT_PROFILE", OUTPUT_FILLABLE)
+        if self.output not in OUTPUT_PROFILES:
+            raise ValueError(f"Profil de sortie PDF inconnu: {self.output}")
+        self.render_options = {"invariant": self.invariant, "output": self.output}
+        if self.isolation not in (ISOLATION_INPROCESS, ISOLATION_SUBPROCESS):
+            raise ValueError(f"Mode d'isolation PDF inconnu: {self.isolation}")
         self.main_py_path = os.path.join(pdf_gen_path, "main.py")
-        self.cerfaimage_path = os.path.join(pdf_gen_path, "cerfaimage.jpg")
         
         # Vérifier que les fichiers existent
         if not os.path.exists(self.main_py_path):
             raise FileNotFoundError(f"main.py non trouvé: {self.main_py_path}")
         
-        if not os.path.exists(self.cerfaimage_path):
-            raise FileNotFoundError(f"cerfaimage.jpg non trouvé: {self.cerfaimage_path}")
+        default_form = get_form(DEFAULT_FORM_ID)
+        if not os.path.exists(default_form.background_path):
+            raise FileNotFoundError(f"Arrière plan non trouvé: {default_form.background_path}")
+        
+        # Charger le formulaire par défaut au démarrage (mode dans le processus);
+        # les autres formulaires sont chargés à leur premier rendu
+        if self.isolation == ISOLATION_INPROCESS and not self.pool:
+            default_form.load(self.output)
+    
+    def options_for(self, output=None):
+        """Options de rendu pour un profil de sortie (celui par défaut si None)"""
+        if not output or output == self.output:
+            return self.render_options
+        if output not in OUTPUT_PROFILES:
+            raise ValueError(f"Profil de sortie PDF inconnu: {output}")
+        return dict(self.render_options, output=output)
+    
+    def generate_pdf_bytes(self, profile_data, user_id="default_user", form_id=DEFAULT_FORM_ID, output=None):
+        """
+        Génère un PDF en mémoire à partir des données du profil
+        
+        Args:
+            profile_data: Dictionnaire des données du profil
+            user_id: ID de l'utilisateur (utilisé pour le dossier de debug)
+            form_id: Formulaire à remplir (voir pdf_generation/registry.py)
+            output: Profil de sortie (défaut: celui du générateur)
+        
+        Returns:
+            Tuple (success, pdf_bytes/message)
+        
+        Raises:
+            PDFPoolSaturated: si la file du pool de rendu est pleine
+            UnknownFormError: si form_id n'est pas enregistré
+        """
+        form = get_form(form_id)
+        render_options = self.options_for(output)
+        try:
+            # 1. Filtrer les métadonnées et convertir toutes les valeurs en strings
+            clean_data = self._clean_profile_data(profile_data)
+            
+            # 2. Chercher un PDF déjà généré pour les mêmes champs
+            cache_key = None
+            pdf_bytes = None
+            if self.cache:
+                cache_key = self.cache.make_key(clean_data, form.version_key, render_options)
+                pdf_bytes = self.cache.get(cache_key)
+                if pdf_bytes is not None:
+                    print(f"[PDF] PDF servi depuis le cache: {cache_key}")
+            
+            # 3. Générer le PDF
+            if pdf_bytes is None:
+                if self.isolation == ISOLATION_SUBPROCESS:
+                    success, result = self._generate_pdf_subprocess(clean_data, form, render_options)
+                    if not success:
+                        return False, result
+                    pdf_bytes = result
+                elif self.pool:
+                    pdf_bytes = self.pool.render(clean_data, render_options, form_id=form.form_id)
+                else:
+                    pdf_bytes = form.render(clean_data, **render_options)
+                
+                if self.cache:
+                    self.cache.put(cache_key, pdf_bytes)
+                print(f"[PDF] PDF généré en mémoire ({len(pdf_bytes)} octets)")
+            
+            # 4. Option de debug : garder une copie sur disque
+            if self.debug_workdir:
+                self._write_debug_workdir(clean_data, pdf_bytes, user_id, form.output_filename)
+            
+            return True, pdf_bytes
+        
+        except PDFPoolSaturated:
+            # Laisser l'appelant répondre 503 plutôt qu'une erreur de génération
+            raise
+        
+        except TimeoutError:
+            error = "Timeout lors de la génération du PDF (> 30s)"
+            print(f"[PDF ERROR] {error}")
+            return False, error
+        
+        except Exception as e:
+            error = f"Erreur lors de la génération du PDF: {str(e)}"
+            print(f"[PDF ERROR] {error}")
+            return False, error
     
-    def generate_pdf(self, profile_data, user_id="default_user", output_filename="cerfa_14011-02.pdf"):
+    def pdf_etag(self, profile_data, form_id=DEFAULT_FORM_ID, output=None):
         """
-        Génère un PDF à partir des données du profil
+        ETag fort du PDF qui serait généré pour ce profil, sans le générer.
+        
+        Dérivé du hash des champs nettoyés, de la version du formulaire et des options
+        de rendu. Ne vaut que si le rendu est invariant (sinon retourne None).
+        """
+        if not self.invariant:
+            return None
+        clean_data = self._clean_profile_data(profile_data)
+        return PDFCache.make_key(clean_data, get_form(form_id).version_key, self.options_for(output))
+    
+    def generate_pdf(self, profile_data, user_id="default_user", output_filename=None, form_id=DEFAULT_FORM_ID, output=None):
+        """
+        Génère un PDF et l'écrit dans public/temp/pdf_gen_<user_id>/ (debug / compatibilité)
         
         Args:
             profile_data: Dictionnaire des données du profil
             user_id: ID de l'utilisateur
-            output_filename: Nom du fichier PDF de sortie
+            output_filename: Nom du fichier PDF de sortie (défaut: celui du formulaire)
+            form_id: Formulaire à remplir
+            output: Profil de sortie (défaut: celui du générateur)
         
         Returns:
             Tuple (success, message/path)
+        
+        Raises:
+            PDFPoolSaturated: si la file du pool de rendu est pleine
         """
+        success, result = self.generate_pdf_bytes(profile_data, user_id, form_id, output)
+        if not success:
+            return False, result
+        
+        output_filename = output_filename or get_form(form_id).output_filename
         try:
-            # 1. Créer le dossier temporaire pour ce PDF
-            temp_workdir = os.path.join(
-                self.project_root, 
-                "public", "temp", 
-                f"pdf_gen_{user_id}"
-            )
+            temp_workdir = self._workdir(user_id)
+            Path(temp_workdir).mkdir(parents=True, exist_ok=True)
+            pdf_path = os.path.join(temp_workdir, output_filename)
+            with open(pdf_path, 'wb') as f:
+                f.write(result)
+            print(f"[PDF] PDF écrit: {pdf_path}")
+            return True, pdf_path
+        except Exception as e:
+            error = f"Erreur lors de l'écriture du PDF: {str(e)}"
+            print(f"[PDF ERROR] {error}")
+            return False, error
+    
+    def _workdir(self, user_id):
+        """Dossier temporaire de l'utilisateur (mode debug et sous-processus)"""
+        return os.path.join(
+            self.project_root, 
+            "public", "temp", 
+            f"pdf_gen_{user_id}"
+        )
+    
+    def _write_debug_workdir(self, clean_data, pdf_bytes, user_id, output_filename):
+        """Écrit bdd.json et le PDF dans le dossier temporaire de l'utilisateur"""
+        try:
+            temp_workdir = self._workdir(user_id)
             Path(temp_workdir).mkdir(parents=True, exist_ok=True)
+            with open(os.path.join(temp_workdir, "bdd.json"), 'w', encoding='utf-8') as f:
+                json.dump(clean_data, f, indent=2, ensure_ascii=False)
+            with open(os.path.join(temp_workdir, output_filename), 'wb') as f:
+                f.write(pdf_bytes)
+            print(f"[PDF DEBUG] Copie écrite dans: {temp_workdir}")
+        except Exception as e:
+            print(f"[PDF WARNING] Écriture du dossier de debug impossible: {e}")
+    
+    def render_many(self, profiles, window=None, form_id=DEFAULT_FORM_ID, output=None):
+        """
+        Génère plusieurs PDFs en parallèle, en mémoire.
+        
+        Args:
+            profiles: Liste de dictionnaires de profil
+            form_id: Formulaire à remplir pour tous les profils du lot
+            output: Profil de sortie (défaut: celui du générateur)
+            window: Nombre maximal de rendus en cours pour ce lot (défaut: nombre
+                de processus du pool), pour ne pas monopoliser le pool
+        
+        Yields:
+            Tuples (index, success, pdf_bytes/message) dans l'ordre de fin de rendu
+        
+        Raises:
+            UnknownFormError: si form_id n'est pas enregistré
+        """
+        form = get_form(form_id)
+        render_options = self.options_for(output)
+        pending = []
+        for index, profile_data in enumerate(profiles):
+            try:
+                clean_data = self._clean_profile_data(profile_data)
+            except Exception as e:
+                yield index, False, f"Profil invalide: {e}"
+                continue
             
-            # 2. Copier cerfaimage.jpg dans le dossier temporaire
-            shutil.copy(
-                self.cerfaimage_path,
-                os.path.join(temp_workdir, "cerfaimage.jpg")
-            )
+            cache_key = self.cache.make_key(clean_data, form.version_key, render_options) if self.cache else None
+            pdf_bytes = self.cache.get(cache_key) if self.cache else None
+            if pdf_bytes is not None:
+                yield index, True, pdf_bytes
+            else:
+                pending.append((index, clean_data, cache_key))
+        
+        if self.pool and self.isolation == ISOLATION_INPROCESS:
+            yield from self._render_many_pool(pending, window or self.pool.max_workers, form, render_options)
+            return
+        
+        # Sans pool : rendu séquentiel
+        for index, clean_data, cache_key in pending:
+            try:
+                if self.isolation == ISOLATION_SUBPROCESS:
+                    success, result = self._generate_pdf_subprocess(clean_data, form, render_options)
+                    if not success:
+                        yield index, False, result
+                        continue
+                    pdf_bytes = result
+                else:
+                    pdf_bytes = form.render(clean_data, **render_options)
+                if self.cache:
+                    self.cache.put(cache_key, pdf_bytes)
+                yield index, True, pdf_bytes
+            except Exception as e:
+                yield index, False, f"Erreur lors de la génération du PDF: {str(e)}"
+    
+    def _render_many_pool(self, pending, window, form, render_options):
+        """Rendu d'un lot via le pool, avec au plus `window` rendus en cours"""
+        done = queue.Queue()
+        in_flight = 0
+        remaining = list(reversed(pending))
+        
+        while remaining or in_flight:
+            # Remplir la fenêtre (attend une place libre dans le pool si nécessaire)
+            while remaining and in_flight < window:
+                index, clean_data, cache_key = remaining.pop()
+                future = self.pool.submit(clean_data, block=True, render_options=render_options,
+                                          form_id=form.form_id)
+                future.add_done_callback(lambda f, i=index, k=cache_key: done.put((i, k, f)))
+                in_flight += 1
             
-            # 3. Créer bdd.json dans le dossier temporaire
-            # Filtrer les métadonnées et convertir toutes les valeurs en strings
-            clean_data = {}
-            for k, v in profile_data.items():
-                if not k.startswith('_'):  # Skip metadata
-                    # Convert None to empty string, everything else to string
-                    clean_data[k] = '' if v is None else str(v)
+            index, cache_key, future = done.get()
+            in_flight -= 1
+            try:
+                pdf_bytes = future.result()
+            except Exception as e:
+                yield index, False, f"Erreur lors de la génération du PDF: {str(e)}"
+                continue
+            if self.cache:
+                self.cache.put(cache_key, pdf_bytes)
+            yield index, True, pdf_bytes
+    
+    @staticmethod
+    def _clean_profile_data(profile_data):
+        """Retire les métadonnées (clés '_...') et convertit toutes les valeurs en strings"""
+        clean_data = {}
+        for k, v in profile_data.items():
+            if not k.startswith('_'):  # Skip metadata
+                # Convert None to empty string, everything else to string
+                clean_data[k] = '' if v is None else str(v)
+        return clean_data
+    
+    def _generate_pdf_subprocess(self, clean_data, form, render_options):
+        """Mode isolé : exécute main.py dans un processus Python séparé et retourne les bytes du PDF"""
+        # Dossier propre à cet appel : deux requêtes simultanées ne se marchent pas dessus
+        temp_workdir = self._workdir(f"subprocess_{uuid.uuid4().hex}")
+        try:
+            Path(temp_workdir).mkdir(parents=True, exist_ok=True)
             
+            # Créer bdd.json dans le dossier temporaire
             bdd_json_path = os.path.join(temp_workdir, "bdd.json")
             with open(bdd_json_path, 'w', encoding='utf-8') as f:
                 json.dump(clean_data, f, indent=2, ensure_ascii=False)
             
             print(f"[PDF] bdd.json créé: {bdd_json_path}")
-            print(f"[PDF] Contenu de bdd.json: {json.dumps(clean_data, indent=2, ensure_ascii=False)[:500]}...")  # Log first 500 chars
-            
-            # 4. Exécuter main.py dans le dossier temporaire
-            pdf_path = os.path.join(temp_workdir, output_filename)
             
+            # Exécuter main.py dans le dossier temporaire (l'arrière plan est lu depuis pdf_generation/)
             print(f"[PDF] Exécution de: {sys.executable} {self.main_py_path}")
             print(f"[PDF] Working directory: {temp_workdir}")
             
+            command = [sys.executable, self.main_py_path, "--form", form.form_id, "--output", render_options["output"]]
+            if render_options["invariant"]:
+                command.append("--invariant")
             result = subprocess.run(
-                [sys.executable, self.main_py_path],
+                command,
                 cwd=temp_workdir,
                 capture_output=True,
                 text=True,
@@ -94,23 +347,22 @@ class PDFGenerator:
             print(f"[PDF] return code: {result.returncode}")
             
             # Vérifier si le PDF a été créé
+            pdf_path = os.path.join(temp_workdir, form.output_filename)
             if not os.path.exists(pdf_path):
                 error_msg = f"Erreur: {result.stderr}" if result.stderr else "PDF non généré"
                 print(f"[PDF ERROR] {error_msg}")
                 return False, error_msg
             
-            print(f"[PDF] PDF généré: {pdf_path}")
-            return True, pdf_path
+            with open(pdf_path, 'rb') as f:
+                return True, f.read()
         
         except subprocess.TimeoutExpired:
             error = "Timeout lors de la génération du PDF (> 30s)"
             print(f"[PDF ERROR] {error}")
             return False, error
         
-        except Exception as e:
-            error = f"Erreur lors de la génération du PDF: {str(e)}"
-            print(f"[PDF ERROR] {error}")
-            return False, error
+        finally:
+            shutil.rmtree(temp_workdir, ignore_errors=True)
     
     def cleanup_temp_pdf_folder(self, user_id="default_user"):
         """Nettoie le dossier temporaire après utilisation"""
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import uuid
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gestion_db import (
+    creer_job_pdf, mettre_a_jour_job_pdf, recuperer_job_pdf, recuperer_jobs_pdf_non_termines,
+    supprimer_jobs_pdf_expires, recuperer_ids_jobs_pdf, marquer_document_rempli, JOB_EN_ATTENTE, JOB_EN_COURS, JOB_TERMINE, JOB_ECHEC
+)
+from pdf_worker_pool import PDFPoolSaturated
+from pdf_generation.registry import DEFAULT_FORM_ID
+
+# Durée de conservation des jobs terminés ou en échec (et de leur PDF)
+PDF_JOB_TTL_HOURS = float(os.environ.get('PDF_JOB_TTL_HOURS', '24'))
+# Attente maximale d'une place dans le pool de rendu, en secondes, avant l'échec du job
+PDF_JOB_MAX_WAIT = float(os.environ.get('PDF_JOB_MAX_WAIT', '300'))
+# Intervalle minimal entre deux nettoyages des jobs expirés, en secondes
+PDF_JOB_COLLECT_INTERVAL = 60
+
+
+class PDFJobManager:
+    """
+    Génération PDF asynchrone : les jobs sont persistés en BDD et exécutés en arrière plan.
+
+    Les jobs terminés ou en échec sont supprimés avec leur PDF après ttl secondes
+    (collect_expired, appelé au démarrage et lors des soumissions).
+    """
+
+    def __init__(self, pdf_generator, jobs_folder, max_workers=2, ttl=None, max_wait=None):
+        """
+        Initialise le gestionnaire de jobs
+
+        Args:
+            pdf_generator: PDFGenerator utilisé pour le rendu
+            jobs_folder: Dossier où sont conservés les PDFs des jobs terminés
+            max_workers: Nombre de jobs exécutés en parallèle (le rendu lui-même
+                passe par le pool de processus du PDFGenerator)
+            ttl: Durée de conservation d'un job terminé ou en échec, en secondes
+            max_wait: Attente maximale d'une place dans le pool saturé, en secondes
+        """
+        self.pdf_generator = pdf_generator
+        self.jobs_folder = jobs_folder
+        self.ttl = ttl if ttl is not None else PDF_JOB_TTL_HOURS * 3600
+        self.max_wait = max_wait if max_wait is not None else PDF_JOB_MAX_WAIT
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-job")
+        self._collect_lock = threading.Lock()
+        self._last_collect = None
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        Path(self.jobs_folder).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, profile_data, user_id="default_user", doc_id=None, form_id=None, output=None):
+        """
+        Crée un job et le met en file; retourne immédiatement son ID (ou None en cas d'erreur BDD)
+        """
+        self._collect_if_due()
+        job_id = uuid.uuid4().hex
+        profil_json = json.dumps(profile_data, ensure_ascii=False)
+        if not creer_job_pdf(job_id, profil_json, user_id, doc_id, form_id, output):
+            return None
+        self._executor.submit(self._run, job_id, profile_data, user_id, doc_id, form_id, output)
+        return job_id
+
+    def resume_pending_jobs(self):
+        """Relance les jobs restés en attente ou en cours lors du dernier arrêt du serveur"""
+        jobs = recuperer_jobs_pdf_non_termines()
+        for job in jobs:
+            mettre_a_jour_job_pdf(job['id'], JOB_EN_ATTENTE)
+            profile_data = json.loads(job['profil_json'])
+            self._executor.submit(self._run, job['id'], profile_data, job['user_id'], job['doc_id'],
+                                  job['form_id'], job['profil_sortie'])
+        if jobs:
+            print(f"[PDF JOBS] {len(jobs)} job(s) relancé(s) après redémarrage")
+        return len(jobs)
+
+    def get_job(self, job_id):
+        """Retourne l'état public d'un job (sans le profil) ou None"""
+        job = recuperer_job_pdf(job_id)
+        if not job:
+            return None
+        return {
+            "job_id": job['id'],
+            "statut": job['statut'],
+            "doc_id": job['doc_id'],
+            "form_id": job['form_id'] or DEFAULT_FORM_ID,
+            "output": job['profil_sortie'] or self.pdf_generator.output,
+            "erreur": job['erreur'],
+            "date_creation": job['date_creation'],
+            "date_maj": job['date_maj'],
+        }
+
+    def get_pdf_path(self, job_id):
+        """Chemin du PDF d'un job terminé, ou None"""
+        job = recuperer_job_pdf(job_id)
+        if not job or job['statut'] != JOB_TERMINE or not job['chemin_pdf']:
+            return None
+        if not os.path.exists(job['chemin_pdf']):
+            return None
+        return job['chemin_pdf']
+
+    def get_etag(self, job_id):
+        """ETag du PDF d'un job, dérivé du profil soumis (None si le rendu n'est pas invariant)"""
+        job = recuperer_job_pdf(job_id)
+        if not job:
+            return None
+        return self.pdf_generator.pdf_etag(json.loads(job['profil_json']), job['form_id'] or DEFAULT_FORM_ID,
+                                           job['profil_sortie'])
+
+    def _echec(self, job_id, erreur):
+        mettre_a_jour_job_pdf(job_id, JOB_ECHEC, erreur=erreur)
+        self.failed += 1
+
+    def _run(self, job_id, profile_data, user_id, doc_id, form_id=None, output=None):
+        """Exécute un job dans un thread d'arrière plan"""
+        try:
+            mettre_a_jour_job_pdf(job_id, JOB_EN_COURS)
+
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                try:
+                    success, result = self.pdf_generator.generate_pdf_bytes(profile_data, user_id, form_id or DEFAULT_FORM_ID, output)
+                    break
+                except PDFPoolSaturated as e:
+                    # Le pool est occupé par des requêtes synchrones : patienter, dans la limite de max_wait
+                    reste = deadline - time.monotonic()
+                    if reste <= 0:
+                        self._echec(job_id, f"Serveur de génération PDF occupé depuis plus de {int(self.max_wait)}s")
+                        return
+                    time.sleep(min(e.retry_after, reste))
+
+            if not success:
+                self._echec(job_id, result)
+                return
+
+            job_pdf_path = os.path.join(self.jobs_folder, f"{job_id}.pdf")
+            with open(job_pdf_path, 'wb') as f:
+                f.write(result)
+
+            if doc_id is not None and not marquer_document_rempli(doc_id):
+                self._echec(job_id, f"Impossible de mettre à jour le document ID {doc_id}.")
+                return
+
+            mettre_a_jour_job_pdf(job_id, JOB_TERMINE, chemin_pdf=job_pdf_path)
+            self.completed += 1
+            print(f"[PDF JOBS] Job {job_id} terminé: {job_pdf_path}")
+
+        except Exception as e:
+            print(f"[PDF JOBS ERROR] Job {job_id}: {e}")
+            self._echec(job_id, str(e))
+
+    def _collect_if_due(self):
+        """Nettoie les jobs expirés si le dernier nettoyage date de plus de PDF_JOB_COLLECT_INTERVAL"""
+        with self._collect_lock:
+            now = time.monotonic()
+            if self._last_collect is not None and now - self._last_collect < PDF_JOB_COLLECT_INTERVAL:
+                return
+            self._last_collect = now
+        self.collect_expired()
+
+    def collect_expired(self):
+        """
+        Supprime les jobs terminés ou en échec plus anciens que ttl et leur PDF, ainsi
+        que les PDFs plus anciens que ttl qui n'appartiennent à aucun job.
+
+        Returns:
+            Nombre de jobs supprimés
+        """
+        now = time.time()
+        jobs = supprimer_jobs_pdf_expires(datetime.datetime.now() - datetime.timedelta(seconds=self.ttl))
+        for _, chemin_pdf in jobs:
+            if chemin_pdf:
+                try:
+                    os.remove(chemin_pdf)
+                except FileNotFoundError:
+                    pass
+        self.expired += len(jobs)
+
+        # PDFs dont le job a été supprimé sans eux (arrêt du serveur pendant le nettoyage)
+        ids = recuperer_ids_jobs_pdf()
+        if ids is not None:
+            with os.scandir(self.jobs_folder) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.pdf') or entry.name[:-len('.pdf')] in ids:
+                        continue
+                    try:
+                        if now - entry.stat().st_mtime > self.ttl:
+                            os.remove(entry.path)
+                    except OSError:
+                        continue
+        if jobs:
+            print(f"[PDF JOBS] {len(jobs)} job(s) expiré(s) supprimé(s)")
+        return len(jobs)
+
+    def stats(self):
+        """Compteurs des jobs (pour /api/metrics)"""
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "ttl": self.ttl,
+            "max_wait": self.max_wait,
+        }
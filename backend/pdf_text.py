@@ -0,0 +1,42 @@
+import os
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # dépendance optionnelle : seuls le nom et la catégorie sont alors indexés
+    PdfReader = None
+
+# Limites de l'extraction (le texte sert à la recherche, pas à l'affichage)
+PDF_TEXT_MAX_PAGES = int(os.environ.get('PDF_TEXT_MAX_PAGES', '50'))
+PDF_TEXT_MAX_CHARS = int(os.environ.get('PDF_TEXT_MAX_CHARS', '200000'))
+
+
+def extract_pdf_text(pdf_path, max_pages=None, max_chars=None, filename=None):
+    """
+    Texte d'un PDF pour l'index de recherche.
+
+    Seules les premières pages sont lues (PDF_TEXT_MAX_PAGES) et le texte est
+    tronqué à PDF_TEXT_MAX_CHARS caractères. filename : nom d'origine du fichier,
+    si pdf_path n'a pas d'extension (blob, fichier temporaire).
+
+    Returns:
+        Le texte extrait, ou "" si le fichier n'est pas un PDF, si pypdf n'est pas
+        installé ou si l'extraction échoue (PDF scanné, chiffré, corrompu, ...)
+    """
+    if PdfReader is None or not (filename or pdf_path).lower().endswith('.pdf') or not os.path.exists(pdf_path):
+        return ""
+    max_pages = max_pages or PDF_TEXT_MAX_PAGES
+    max_chars = max_chars or PDF_TEXT_MAX_CHARS
+
+    morceaux = []
+    longueur = 0
+    try:
+        reader = PdfReader(pdf_path)
+        for page in reader.pages[:max_pages]:
+            texte = page.extract_text() or ""
+            morceaux.append(texte)
+            longueur += len(texte)
+            if longueur >= max_chars:
+                break
+    except Exception as e:
+        print(f"[SEARCH WARNING] Extraction du texte impossible pour {filename or os.path.basename(pdf_path)}: {e}")
+    return " ".join(" ".join(morceaux).split())[:max_chars]
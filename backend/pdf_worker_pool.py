@@ -0,0 +1,338 @@
+import os
+import math
+import time
+import signal
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from pdf_generation.registry import get_form, DEFAULT_FORM_ID
+from pdf_generation.main import OUTPUT_FILLABLE
+
+
+class PDFPoolSaturated(Exception):
+    """Levée quand la file d'attente du pool de rendu PDF est pleine, ou qu'un rendu y attend trop longtemps"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"File de génération PDF pleine, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _WorkerSlots:
+    """
+    Processus d'un pool et rendu en cours sur chacun, en mémoire partagée.
+
+    Chaque processus y inscrit son PID au démarrage puis l'identifiant et l'heure
+    de début de chaque rendu : le pool sait ainsi si un rendu a commencé (ou attend
+    encore un processus libre) et quels processus arrêter s'il se bloque.
+    """
+
+    def __init__(self, size):
+        self.lock = multiprocessing.Lock()
+        self.count = multiprocessing.RawValue('i', 0)
+        self.pids = multiprocessing.RawArray('q', size)
+        self.task_ids = multiprocessing.RawArray('q', size)
+        self.started_at = multiprocessing.RawArray('d', size)
+
+    def register(self):
+        """Réserve une place pour le processus courant et retourne son index"""
+        with self.lock:
+            index = self.count.value % len(self.pids)
+            self.count.value += 1
+            self.pids[index] = os.getpid()
+        return index
+
+    def start(self, index, task_id):
+        with self.lock:
+            self.task_ids[index] = task_id
+            self.started_at[index] = time.time()
+
+    def task_started_at(self, task_id):
+        """Heure de début du rendu task_id, ou None s'il attend encore un processus"""
+        with self.lock:
+            for index, current in enumerate(self.task_ids):
+                if current == task_id:
+                    return self.started_at[index]
+        return None
+
+    def worker_pids(self):
+        with self.lock:
+            return [pid for pid in self.pids if pid]
+
+
+# Place du processus de rendu courant dans _WorkerSlots (définies par _init_worker)
+_worker_slots = None
+_worker_index = None
+
+
+def _init_worker(slots, warm_form_ids, warm_output):
+    """Initialise un processus de rendu : les formulaires courants sont chargés une fois par processus"""
+    global _worker_slots, _worker_index
+    _worker_slots = slots
+    _worker_index = slots.register()
+    for form_id in warm_form_ids:
+        get_form(form_id).load(warm_output)
+
+
+def _run_task(task_id, form_id, clean_data, render_options):
+    """Point d'entrée d'un rendu dans un processus du pool : signale son début au pool"""
+    _worker_slots.start(_worker_index, task_id)
+    return _render_in_worker(form_id, clean_data, render_options)
+
+
+def _render_in_worker(form_id, clean_data, render_options):
+    """Exécuté dans un processus du pool; retourne le PDF et les horodatages du rendu"""
+    started_at = time.time()
+    pdf_bytes = get_form(form_id).render(clean_data, **render_options)
+    return pdf_bytes, started_at, time.time() - started_at
+
+
+def _percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class PDFWorkerPool:
+    """
+    Pool de processus dédié au rendu PDF, avec une file d'attente bornée.
+
+    Un rendu (render) qui attend un processus libre depuis plus de timeout est
+    abandonné avec PDFPoolSaturated : il est annulé s'il est encore dans la file,
+    sinon son résultat est ignoré. Un rendu commencé depuis plus de timeout est
+    bloqué : les processus du pool sont arrêtés et remplacés (un processus ne peut
+    pas être interrompu autrement). Les autres rendus en cours sur ces processus
+    échouent alors avec BrokenProcessPool, et leurs places dans la file sont libérées.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, timeout=30, warm_form_ids=(DEFAULT_FORM_ID,), warm_output=None):
+        """
+        Initialise le pool
+
+        Args:
+            max_workers: Nombre de processus de rendu (PDF_POOL_WORKERS, défaut: min(4, nb CPU))
+            max_queue: Nombre de rendus pouvant attendre un processus libre
+                (PDF_POOL_QUEUE, défaut: 16). Au-delà, PDFPoolSaturated est levée.
+            timeout: Durée maximale d'un rendu en secondes, comptée à partir de son début;
+                c'est aussi l'attente maximale d'un processus libre
+            warm_form_ids: Formulaires préchargés au démarrage de chaque processus;
+                les autres sont chargés au premier rendu puis gardés en mémoire
+            warm_output: Profil de sortie dont l'arrière plan est préchargé
+                (défaut: PDF_OUTPUT_PROFILE, comme PDFGenerator)
+        """
+        self.warm_form_ids = tuple(warm_form_ids)
+        self.warm_output = warm_output or os.environ.get("PDF_OUTPUT_PROFILE", OUTPUT_FILLABLE)
+        self.max_workers = max_workers or int(os.environ.get('PDF_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get('PDF_POOL_QUEUE', '16'))
+        self.timeout = timeout
+
+        # Une place par processus plus une place par rendu en attente
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count(1)
+        self._workers = None
+        self._executor = self._create_executor()
+
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self._wait_times = deque(maxlen=1000)
+        self._render_times = deque(maxlen=1000)
+
+    def _create_executor(self):
+        """Nouveau pool de processus; self._workers suit ses processus et leurs rendus"""
+        self._workers = _WorkerSlots(self.max_workers)
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self._workers, self.warm_form_ids, self.warm_output)
+        )
+
+    def retry_after(self):
+        """Estimation (en secondes) du temps nécessaire pour vider la file actuelle"""
+        with self._lock:
+            avg_render = (sum(self._render_times) / len(self._render_times)) if self._render_times else 1.0
+            pending = self.in_flight
+        return max(1, math.ceil(avg_render * pending / self.max_workers))
+
+    def submit(self, clean_data, block=False, render_options=None, form_id=DEFAULT_FORM_ID):
+        """
+        Soumet un rendu au pool et retourne un Future dont le résultat est le PDF (bytes).
+
+        Args:
+            clean_data: Champs nettoyés du formulaire
+            block: Si True, attend qu'une place se libère au lieu de lever PDFPoolSaturated
+            render_options: Arguments nommés supplémentaires pour render_cerfa
+            form_id: Formulaire à remplir (voir pdf_generation/registry.py)
+        """
+        render_options = render_options or {}
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self.rejected += 1
+            raise PDFPoolSaturated(self.retry_after())
+
+        submitted_at = time.time()
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+            task_id = next(self._task_ids)
+            executor, workers = self._executor, self._workers
+
+        try:
+            future = executor.submit(_run_task, task_id, form_id, clean_data, render_options)
+        except BrokenProcessPool:
+            # Un processus est mort : recréer le pool et réessayer une fois
+            print("[PDF POOL WARNING] Pool de rendu cassé, recréation")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._create_executor()
+                executor, workers = self._executor, self._workers
+            try:
+                future = executor.submit(_run_task, task_id, form_id, clean_data, render_options)
+            except Exception:
+                self._release(failed=True)
+                raise
+        except Exception:
+            self._release(failed=True)
+            raise
+
+        return _PoolFuture(self, future, submitted_at, executor, workers, task_id)
+
+    def render(self, clean_data, render_options=None, form_id=DEFAULT_FORM_ID):
+        """
+        Rend un PDF via le pool et attend le résultat (bytes).
+
+        Lève PDFPoolSaturated si aucun processus ne s'est libéré en timeout secondes,
+        et TimeoutError si le rendu dure plus de timeout secondes (ses processus sont
+        alors recyclés, voir la classe). Dans les deux cas sa place finit par être libérée.
+        """
+        future = self.submit(clean_data, render_options=render_options, form_id=form_id)
+        wait = self.timeout
+        while True:
+            try:
+                return future.result(timeout=wait)
+            except FutureTimeoutError:
+                pass
+            started_at = future.started_at()
+            if started_at is None:
+                # Toujours en attente d'un processus : ne pas pénaliser les rendus en cours
+                future.cancel()
+                with self._lock:
+                    self.queue_timeouts += 1
+                raise PDFPoolSaturated(self.retry_after())
+            wait = started_at + self.timeout - time.time()
+            if wait <= 0:
+                with self._lock:
+                    self.timeouts += 1
+                self._recycle(future.executor)
+                raise TimeoutError(f"Rendu PDF plus long que {self.timeout}s")
+
+    def _recycle(self, executor):
+        """Remplace executor par un nouveau pool et arrête ses processus (rendu bloqué)"""
+        with self._lock:
+            if self._executor is not executor:
+                # Déjà remplacé (autre rendu expiré, pool cassé)
+                return
+            workers = self._workers
+            self._executor = self._create_executor()
+            self.recycled += 1
+        print("[PDF POOL WARNING] Rendu trop long, processus de rendu recréés")
+        for pid in workers.worker_pids():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                # Processus déjà terminé
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, failed=False, wait_time=None, render_time=None):
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self._wait_times.append(wait_time)
+                self._render_times.append(render_time)
+        self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Métriques du pool (pour /api/metrics)"""
+        with self._lock:
+            waits = list(self._wait_times)
+            renders = list(self._render_times)
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "queue_timeouts": self.queue_timeouts,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "wait_time_ms": {
+                    "p50": _percentile(waits, 0.50) * 1000,
+                    "p95": _percentile(waits, 0.95) * 1000,
+                },
+                "render_time_ms": {
+                    "p50": _percentile(renders, 0.50) * 1000,
+                    "p95": _percentile(renders, 0.95) * 1000,
+                },
+            }
+
+
+class _PoolFuture:
+    """Enveloppe d'un Future du pool : libère la place et enregistre les temps à la fin du rendu"""
+
+    def __init__(self, pool, future, submitted_at, executor, workers, task_id):
+        self._pool = pool
+        self._future = future
+        self._submitted_at = submitted_at
+        self._workers = workers
+        self._task_id = task_id
+        # Pool de processus qui exécute le rendu (à recycler s'il se bloque)
+        self.executor = executor
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self._pool._release(failed=True)
+            return
+        _, started_at, render_time = future.result()
+        self._pool._release(wait_time=max(0.0, started_at - self._submitted_at), render_time=render_time)
+
+    def add_done_callback(self, fn):
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def done(self):
+        return self._future.done()
+
+    def started_at(self):
+        """Heure de début du rendu dans un processus, None s'il n'a pas encore commencé"""
+        return self._workers.task_started_at(self._task_id)
+
+    def cancel(self):
+        """Annule le rendu s'il n'a pas commencé (la place est libérée par _on_done)"""
+        return self._future.cancel()
+
+    def exception(self, timeout=None):
+        return self._future.exception(timeout=timeout)
+
+    def result(self, timeout=None):
+        pdf_bytes, _, _ = self._future.result(timeout=timeout)
+        return pdf_bytes
@@ -0,0 +1,135 @@
+import time
+import functools
+import threading
+from collections import OrderedDict
+
+
+def _copier(valeur):
+    """Copie des listes et dictionnaires (résultats de requêtes), plus rapide que copy.deepcopy"""
+    if isinstance(valeur, list):
+        return [_copier(v) for v in valeur]
+    if isinstance(valeur, tuple):
+        return tuple(_copier(v) for v in valeur)
+    if isinstance(valeur, dict):
+        return {k: _copier(v) for k, v in valeur.items()}
+    return valeur
+
+
+class UncachedResult(Exception):
+    """
+    Levée par une fonction en cache pour retourner value sans la garder en cache
+    (valeur de repli après une erreur de lecture : l'appel suivant relit la base).
+    """
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+class QueryCache:
+    """
+    Cache en mémoire des résultats des fonctions de lecture de gestion_db.
+
+    Les entrées sont indexées par fonction et arguments. Chaque fonction d'écriture
+    incrémente un numéro de génération (invalidate) : une entrée calculée avant la
+    dernière écriture n'est plus servie. La durée de vie (ttl) borne l'âge d'une
+    entrée si la base est modifiée par un autre processus (scripts, migrations).
+    """
+
+    def __init__(self, max_entries=1024, ttl=30.0):
+        """
+        Args:
+            max_entries: Nombre maximal d'entrées; au-delà, les moins récemment utilisées sont retirées (LRU)
+            ttl: Durée de vie d'une entrée en secondes (0 : cache désactivé)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (génération, expiration, valeur)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def invalidate(self):
+        """Nouvelle génération des données : toutes les entrées existantes deviennent périmées"""
+        with self._lock:
+            self.generation += 1
+
+    def clear(self):
+        """Vide le cache (changement de base de données)"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get_or_compute(self, key, compute):
+        """
+        Retourne la valeur en cache pour key, ou l'obtient avec compute() et la garde.
+
+        La valeur renvoyée est une copie : l'appelant peut la modifier sans altérer le cache.
+        Si compute lève UncachedResult, sa valeur est retournée sans être gardée.
+        """
+        if not self.enabled:
+            try:
+                return compute()
+            except UncachedResult as e:
+                return e.value
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                generation, expires, value = entry
+                if generation == self.generation and expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _copier(value)
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            # Génération lue avant la requête : si une écriture a lieu pendant le calcul,
+            # l'entrée est enregistrée déjà périmée
+            generation = self.generation
+
+        try:
+            value = compute()
+        except UncachedResult as e:
+            return e.value
+
+        with self._lock:
+            self._entries[key] = (generation, now + self.ttl, _copier(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def cached(self, fn):
+        """Décorateur : met en cache fn, indexée par son nom et ses arguments"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            return self.get_or_compute(key, lambda: fn(*args, **kwargs))
+        return wrapper
+
+    def stats(self):
+        """Compteurs du cache (pour /api/metrics)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "generation": self.generation,
+            }
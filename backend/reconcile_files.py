@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Rapproche les fichiers de data/ et les documents de la base.
+
+Met à jour l'inventaire des fichiers (incrémental : seuls les dossiers modifiés
+sont relus), puis affiche les documents sans fichier et les fichiers orphelins.
+Avec --repair, les blobs et signatures orphelins sont supprimés. Avec --check,
+le script échoue (code 1) si une incohérence est trouvée.
+
+Usage :
+    python backend/reconcile_files.py
+    python backend/reconcile_files.py --repair
+    python backend/reconcile_files.py --check
+"""
+
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import gestion_db
+from blob_store import BlobStore
+from file_inventory import FileInventory
+
+DATA_FOLDER_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), 'data')
+
+LIBELLES = {
+    "documents_sans_fichier": "document(s) sans fichier",
+    "blobs_orphelins": "blob(s) orphelin(s)",
+    "blobs_taille_incorrecte": "blob(s) de taille incorrecte",
+    "signatures_orphelines": "signature(s) orpheline(s)",
+    "fichiers_non_references": "fichier(s) de data/ non référencé(s)",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapproche les fichiers de data/ et les documents")
+    parser.add_argument("--repair", action="store_true", help="Supprimer les blobs et signatures orphelins")
+    parser.add_argument("--check", action="store_true", help="Échouer si une incohérence est trouvée")
+    parser.add_argument("--limit", type=int, default=20, help="Nombre d'exemples affichés par catégorie")
+    parser.add_argument("--db", default=None, help="Base des documents (défaut: data/pro.db)")
+    parser.add_argument("--data", default=DATA_FOLDER_PATH, help="Dossier des fichiers (défaut: data/)")
+    args = parser.parse_args()
+
+    if args.db:
+        gestion_db.utiliser_base(args.db)
+    if not os.path.exists(gestion_db.DB_NAME):
+        print(f"🛑 Base introuvable : {gestion_db.DB_NAME}")
+        sys.exit(1)
+    gestion_db.initialiser_base_de_donnees()
+
+    inventory = FileInventory(args.data, BlobStore(os.path.join(args.data, 'blobs')))
+    mise_a_jour = inventory.refresh()
+    if mise_a_jour is None:
+        sys.exit(1)
+    print(f"📂 Inventaire à jour en {mise_a_jour['duree_ms']} ms : {mise_a_jour['dossiers_listes']} dossier(s) relu(s), "
+          f"{mise_a_jour['dossiers_inchanges']} inchangé(s), {mise_a_jour['fichiers_haches']} fichier(s) haché(s)")
+
+    rapport = inventory.report(args.limit)
+    if rapport is None:
+        sys.exit(1)
+    incoherences = 0
+    for cle, libelle in LIBELLES.items():
+        total = rapport[cle]["total"]
+        incoherences += total
+        print(f"  {'🛑' if total else '✅'} {total} {libelle}")
+        for exemple in rapport[cle]["exemples"]:
+            print(f"      {exemple}")
+
+    if args.repair:
+        supprimes = inventory.repair()
+        if supprimes is None:
+            sys.exit(1)
+        print(f"🔧 {supprimes} fichier(s) orphelin(s) supprimé(s)")
+    if args.check and incoherences:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+from io import BytesIO
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import gestion_db
+from blob_store import BlobStore
+from upload_sessions import UploadSessionManager
+from file_inventory import FileInventory
+from file_response import DocumentFileServer
+
+
+@pytest.fixture
+def base(tmp_path):
+    """Base de documents vide dans un dossier temporaire (cache des lectures vidé)"""
+    ancienne = gestion_db.DB_NAME
+    gestion_db.utiliser_base(str(tmp_path / 'pro.db'))
+    gestion_db.initialiser_base_de_donnees()
+    yield gestion_db
+    gestion_db.utiliser_base(ancienne)
+
+
+@pytest.fixture
+def serveur(base, tmp_path, monkeypatch):
+    """Module app_server dont les dossiers et le stockage pointent vers le dossier temporaire"""
+    import app_server
+
+    data = tmp_path / 'data'
+    signatures = data / 'signatures'
+    signatures.mkdir(parents=True)
+    blob_store = BlobStore(str(data / 'blobs'))
+
+    monkeypatch.setattr(app_server, 'DATA_FOLDER_PATH', str(data))
+    monkeypatch.setattr(app_server, 'SIGNATURES_FOLDER_PATH', str(signatures))
+    monkeypatch.setattr(app_server, 'BLOBS_FOLDER_PATH', blob_store.root)
+    monkeypatch.setattr(app_server, 'blob_store', blob_store)
+    monkeypatch.setattr(app_server, 'upload_session_manager', UploadSessionManager(blob_store))
+    monkeypatch.setattr(app_server, 'file_inventory', FileInventory(str(data), blob_store, str(signatures)))
+    monkeypatch.setattr(app_server, 'document_file_server', DocumentFileServer())
+    app_server.app.config['TESTING'] = True
+    return app_server
+
+
+@pytest.fixture
+def client(serveur):
+    return serveur.app.test_client()
+
+
+def envoyer(client, contenu, nom='doc.pdf', categorie='Factures'):
+    """Envoie un fichier par /api/documents/ajouter et retourne la réponse"""
+    return client.post('/api/documents/ajouter', data={
+        'file': (BytesIO(contenu), nom),
+        'categorie': categorie,
+    }, content_type='multipart/form-data')
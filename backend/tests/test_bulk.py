@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import envoyer
+
+
+@pytest.fixture
+def documents(client):
+    ids = [envoyer(client, f'%PDF-1.4 document {i}'.encode(), nom=f'{i}.pdf').get_json()['id'] for i in range(3)]
+    client.post('/api/documents/bulk/sign', json={'ids': ids[:1]})
+    return ids
+
+
+@pytest.mark.parametrize('valeur', [False, 0, 'false', '0', 'False'])
+def test_filtre_booleen_faux(client, documents, base, valeur):
+    response = client.post('/api/documents/bulk/fill', json={'filter': {'is_signed': valeur}})
+
+    assert response.get_json()['count'] == 2
+    assert not base.recuperer_document_par_id(documents[0])['is_filled']
+    assert base.recuperer_document_par_id(documents[1])['is_filled']
+
+
+@pytest.mark.parametrize('corps', [
+    {'filter': {'is_signed': 'non'}},
+    {'filter': {'is_filled': 2}},
+    {'filter': {'is_signed': []}},
+    {'all': 'oui'},
+])
+def test_valeur_non_booleenne_refusee(client, documents, base, corps):
+    response = client.post('/api/documents/bulk/delete', json=corps)
+
+    assert response.status_code == 400
+    assert base.recuperer_stats()['total'] == 3
+
+
+def test_all_false_ne_selectionne_rien(client, documents, base):
+    response = client.post('/api/documents/bulk/delete', json={'all': 'false'})
+
+    assert response.status_code == 400
+    assert base.recuperer_stats()['total'] == 3
+
+
+def test_deplacement_et_suppression_groupes(client, documents, base):
+    response = client.post('/api/documents/bulk/move', json={'ids': documents[1:], 'categorie': 'Archives'})
+    assert response.get_json()['count'] == 2
+    assert base.recuperer_stats()['par_categorie'] == {'Archives': 2, 'Factures': 1}
+
+    response = client.post('/api/documents/bulk/delete', json={'all': True})
+    assert response.get_json()['count'] == 3
+    assert base.recuperer_stats()['total'] == 0
+
+
+def test_selection_base_sans_conversion_implicite(base):
+    with pytest.raises(ValueError):
+        base.supprimer_documents(is_signed='false')
+    with pytest.raises(ValueError):
+        base.supprimer_documents(tous='false')
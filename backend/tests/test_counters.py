@@ -0,0 +1,24 @@
+def test_compteurs_tenus_par_les_triggers(base):
+    ids = [base.ajouter_document(f'{i}.pdf', f'//localhost/data/{i}.pdf', 'Factures') for i in range(4)]
+    base.marquer_documents_signes(ids=ids[:2])
+    base.deplacer_documents('Archives', ids=ids[1:3])
+    base.supprimer_documents(ids=[ids[0]])
+
+    stats = base.recuperer_stats()
+
+    assert stats['total'] == 3
+    assert stats['signes'] == 1
+    assert stats['non_signes'] == 2
+    assert stats['par_categorie'] == {'Archives': 2, 'Factures': 1}
+    assert base.recalculer_compteurs_documents(corriger=False) == {}
+
+
+def test_compteurs_recalcules(base):
+    base.ajouter_document('a.pdf', '//localhost/data/a.pdf', 'Factures')
+    conn = base.obtenir_connexion()
+    conn.execute("UPDATE compteurs_documents SET valeur = 42")
+    conn.commit()
+    base.liberer_connexion(conn)
+
+    assert base.recalculer_compteurs_documents() != {}
+    assert base.recalculer_compteurs_documents(corriger=False) == {}
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from conftest import envoyer
+
+
+def test_envoi_identique_deduplique(client, serveur, base):
+    premier = envoyer(client, b'%PDF-1.4 contenu', nom='a.pdf').get_json()
+    second = envoyer(client, b'%PDF-1.4 contenu', nom='b.pdf').get_json()
+
+    assert premier['sha256'] == second['sha256']
+    assert premier['deduplicated'] is False
+    assert second['deduplicated'] is True
+    assert base.blob_est_reference(premier['sha256'])
+    assert os.path.isfile(serveur.blob_store.path(premier['sha256']))
+
+
+def test_echec_publication_retire_le_document(client, serveur, base, monkeypatch):
+    def publish(upload):
+        raise OSError("disque plein")
+    monkeypatch.setattr(serveur.blob_store, 'publish', publish)
+
+    response = envoyer(client, b'%PDF-1.4 jamais publie')
+
+    assert response.status_code == 500
+    assert base.recuperer_stats()['total'] == 0
+    assert os.listdir(serveur.blob_store.temp_dir) == []
+
+
+def test_suppression_unitaire_supprime_signature(client, serveur):
+    doc_id = envoyer(client, b'%PDF-1.4 a signer').get_json()['id']
+    signature = 'data:image/png;base64,iVBORw0KGgo='
+    assert client.put(f'/api/documents/{doc_id}/sign', json={'signatureData': signature}).status_code == 200
+    chemin_signature = os.path.join(serveur.SIGNATURES_FOLDER_PATH, f'{doc_id}.png')
+    assert os.path.isfile(chemin_signature)
+
+    assert client.delete(f'/api/documents/{doc_id}').status_code == 200
+
+    assert not os.path.exists(chemin_signature)
+
+
+@pytest.mark.parametrize('suppression', ['unitaire', 'groupee'])
+def test_blob_partage_supprime_avec_le_dernier_document(client, serveur, base, suppression):
+    ids = [envoyer(client, b'%PDF-1.4 partage', nom=f'{i}.pdf').get_json()['id'] for i in range(2)]
+    sha = base.recuperer_document_par_id(ids[0])['blob_sha256']
+
+    if suppression == 'unitaire':
+        client.delete(f'/api/documents/{ids[0]}')
+    else:
+        client.post('/api/documents/bulk/delete', json={'ids': [ids[0]]})
+    assert os.path.isfile(serveur.blob_store.path(sha))
+
+    client.delete(f'/api/documents/{ids[1]}')
+    assert not os.path.exists(serveur.blob_store.path(sha))
+
+
+def test_references_du_blob_tenues_par_les_triggers(client, base):
+    ids = [envoyer(client, b'%PDF-1.4 compte', nom=f'{i}.pdf').get_json()['id'] for i in range(2)]
+    sha = base.recuperer_document_par_id(ids[0])['blob_sha256']
+    conn = base.obtenir_connexion()
+    refcount = lambda: conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha,)).fetchone()[0]
+    try:
+        assert refcount() == 2
+        _, _, orphelins = base.supprimer_documents(ids=[ids[0]])
+        assert refcount() == 1
+        assert orphelins == []
+        _, _, orphelins = base.supprimer_documents(ids=[ids[1]])
+        assert orphelins == [sha]
+        assert not base.blob_est_reference(sha)
+    finally:
+        base.liberer_connexion(conn)
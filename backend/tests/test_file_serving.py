@@ -0,0 +1,79 @@
+import hashlib
+
+import pytest
+
+from conftest import envoyer
+
+CONTENU = bytes(range(256)) * 8
+
+
+@pytest.fixture
+def document(client):
+    return envoyer(client, CONTENU, nom='scan.png').get_json()['id']
+
+
+def apercu(client, doc_id, **headers):
+    return client.get(f'/api/documents/preview/{doc_id}', headers=headers)
+
+
+def test_fichier_entier_avec_etag(client, document):
+    response = apercu(client, document)
+
+    assert response.status_code == 200
+    assert response.get_data() == CONTENU
+    assert response.headers['ETag'] == f'"{hashlib.sha256(CONTENU).hexdigest()}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_revalidation_304(client, document):
+    etag = apercu(client, document).headers['ETag']
+    derniere_modification = apercu(client, document).headers['Last-Modified']
+
+    assert apercu(client, document, **{'If-None-Match': etag}).status_code == 304
+    assert apercu(client, document, **{'If-Modified-Since': derniere_modification}).status_code == 304
+    assert apercu(client, document, **{'If-None-Match': '"autre"'}).status_code == 200
+
+
+@pytest.mark.parametrize('plage, debut, fin', [
+    ('bytes=0-99', 0, 100),
+    ('bytes=100-', 100, len(CONTENU)),
+    ('bytes=-10', len(CONTENU) - 10, len(CONTENU)),
+    ('bytes=2000-99999', 2000, len(CONTENU)),
+])
+def test_plage_unique(client, document, plage, debut, fin):
+    response = apercu(client, document, Range=plage)
+
+    assert response.status_code == 206
+    assert response.get_data() == CONTENU[debut:fin]
+    assert response.headers['Content-Range'] == f'bytes {debut}-{fin - 1}/{len(CONTENU)}'
+    assert int(response.headers['Content-Length']) == fin - debut
+
+
+def test_plages_multiples(client, document):
+    response = apercu(client, document, Range='bytes=0-9,100-109')
+
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    corps = response.get_data()
+    assert len(corps) == int(response.headers['Content-Length'])
+    assert b'Content-Range: bytes 0-9/2048' in corps
+    assert b'Content-Range: bytes 100-109/2048' in corps
+    assert CONTENU[100:110] in corps
+
+
+def test_plage_non_satisfiable(client, document):
+    response = apercu(client, document, Range='bytes=5000-6000')
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(CONTENU)}'
+
+
+def test_if_range_different_renvoie_le_fichier_entier(client, document):
+    response = apercu(client, document, Range='bytes=0-9', **{'If-Range': '"ancienne-version"'})
+
+    assert response.status_code == 200
+    assert response.get_data() == CONTENU
+
+
+def test_document_inconnu(client):
+    assert apercu(client, 999).status_code == 404
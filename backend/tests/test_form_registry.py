@@ -0,0 +1,54 @@
+import shutil
+
+import pytest
+
+from pdf_generation import template
+from pdf_generation.layout import CERFA_14011_02_FIELDS, cerfa_14011_02_plan
+from pdf_generation.registry import FormTemplate, get_form
+
+
+@pytest.fixture
+def formulaire(tmp_path):
+    """Formulaire dont l'arrière plan n'a encore été chargé par aucun test"""
+    background = tmp_path / 'cerfa.jpg'
+    shutil.copyfile(get_form().background_path, background)
+    return FormTemplate('test', str(background), CERFA_14011_02_FIELDS, version='1')
+
+
+def arriere_plans_charges(form):
+    return {(dpi, binary) for path, dpi, binary in template._backgrounds if path == form.background_path}
+
+
+@pytest.mark.parametrize('output, encodage', [
+    ('fillable', (None, False)),
+    ('flattened', (None, True)),
+    ('compact', (110, True)),
+])
+def test_seul_l_arriere_plan_du_profil_est_charge(formulaire, output, encodage):
+    assert not formulaire.loaded
+
+    pdf = formulaire.render({}, output=output)
+
+    assert pdf.startswith(b'%PDF')
+    assert formulaire.loaded
+    assert arriere_plans_charges(formulaire) == {encodage}
+
+
+def test_prechauffage_du_profil_configure(formulaire):
+    formulaire.load('flattened')
+    assert arriere_plans_charges(formulaire) == {(None, True)}
+
+
+@pytest.mark.parametrize('profil, coche', [
+    ({'majeur': 'false'}, True),
+    ({'majeur': 'FALSE'}, True),
+    ({}, True),
+    ({'majeur': 'true'}, False),
+    ({'majeur': ''}, False),
+])
+def test_case_mineur_deduite_de_majeur(profil, coche):
+    _, _, _, source, defaut, transform = next(
+        entree for entree in cerfa_14011_02_plan() if entree[1]['name'] == 'mineur'
+    )
+    assert source == 'majeur'
+    assert transform(profil.get(source, defaut)) is coche
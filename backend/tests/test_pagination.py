@@ -0,0 +1,43 @@
+def ajouter(base, nom, categorie='Factures'):
+    return base.ajouter_document(nom, f'//localhost/data/{nom}', categorie)
+
+
+def test_pages_par_curseur_sans_doublon_ni_decalage(base):
+    ids = [ajouter(base, f'{i}.pdf') for i in range(7)]
+
+    vus = []
+    documents, curseur = base.recuperer_page_documents(limite=3)
+    vus += [doc['id'] for doc in documents]
+    # Un ajout entre deux pages ne décale pas la suite
+    ajouter(base, 'nouveau.pdf')
+    while curseur:
+        documents, curseur = base.recuperer_page_documents(limite=3, curseur=curseur)
+        vus += [doc['id'] for doc in documents]
+
+    assert vus == sorted(ids, reverse=True)
+
+
+def test_pages_par_categorie(base):
+    factures = [ajouter(base, f'f{i}.pdf') for i in range(3)]
+    ajouter(base, 'autre.pdf', categorie='Archives')
+
+    documents, curseur = base.recuperer_page_documents('Factures', limite=2)
+    suite, fin = base.recuperer_page_documents('Factures', limite=2, curseur=curseur)
+
+    assert [doc['id'] for doc in documents + suite] == sorted(factures, reverse=True)
+    assert fin is None
+
+
+def test_pages_par_l_api(client, base):
+    ids = [ajouter(base, f'{i}.pdf') for i in range(3)]
+
+    page = client.get('/api/documents/all?limit=2').get_json()
+    suite = client.get(f"/api/documents/all?limit=2&cursor={page['next_cursor']}").get_json()
+
+    assert [doc['id'] for doc in page['documents'] + suite['documents']] == sorted(ids, reverse=True)
+    assert suite['next_cursor'] is None
+
+
+def test_curseur_invalide(client):
+    response = client.get('/api/documents/all?limit=2&cursor=pas-un-curseur')
+    assert response.status_code == 400
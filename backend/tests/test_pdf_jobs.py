@@ -0,0 +1,64 @@
+import os
+import time
+
+from pdf_jobs import PDFJobManager
+from pdf_worker_pool import PDFPoolSaturated
+
+
+class GenerateurSature:
+    """PDFGenerator dont le pool reste saturé"""
+    output = None
+
+    def __init__(self):
+        self.appels = 0
+
+    def generate_pdf_bytes(self, profile_data, user_id, form_id, output):
+        self.appels += 1
+        raise PDFPoolSaturated(0.01)
+
+
+class GenerateurRapide:
+    output = None
+
+    def generate_pdf_bytes(self, profile_data, user_id, form_id, output):
+        return True, b'%PDF-job'
+
+
+def executer(manager, job_id):
+    manager._run(job_id, {}, 'user', None)
+    return manager.get_job(job_id)
+
+
+def test_job_en_echec_si_le_pool_reste_sature(base, tmp_path):
+    generateur = GenerateurSature()
+    manager = PDFJobManager(generateur, str(tmp_path / 'jobs'), max_wait=0.2)
+    base.creer_job_pdf('sature', '{}', 'user')
+
+    debut = time.monotonic()
+    job = executer(manager, 'sature')
+
+    assert job['statut'] == base.JOB_ECHEC
+    assert 'occupé' in job['erreur']
+    assert time.monotonic() - debut < 5
+    assert generateur.appels > 1
+
+
+def test_jobs_expires_supprimes_avec_leur_pdf(base, tmp_path):
+    manager = PDFJobManager(GenerateurRapide(), str(tmp_path / 'jobs'), ttl=3600)
+    for job_id in ('ancien', 'recent'):
+        base.creer_job_pdf(job_id, '{}', 'user')
+        assert executer(manager, job_id)['statut'] == base.JOB_TERMINE
+    orphelin = tmp_path / 'jobs' / 'orphelin.pdf'
+    orphelin.write_bytes(b'%PDF')
+    vieux = time.time() - 7200
+    os.utime(orphelin, (vieux, vieux))
+    conn = base.obtenir_connexion()
+    conn.execute("UPDATE pdf_jobs SET date_maj = datetime('now', 'localtime', '-2 hours') WHERE id = 'ancien'")
+    conn.commit()
+    base.liberer_connexion(conn)
+
+    assert manager.collect_expired() == 1
+
+    assert manager.get_job('ancien') is None
+    assert manager.get_job('recent') is not None
+    assert sorted(os.listdir(tmp_path / 'jobs')) == ['recent.pdf']
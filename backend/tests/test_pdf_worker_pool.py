@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import pdf_worker_pool
+from pdf_worker_pool import PDFWorkerPool, PDFPoolSaturated
+
+
+# Rendus de substitution, exécutés dans les processus du pool (créés par fork après le monkeypatch)
+def rendu_bloque(form_id, clean_data, render_options):
+    time.sleep(60)
+
+
+def rendu_rapide(form_id, clean_data, render_options):
+    return b'%PDF-rapide', time.time(), 0.0
+
+
+@pytest.fixture
+def pool(request):
+    max_queue = getattr(request, 'param', 0)
+    pool = PDFWorkerPool(max_workers=1, max_queue=max_queue, timeout=0.5, warm_form_ids=())
+    yield pool
+    # Arrête aussi les processus encore bloqués
+    pool._recycle(pool._executor)
+    pool.shutdown()
+
+
+def attendre(condition, delai=10):
+    fin = time.monotonic() + delai
+    while not condition():
+        assert time.monotonic() < fin
+        time.sleep(0.05)
+
+
+def test_file_pleine_rejetee(pool, monkeypatch):
+    monkeypatch.setattr(pdf_worker_pool, '_render_in_worker', rendu_bloque)
+    pool.submit({})
+    with pytest.raises(PDFPoolSaturated):
+        pool.submit({})
+    assert pool.stats()['rejected'] == 1
+
+
+def test_rendu_expire_recycle_le_pool_et_libere_la_place(pool, monkeypatch):
+    monkeypatch.setattr(pdf_worker_pool, '_render_in_worker', rendu_bloque)
+    bloque = pool._executor
+
+    with pytest.raises(TimeoutError):
+        pool.render({})
+
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['queue_timeouts'] == 0
+    assert pool.stats()['recycled'] == 1
+    assert pool._executor is not bloque
+    attendre(lambda: pool.stats()['in_flight'] == 0)
+
+    # La seule place du pool est de nouveau disponible
+    monkeypatch.setattr(pdf_worker_pool, '_render_in_worker', rendu_rapide)
+    assert pool.render({}) == b'%PDF-rapide'
+    assert pool.stats()['failed'] == 1
+
+
+@pytest.mark.parametrize('pool', [1], indirect=True)
+def test_attente_trop_longue_sans_recycler_le_rendu_en_cours(pool, monkeypatch):
+    monkeypatch.setattr(pdf_worker_pool, '_render_in_worker', rendu_bloque)
+    en_cours = pool.submit({})
+    executor = pool._executor
+
+    # Le rendu en file n'a jamais commencé : le délai ne court pas encore
+    with pytest.raises(PDFPoolSaturated):
+        pool.render({})
+
+    assert pool.stats()['queue_timeouts'] == 1
+    assert pool.stats()['timeouts'] == 0
+    assert pool.stats()['recycled'] == 0
+    assert pool._executor is executor
+    assert en_cours.started_at() is not None and not en_cours.done()
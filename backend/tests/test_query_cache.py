@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+from query_cache import QueryCache, UncachedResult
+
+
+def test_lecture_en_cache_jusqu_a_l_invalidation():
+    cache = QueryCache(ttl=60)
+    appels = []
+
+    @cache.cached
+    def lire(cle):
+        appels.append(cle)
+        return {"cle": cle, "valeurs": [1, 2]}
+
+    premier = lire("a")
+    premier["valeurs"].append(3)
+    assert lire("a") == {"cle": "a", "valeurs": [1, 2]}
+    assert appels == ["a"]
+
+    cache.invalidate()
+    lire("a")
+    assert appels == ["a", "a"]
+
+
+def test_valeur_de_repli_non_gardee():
+    cache = QueryCache(ttl=60)
+    resultats = iter([UncachedResult([]), ["document"]])
+
+    @cache.cached
+    def lire():
+        resultat = next(resultats)
+        if isinstance(resultat, UncachedResult):
+            raise resultat
+        return resultat
+
+    assert lire() == []
+    assert lire() == ["document"]
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.parametrize('lecture, repli', [
+    (lambda db: db.recuperer_stats(), {"total": 0}),
+    (lambda db: db.recuperer_document_par_id(1), None),
+    (lambda db: db.recuperer_document_par_nom('a.pdf'), None),
+    (lambda db: db.recuperer_page_documents(), ([], None)),
+    (lambda db: db.rechercher_documents('facture'), ([], None)),
+    (lambda db: db.recuperer_4_derniers_documents(), []),
+    (lambda db: db.recuperer_toutes_categories(), []),
+])
+def test_erreur_de_lecture_non_mise_en_cache(base, monkeypatch, lecture, repli):
+    base.ajouter_document('a.pdf', '//localhost/data/a.pdf', 'Factures', 'facture du mois')
+    connexion = base.obtenir_connexion
+
+    def connexion_en_echec():
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(base, 'obtenir_connexion', connexion_en_echec)
+    resultat = lecture(base)
+    if isinstance(repli, dict):
+        assert resultat["total"] == repli["total"]
+    else:
+        assert resultat == repli
+
+    # Sans écriture entre les deux appels : la lecture suivante est servie par la base
+    monkeypatch.setattr(base, 'obtenir_connexion', connexion)
+    resultat = lecture(base)
+    if isinstance(repli, dict):
+        assert resultat["total"] == 1
+    else:
+        assert resultat and resultat != repli
+
+
+@pytest.mark.parametrize('ecriture', [
+    lambda base, doc_id: base.marquer_documents_signes(ids=[doc_id]),
+    lambda base, doc_id: base.deplacer_documents('Archives', ids=[doc_id]),
+])
+def test_ecriture_invalide_le_cache(base, ecriture):
+    doc_id = base.ajouter_document('a.pdf', '//localhost/data/a.pdf', 'Factures')
+    avant = base.recuperer_document_par_id(doc_id)
+
+    ecriture(base, doc_id)
+
+    assert base.recuperer_document_par_id(doc_id) != avant
@@ -0,0 +1,25 @@
+import os
+
+from migrate_storage_layout import importer_fichiers_historiques
+
+
+def test_fichier_importe_reste_servi_avec_le_cache_perime(client, serveur, base, monkeypatch):
+    contenu = b'%PDF-1.4 fichier historique'
+    with open(os.path.join(serveur.DATA_FOLDER_PATH, 'ancien.pdf'), 'wb') as f:
+        f.write(contenu)
+    doc_id = base.ajouter_document('ancien.pdf', '//localhost/data/ancien.pdf', 'Factures')
+
+    avant = client.get(f'/api/documents/preview/{doc_id}')
+    assert avant.status_code == 200
+    assert base.recuperer_document_par_id(doc_id)['blob_sha256'] is None
+
+    # La migration tourne dans un autre processus : le cache du serveur n'est pas invalidé
+    monkeypatch.setattr(base, 'invalider_cache_lectures', lambda: None)
+    assert importer_fichiers_historiques(serveur.blob_store, serveur.DATA_FOLDER_PATH, dry_run=False) == 1
+    assert not os.path.exists(os.path.join(serveur.DATA_FOLDER_PATH, 'ancien.pdf'))
+    assert base.recuperer_document_par_id(doc_id)['blob_sha256'] is None
+
+    apres = client.get(f'/api/documents/preview/{doc_id}')
+    assert apres.status_code == 200
+    assert apres.get_data() == contenu
+    assert client.get('/api/documents/ouvrir/ancien.pdf').get_data() == contenu
@@ -0,0 +1,101 @@
+import os
+import hashlib
+
+
+CONTENU = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+
+def creer_session(client, contenu=CONTENU, **extra):
+    response = client.post('/api/uploads', json={
+        'nom_fichier': 'gros.pdf', 'categorie': 'Factures', 'taille': len(contenu), **extra
+    })
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+
+def envoyer_morceaux(client, upload_id, contenu=CONTENU, taille=4096):
+    for offset in range(0, len(contenu), taille):
+        response = client.put(f'/api/uploads/{upload_id}?offset={offset}', data=contenu[offset:offset + taille])
+        assert response.status_code == 200
+
+
+def test_envoi_reprend_a_l_offset_recu(client, base):
+    upload_id = creer_session(client, sha256=hashlib.sha256(CONTENU).hexdigest())
+    client.put(f'/api/uploads/{upload_id}?offset=0', data=CONTENU[:1000])
+
+    # Morceau au-delà des octets reçus : refusé avec l'offset de reprise
+    refus = client.put(f'/api/uploads/{upload_id}?offset=2000', data=CONTENU[2000:3000])
+    assert refus.status_code == 409
+    assert refus.headers['Upload-Offset'] == '1000'
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['offset'] == 1000
+
+    client.put(f'/api/uploads/{upload_id}?offset=1000', data=CONTENU[1000:])
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert response.status_code == 201
+    doc = base.recuperer_document_par_id(response.get_json()['id'])
+    assert doc['blob_sha256'] == hashlib.sha256(CONTENU).hexdigest()
+
+
+def test_finalisation_incomplete_ou_hash_different(client):
+    upload_id = creer_session(client)
+    client.put(f'/api/uploads/{upload_id}?offset=0', data=CONTENU[:100])
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 409
+
+    envoyer_morceaux(client, upload_id)
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={'sha256': '0' * 64})
+    assert response.status_code == 422
+
+
+def test_finalisation_repetee_retourne_le_meme_document(client, serveur, base):
+    upload_id = creer_session(client)
+    envoyer_morceaux(client, upload_id)
+
+    premiere = client.post(f'/api/uploads/{upload_id}/finalize')
+    seconde = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert premiere.status_code == 201
+    assert seconde.status_code == 200
+    assert seconde.get_json()['id'] == premiere.get_json()['id']
+    assert seconde.get_json()['sha256'] == premiere.get_json()['sha256']
+    assert base.recuperer_stats()['total'] == 1
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['doc_id'] == premiere.get_json()['id']
+    assert not os.path.exists(serveur.upload_session_manager.part_path(upload_id))
+
+
+def test_echec_de_finalisation_conserve_l_envoi(client, serveur, base, monkeypatch):
+    upload_id = creer_session(client)
+    envoyer_morceaux(client, upload_id)
+
+    publish = serveur.blob_store.publish
+
+    def publish_en_echec(upload):
+        raise OSError("disque plein")
+    monkeypatch.setattr(serveur.blob_store, 'publish', publish_en_echec)
+    echec = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert echec.status_code == 500
+    assert echec.is_json
+    assert base.recuperer_stats()['total'] == 0
+    assert os.path.getsize(serveur.upload_session_manager.part_path(upload_id)) == len(CONTENU)
+
+    monkeypatch.setattr(serveur.blob_store, 'publish', publish)
+    reprise = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert reprise.status_code == 201
+    assert base.recuperer_stats()['total'] == 1
+    assert os.listdir(serveur.blob_store.temp_dir) == []
+
+
+def test_erreur_inattendue_de_finalisation_en_json(client, serveur, monkeypatch):
+    upload_id = creer_session(client)
+    envoyer_morceaux(client, upload_id)
+
+    def enregistrement_en_echec(*args, **kwargs):
+        raise RuntimeError("base verrouillée")
+    monkeypatch.setattr(serveur, 'enregistrer_upload', enregistrement_en_echec)
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert response.status_code == 500
+    assert 'error' in response.get_json()
+    assert os.path.exists(serveur.upload_session_manager.part_path(upload_id))
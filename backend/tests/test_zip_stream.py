@@ -0,0 +1,37 @@
+import io
+import zipfile
+
+from zip_stream import stream_zip
+
+
+def test_archive_lisible():
+    entrees = [('a.pdf', b'%PDF-a'), ('b.pdf', b'%PDF-b' * 1000), ('erreurs.txt', 'é'.encode('utf-8'))]
+
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_zip(iter(entrees)))))
+
+    assert archive.testzip() is None
+    assert [(info.filename, archive.read(info)) for info in archive.infolist()] == entrees
+
+
+def test_entrees_consommees_au_fil_de_l_eau():
+    produites = []
+
+    def entrees():
+        for i in range(3):
+            produites.append(i)
+            yield f'{i}.pdf', b'%PDF' * 100
+
+    morceaux = stream_zip(entrees())
+    premier = next(morceaux)
+
+    # Le premier fichier est envoyé avant que le suivant ne soit produit
+    assert produites == [0]
+    assert premier.startswith(b'PK')
+    reste = b''.join(morceaux)
+    assert produites == [0, 1, 2]
+    assert len(zipfile.ZipFile(io.BytesIO(premier + reste)).namelist()) == 3
+
+
+def test_archive_vide():
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_zip([]))))
+    assert archive.namelist() == []
@@ -0,0 +1,315 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+
+from gestion_db import (
+    creer_session_upload, avancer_session_upload, recuperer_session_upload, terminer_session_upload,
+    supprimer_session_upload, supprimer_sessions_upload_expirees, recuperer_ids_sessions_upload
+)
+from blob_store import BlobUpload, CHUNK_SIZE
+
+# Configuration des envois par morceaux
+UPLOAD_SESSION_TTL_HOURS = float(os.environ.get('UPLOAD_SESSION_TTL_HOURS', '24'))
+UPLOAD_CHUNK_MAX_MB = int(os.environ.get('UPLOAD_CHUNK_MAX_MB', '16'))
+
+
+def _supprimer_fichier(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _taille_fichier(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+class UploadSessionError(Exception):
+    """Requête refusée sur une session d'envoi; status est le code HTTP à renvoyer"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class UploadSessionManager:
+    """
+    Envois de gros fichiers par morceaux, reprenables.
+
+    Le client crée une session (taille et, éventuellement, SHA-256 attendus), envoie
+    les morceaux à leur position (offset) puis finalise l'envoi. Les morceaux sont
+    écrits directement dans le fichier partiel du dossier temporaire du BlobStore :
+    la finalisation vérifie le hash et publie le fichier par simple renommage.
+    Les sessions sont persistées en BDD : un envoi interrompu (client ou serveur)
+    reprend à l'offset retourné par status. Une session finalisée est conservée
+    jusqu'à son expiration avec l'id du document créé : une finalisation répétée
+    (réponse perdue, nouvel essai du client) retourne ce document. Les sessions
+    expirées sont supprimées avec leur fichier partiel (collect_expired).
+    """
+
+    def __init__(self, blob_store, ttl=None, chunk_max=None):
+        """
+        Args:
+            blob_store: BlobStore où sont écrits les fichiers partiels puis publiés les fichiers complets
+            ttl: Durée de vie d'une session sans nouveau morceau, en secondes
+            chunk_max: Taille maximale d'un morceau, en octets
+        """
+        self.blob_store = blob_store
+        self.ttl = ttl if ttl is not None else UPLOAD_SESSION_TTL_HOURS * 3600
+        self.chunk_max = chunk_max if chunk_max is not None else UPLOAD_CHUNK_MAX_MB * 1024 * 1024
+        # Un verrou par session : deux morceaux d'une même session ne sont pas écrits en même temps
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.created = 0
+        self.completed = 0
+        self.expired = 0
+        self.bytes_received = 0
+
+    def _lock(self, session_id):
+        with self._locks_lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _forget(self, session_id):
+        with self._locks_lock:
+            self._locks.pop(session_id, None)
+
+    def part_path(self, session_id):
+        """Fichier partiel d'une session, dans le dossier temporaire du BlobStore"""
+        return os.path.join(self.blob_store.temp_dir, f"{session_id}.part")
+
+    def _get(self, session_id):
+        session = recuperer_session_upload(session_id)
+        if not session or session['expiration_ts'] < time.time():
+            raise UploadSessionError("Session d'envoi introuvable ou expirée", 404)
+        return session
+
+    def _public(self, session, offset=None):
+        return {
+            "upload_id": session['id'],
+            "nom_fichier": session['nom_fichier'],
+            "categorie": session['categorie'],
+            "taille": session['taille'],
+            "offset": session['recu'] if offset is None else offset,
+            "chunk_size": self.chunk_max,
+            "expires_at": int(session['expiration_ts']),
+            "doc_id": session.get('doc_id'),
+        }
+
+    def create(self, nom_fichier, categorie, taille, sha256=None):
+        """
+        Crée une session d'envoi; les sessions expirées sont nettoyées au passage.
+
+        Returns:
+            État public de la session (upload_id, offset, chunk_size, expires_at, ...)
+        """
+        if not isinstance(taille, int) or isinstance(taille, bool) or taille < 0:
+            raise UploadSessionError("Taille du fichier invalide", 400)
+        if sha256 is not None:
+            sha256 = str(sha256).lower()
+            if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+                raise UploadSessionError("SHA-256 invalide", 400)
+        self.collect_expired()
+
+        session_id = uuid.uuid4().hex
+        expiration_ts = int(time.time() + self.ttl)
+        # Fichier partiel vide, complété morceau par morceau
+        open(self.part_path(session_id), 'wb').close()
+        if not creer_session_upload(session_id, nom_fichier, categorie, taille, sha256, expiration_ts):
+            _supprimer_fichier(self.part_path(session_id))
+            raise UploadSessionError("Erreur lors de l'enregistrement de la session d'envoi", 500)
+        self.created += 1
+        return self._public(recuperer_session_upload(session_id))
+
+    def status(self, session_id):
+        """
+        État d'une session; offset est le nombre d'octets reçus, à partir duquel reprendre.
+        """
+        session = self._get(session_id)
+        if session['doc_id'] is not None:
+            return self._public(session)
+        # Si le serveur s'est arrêté entre l'écriture d'un morceau et sa prise en compte
+        # en BDD, le fichier fait foi pour la partie déjà écrite
+        taille_fichier = _taille_fichier(self.part_path(session_id)) or 0
+        return self._public(session, min(session['recu'], taille_fichier))
+
+    def write_chunk(self, session_id, offset, stream, length=None):
+        """
+        Écrit un morceau à la position offset.
+
+        Un morceau déjà reçu peut être renvoyé (il est réécrit à l'identique); un
+        offset au-delà des octets reçus est refusé (409, avec l'offset attendu).
+
+        Returns:
+            État public de la session après écriture
+        """
+        if offset is None or offset < 0:
+            raise UploadSessionError("Offset manquant ou invalide", 400)
+        if length is not None and length > self.chunk_max:
+            raise UploadSessionError(f"Morceau trop gros (maximum {self.chunk_max} octets)", 413)
+
+        with self._lock(session_id):
+            session = self._get(session_id)
+            if session['doc_id'] is not None:
+                raise UploadSessionError("Envoi déjà finalisé", 409)
+            taille_fichier = _taille_fichier(self.part_path(session_id))
+            if taille_fichier is None:
+                raise UploadSessionError("Fichier partiel de la session introuvable", 410)
+            recu = min(session['recu'], taille_fichier)
+            if offset > recu:
+                raise UploadSessionError(f"Offset {offset} invalide, reprendre à {recu}", 409, recu)
+
+            ecrits = 0
+            with open(self.part_path(session_id), 'r+b') as f:
+                f.seek(offset)
+                try:
+                    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                        ecrits += len(chunk)
+                        if ecrits > self.chunk_max:
+                            raise UploadSessionError(f"Morceau trop gros (maximum {self.chunk_max} octets)", 413, recu)
+                        if offset + ecrits > session['taille']:
+                            raise UploadSessionError("Morceau au-delà de la taille annoncée du fichier", 416, recu)
+                        f.write(chunk)
+                except Exception:
+                    # Morceau refusé ou interrompu : seuls les octets déjà confirmés sont conservés
+                    f.truncate(recu)
+                    raise
+
+            recu = max(recu, offset + ecrits)
+            expiration_ts = int(time.time() + self.ttl)
+            avancer_session_upload(session_id, recu, expiration_ts)
+            self.bytes_received += ecrits
+            session.update(recu=recu, expiration_ts=expiration_ts)
+            return self._public(session)
+
+    def _copie_a_publier(self, part_path, sha256, taille):
+        """
+        BlobUpload à publier, lien physique vers le fichier partiel (copie si le lien
+        est impossible) : si l'enregistrement échoue, le fichier partiel reste
+        intact et la finalisation peut être relancée.
+        """
+        temp_path = os.path.join(self.blob_store.temp_dir, f"{uuid.uuid4().hex}.part")
+        try:
+            os.link(part_path, temp_path)
+        except OSError:
+            shutil.copyfile(part_path, temp_path)
+        return BlobUpload(temp_path, sha256, taille)
+
+    def finalize(self, session_id, register, sha256=None):
+        """
+        Vérifie le fichier complet (taille et SHA-256) puis l'enregistre comme document.
+
+        register(session, upload) enregistre le document, publie le blob (ou
+        abandonne le BlobUpload en cas d'échec) et retourne l'id du document, ou
+        None en cas d'échec. La session n'est marquée terminée, et son fichier
+        partiel supprimé, qu'une fois le document enregistré : après un échec, la
+        finalisation peut être relancée sans renvoyer le fichier. Une session déjà
+        finalisée retourne son document sans rien enregistrer.
+
+        Returns:
+            (session, doc_id, cree) : cree vaut False si la session était déjà finalisée
+        """
+        with self._lock(session_id):
+            session = self._get(session_id)
+            if session['doc_id'] is not None:
+                return session, session['doc_id'], False
+
+            part_path = self.part_path(session_id)
+            taille_fichier = _taille_fichier(part_path)
+            if taille_fichier is None:
+                raise UploadSessionError("Fichier partiel de la session introuvable", 410)
+            recu = min(session['recu'], taille_fichier)
+            if recu != session['taille'] or taille_fichier != session['taille']:
+                raise UploadSessionError(
+                    f"Envoi incomplet : {recu} octets reçus sur {session['taille']}", 409, recu
+                )
+
+            sha = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            attendu = (sha256 or session['sha256'] or '').lower()
+            if attendu and attendu != digest:
+                raise UploadSessionError(f"SHA-256 différent : reçu {digest}, attendu {attendu}", 422)
+
+            upload = self._copie_a_publier(part_path, digest, taille_fichier)
+            try:
+                doc_id = register(session, upload)
+            finally:
+                # Sans effet si le fichier a été publié
+                self.blob_store.discard(upload)
+            if not doc_id:
+                raise UploadSessionError("Enregistrement du document impossible, relancer la finalisation", 500)
+
+            if not terminer_session_upload(session_id, doc_id):
+                print(f"[WARNING] Document {doc_id} enregistré, session d'envoi {session_id} non marquée terminée")
+            _supprimer_fichier(part_path)
+            session['doc_id'] = doc_id
+        self.completed += 1
+        return session, doc_id, True
+
+    def abort(self, session_id):
+        """Abandonne une session et supprime son fichier partiel"""
+        with self._lock(session_id):
+            existait = supprimer_session_upload(session_id)
+            _supprimer_fichier(self.part_path(session_id))
+        self._forget(session_id)
+        return existait
+
+    def collect_expired(self):
+        """
+        Supprime les sessions expirées et leur fichier partiel, ainsi que les fichiers
+        temporaires plus anciens que la durée de vie d'une session qui n'appartiennent
+        à aucune session (envois interrompus par un arrêt du serveur).
+
+        Returns:
+            Nombre de fichiers supprimés
+        """
+        now = time.time()
+        supprimes = 0
+        for session_id in supprimer_sessions_upload_expirees(int(now)):
+            if _supprimer_fichier(self.part_path(session_id)):
+                supprimes += 1
+            self._forget(session_id)
+            self.expired += 1
+
+        sessions = recuperer_ids_sessions_upload()
+        if sessions is None:
+            return supprimes
+        try:
+            entries = list(os.scandir(self.blob_store.temp_dir))
+        except FileNotFoundError:
+            return supprimes
+        for entry in entries:
+            if not entry.name.endswith('.part') or entry.name[:-len('.part')] in sessions:
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.ttl and _supprimer_fichier(entry.path):
+                    supprimes += 1
+            except OSError:
+                continue
+        if supprimes:
+            print(f"[UPLOADS] {supprimes} fichier(s) partiel(s) expiré(s) supprimé(s)")
+        return supprimes
+
+    def stats(self):
+        """Compteurs des envois par morceaux (pour /api/metrics)"""
+        with self._locks_lock:
+            active = len(self._locks)
+        return {
+            "created": self.created,
+            "completed": self.completed,
+            "expired": self.expired,
+            "bytes_received": self.bytes_received,
+            "active_locks": active,
+            "chunk_max": self.chunk_max,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,51 @@
+import time
+import zipfile
+
+
+class _ChunkWriter:
+    """Flux d'écriture non positionnable : accumule les octets écrits par zipfile"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """
+    Construit une archive ZIP au fil de l'eau.
+
+    Args:
+        entries: Itérable de tuples (nom_dans_l_archive, contenu_bytes), consommé
+            au fur et à mesure
+
+    Yields:
+        Morceaux de l'archive (bytes), à envoyer directement au client. Seule
+        l'entrée en cours est gardée en mémoire; le répertoire central (quelques
+        octets par fichier) est écrit à la fin.
+    """
+    writer = _ChunkWriter()
+    # Le flux n'étant pas positionnable, zipfile écrit des "data descriptors"
+    # après chaque fichier au lieu de revenir sur les en-têtes.
+    with zipfile.ZipFile(writer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            # Les PDFs sont déjà compressés (image JPEG) : pas de deflate
+            info.compress_type = zipfile.ZIP_STORED
+            archive.writestr(info, data)
+            chunk = writer.pop()
+            if chunk:
+                yield chunk
+    chunk = writer.pop()
+    if chunk:
+        yield chunk